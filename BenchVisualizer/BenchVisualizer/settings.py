@@ -88,6 +88,52 @@ DATABASES = {
     }
 }
 
+# number of rows inserted per statement when builds are ingested in bulk (see visualizer/utilities/DatabaseManager.py)
+DB_BATCH_SIZE = int(os.environ.get('DB_BATCH_SIZE', 500))
+
+
+# Jenkins server (see visualizer/utilities/JenkinsConnector.py). Leave the user and token empty if the server
+# has no protection enabled
+
+JENKINS_URL = os.environ.get('JENKINS_URL', 'http://localhost:8080')
+
+JENKINS_USER = os.environ.get('JENKINS_USER') or None
+
+JENKINS_TOKEN = os.environ.get('JENKINS_TOKEN') or None
+
+JENKINS_TIMEOUT = int(os.environ.get('JENKINS_TIMEOUT', 30))
+
+# number of builds fetched and mined concurrently when a job is registered
+JENKINS_MAX_WORKERS = int(os.environ.get('JENKINS_MAX_WORKERS', 8))
+
+
+# On-disk cache of the consoles of finished Jenkins builds (see visualizer/utilities/ConsoleCache.py)
+
+CONSOLE_CACHE_DIR = os.environ.get('CONSOLE_CACHE_DIR', os.path.join(BASE_DIR, 'console_cache'))
+
+CONSOLE_CACHE_MAX_BYTES = int(os.environ.get('CONSOLE_CACHE_MAX_BYTES', 2 * 1024 * 1024 * 1024))
+
+# The logs of the sub-benchmarks run locally by addBenchToJob, one directory per <JobName>/<revision>-<TAG>
+
+BENCHMARK_LOG_DIR = os.environ.get('BENCHMARK_LOG_DIR', os.path.join(BASE_DIR, 'benchmark_logs'))
+
+# Cache of the pages (see visualizer/utilities/PageCache.py). The ingestWorker command invalidates the pages of the jobs
+# it updates, so the backend must be shared by the processes: the default file-based cache works on a single host,
+# use memcached (CACHE_BACKEND=django.core.cache.backends.memcached.MemcachedCache, CACHE_LOCATION=host:port) otherwise.
+
+PAGE_CACHE_TIMEOUT = int(os.environ.get('PAGE_CACHE_TIMEOUT', 24 * 60 * 60))
+
+# salts the keys of the cached pages and the ETags, e.g. with the deployed revision; by default, a hash of the code
+PAGE_CACHE_SALT = os.environ.get('PAGE_CACHE_SALT') or None
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', os.path.join(BASE_DIR, 'page_cache')),
+        'TIMEOUT': PAGE_CACHE_TIMEOUT,
+    }
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/1.11/ref/settings/#auth-password-validators
@@ -5,7 +5,8 @@ from django.contrib import admin
 
 # Register your models here.
 
-from .models import Dacapo, Specjvm
+from .models import Run, Result, ChangePoint
 
-admin.site.register(Dacapo)
-admin.site.register(Specjvm)
+admin.site.register(Run)
+admin.site.register(Result)
+admin.site.register(ChangePoint)
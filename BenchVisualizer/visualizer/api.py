@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.http import Http404
+from django.http import JsonResponse
+from utilities import DatabaseManager
+from utilities.BenchMiner import SUITES
+from utilities.DatabaseManager import parse_cursor, JOB_API_FIELDS, RUN_API_FIELDS, RESULT_API_FIELDS, \
+    SAMPLE_API_FIELDS
+from views import conditional
+
+'''
+The JSON API (/visualizer/api/v1/) for jobs, runs and results.
+
+Every response is a page of columns, {'version', 'count', 'columns': {field: [values]}, 'next'}, in a stable order.
+?fields=a,b selects the fields (columns), ?limit=N the size of the page (up to API_PAGE_SIZE) and the 'next' cursor
+of a page is passed as ?after= to get the following page ('next' is null on the last page). The timestamps are in ms
+since the epoch.
+'''
+
+API_VERSION = 1
+API_PAGE_SIZE = 1000
+
+
+def get_fields(request, fields, extra=()):
+
+    '''
+    The fields selected with ?fields=, all the (default) fields if there is no selection
+    '''
+
+    if not request.GET.get('fields'):
+        return list(fields)
+
+    selected = request.GET['fields'].split(",")
+    for field in selected:
+        if field not in fields and field not in extra:
+            raise Http404("Unknown field <" + field + ">")
+
+    return selected
+
+
+def get_ids(request, name):
+
+    '''
+    The ids given as ?name=1,2,3, None if there are none
+    '''
+
+    if not request.GET.get(name):
+        return None
+
+    try:
+        return [int(value) for value in request.GET[name].split(",")]
+    except ValueError:
+        raise Http404("Invalid ids <" + request.GET[name] + ">")
+
+
+def get_limit(request):
+
+    try:
+        return max(1, min(int(request.GET.get('limit', API_PAGE_SIZE)), API_PAGE_SIZE))
+    except ValueError:
+        raise Http404("Invalid limit <" + request.GET['limit'] + ">")
+
+
+def get_after(request):
+
+    try:
+        return parse_cursor(request.GET['after']) if request.GET.get('after') else None
+    except ValueError:
+        raise Http404("Invalid cursor <" + request.GET['after'] + ">")
+
+
+def page_response(columns, next_cursor):
+
+    return JsonResponse({
+        'version': API_VERSION,
+        'count': len(next(iter(columns.values()))) if columns else 0,
+        'columns': columns,
+        'next': next_cursor
+    })
+
+
+# the controller for the list of jobs. It is not conditional: the last build of a job changes with every sync
+
+def jobs(request):
+
+    fields = get_fields(request, JOB_API_FIELDS)
+    db = DatabaseManager()
+
+    columns, next_cursor = db.get_api_jobs(fields, request.GET.get('after') or None, get_limit(request))
+
+    return page_response(columns, next_cursor)
+
+
+# the controller for the runs of a job, ?ids=1,2 selects some of them
+
+@conditional
+def runs(request, job_name):
+
+    fields = get_fields(request, RUN_API_FIELDS)
+    db = DatabaseManager()
+
+    columns, next_cursor = db.get_api_runs(job_name, fields, get_ids(request, 'ids'), get_after(request),
+                                           get_limit(request))
+
+    return page_response(columns, next_cursor)
+
+
+# the controller for the results of a job, ?runs=1,2, ?suite= and ?benchmark= select some of them
+
+@conditional
+def results(request, job_name):
+
+    fields = get_fields(request, RESULT_API_FIELDS, SAMPLE_API_FIELDS)
+
+    suite = request.GET.get('suite') or None
+    if suite is not None and suite not in dict(SUITES):
+        raise Http404("Unknown benchmark suite <" + suite + ">")
+
+    db = DatabaseManager()
+
+    columns, next_cursor = db.get_api_results(job_name, fields, get_ids(request, 'runs'), suite,
+                                              request.GET.get('benchmark') or None, get_after(request),
+                                              get_limit(request))
+
+    return page_response(columns, next_cursor)
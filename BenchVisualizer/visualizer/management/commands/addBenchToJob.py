@@ -1,13 +1,18 @@
+from django.conf import settings
 from django.core.management.base import BaseCommand, CommandError
 from django.db.utils import IntegrityError
 from django.http import Http404
 from django.utils import timezone
 from visualizer.models import Job
 from datetime import datetime
-from visualizer.utilities import DatabaseManager, JenkinsConnector, BenchMiner
+from visualizer.utilities import DatabaseManager, get_jenkins_connector
+from visualizer.utilities.BenchScheduler import BenchScheduler, Checkpoint, aggregate_results, aggregate_usage, \
+    benchmark_runs, repeat_runs, select_runs, parse_cpus, format_cpus
+from multiprocessing import cpu_count
 from requests import ConnectionError
 import os
-import subprocess
+import random
+import urllib
 
 
 class Command(BaseCommand):
@@ -22,6 +27,16 @@ class Command(BaseCommand):
      addBenchToJob <JobName> --revision <Git revision> --tag <TAG> //starts the benchmarks and stores the results on the DB
      addBenchToJob <JobName> --revision <Git revision> --tag <TAG> --overwrite //same as above, but overwrites the existing record
         with the same (revision,TAG)
+     addBenchToJob <JobName> --revision <Git revision> --tag <TAG> //run again after an interruption: resumes from the
+        sub-benchmarks that did not finish
+     addBenchToJob <JobName> --revision <Git revision> --tag <TAG> --only avrora,specjvm:compress //runs these
+        sub-benchmarks (again) and merges their results into the record. --skip runs all but the ones given
+     addBenchToJob <JobName> --revision <Git revision> --tag <TAG> --repeat 5 //runs every sub-benchmark 5 times, in
+        random interleaved order, and stores the median score of each one with the MAD of its repetitions
+     addBenchToJob <JobName> --revision <Git revision> --parallel 4 --cpus 0-31 //runs 4 sub-benchmarks at a time, each
+        pinned to its own cores among the CPUs 0-31
+     addBenchToJob <JobName> --revision <Git revision> --log_dir <dir> //writes the output of each sub-benchmark to its own
+        log under <dir>/<JobName>/<revision>-<TAG> (default: BENCHMARK_LOG_DIR of the settings)
     """
 
     help = 'Stores a new set of benchmarks for a specified Job in the database'
@@ -58,6 +73,63 @@ class Command(BaseCommand):
             help="Specify this flag to overwrite benchmarks of the specified revision/tag, if they exist in the DB"
         )
 
+        parser.add_argument(
+            '--only',
+            type=str,
+            default=None,
+            help="Run only these sub-benchmarks, comma-separated (e.g. avrora,specjvm:compress or a whole suite: dacapo)"
+        )
+
+        parser.add_argument(
+            '--skip',
+            type=str,
+            default=None,
+            help="Do not run these sub-benchmarks, comma-separated, as in --only"
+        )
+
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=1,
+            help="Run each sub-benchmark this many times, in randomized interleaved order, and store the median of the "
+                 "scores and their MAD (default: 1)"
+        )
+
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=None,
+            help="The seed of the random order of --repeat, to run the same order again (default: random)"
+        )
+
+        parser.add_argument(
+            '--parallel',
+            type=int,
+            default=1,
+            help="The number of sub-benchmarks that run at the same time, each on its own CPUs (default: 1)"
+        )
+
+        parser.add_argument(
+            '--cpus',
+            type=str,
+            default=None,
+            help="The CPUs the sub-benchmarks run on, in the format of taskset, e.g. 0-15 (default: all)"
+        )
+
+        parser.add_argument(
+            '--log_dir',
+            type=str,
+            default=settings.BENCHMARK_LOG_DIR,
+            help="The directory of the logs of the sub-benchmarks, one per sub-benchmark under <JobName>/<revision>-<TAG>"
+        )
+
+        parser.add_argument(
+            '--threads',
+            type=int,
+            default=4,
+            help="The threads (-t) of the scalable DaCapo benchmarks when they run in parallel (default: 4)"
+        )
+
     def handle(self, *args, **options):
 
         job_name = options['job_name']
@@ -85,7 +157,7 @@ class Command(BaseCommand):
 
             self.stdout.write(self.style.WARNING('Getting Jenkins latest build benchmarks...'))
             try:
-                jenkins_conn = JenkinsConnector()
+                jenkins_conn = get_jenkins_connector()
                 db = DatabaseManager()
 
                 job_details = jenkins_conn.get_job_details(job_name)
@@ -97,6 +169,7 @@ class Command(BaseCommand):
                     stored_job = db.store_job(job_details)
 
                 db.store_benchmarks(stored_job, bench)
+                db.update_watermark(stored_job, [bench])
             except ConnectionError:
                 self.stdout.write(self.style.ERROR('Could not establish a connection to the Jenkins server'))
             except IntegrityError:
@@ -124,87 +197,136 @@ class Command(BaseCommand):
                 exit()
 
             self.stdout.write(self.style.WARNING('Inserting benchmarks for a specific revision...'))
-            # Running the pipeline via python
-
-            # copy the env vars from the system
-            env = dict(os.environ)
-
-
-            dacapo_benchs = [
-
-                "avrora", "batik", "eclipse", "fop", "h2", "jython", "luindex", "lusearch", "pmd", "sunflow", "tomcat",
-                "tradebeans", "tradesoap", "xalan"
-            ]
-
-            specjvm_benchs = [
-                "startup", "compiler", "compress", "crypto", "derby", "mpegaudio", "scimark", "serial", "spec_sunflow", "xml"
-            ]
-
-            outp = ""
-            for dacapo_bench in dacapo_benchs:
-                self.stdout.write(self.style.WARNING('Initiating Dacapo ' + dacapo_bench + '...'))
-                shell_command = env['MX'] + ' --vm=maxine vm -jar dacapo-9.12-bach.jar ' + dacapo_bench + ' || true'
-                outp += "Executing: " + shell_command + '\n'
-                outp += subprocess.check_output(
-                    shell_command,
-                    shell=True, env=env, cwd=env['DACAPO'], stderr=subprocess.STDOUT
-                )
-            self.stdout.write(self.style.SUCCESS('Dacapo Benchmarks Complete!'))
-
-            for specjvm_bench in specjvm_benchs:
-                self.stdout.write(self.style.WARNING('Initiating Specjvm ' + specjvm_bench + '...'))
-
-                shell_command = 'timeout -s SIGINT 7m ' + env['MX'] +\
-                        ' --vm=maxine vm -jar SPECjvm2008.jar -bt 2 ' + specjvm_bench + ' || true'
-
-                outp += "Executing: " + shell_command + '\n'
-                outp += subprocess.check_output(
-                    shell_command,
-                    shell=True, env=env, cwd=env['SPECJVM2008'], stderr=subprocess.STDOUT
-                )
-
-                # '+ true' marks the end of the specjvm subbenchmark output. DO NOT remove
-                outp += '+ true\n'
-
-            self.stdout.write(self.style.SUCCESS('Specjvm Benchmarks Complete!'))
-
-            # print "======OUTPUT IS=======:\n" + outp
-            miner = BenchMiner(outp)
-            dacapo_res = miner.mine_all_dacapos()
-            specjvm_res = miner.mine_all_specjvms()
-            print str(dacapo_res) + "\n" + str(specjvm_res)
 
             '''
-            Construct the dict that contains the two sets of benchmarks and store it in the DB
+            The record of the revision/tag is stored before the benchmarks start, with all the sub-benchmarks missing,
+            and each result is stored as soon as its sub-benchmark finishes. So the results of a run that is interrupted
+            are not lost, and the page of the Job shows them while the rest are still running.
+            The finished sub-benchmarks are also recorded in a checkpoint, next to their logs: running the command again
+            for the same revision/tag resumes from the sub-benchmarks left, and --only/--skip run some sub-benchmarks
+            again and replace their results in the record.
+            With --repeat, every repetition is recorded in the checkpoint, and the result of the sub-benchmark is the
+            median of its repetitions.
+            The resources used by the process of each sub-benchmark (wall time, CPU time, peak RSS, exit status) are
+            stored along with its result.
             '''
 
-            self.stdout.write(self.style.WARNING('Storing the benchmarks to the DB...'))
+            # copy the env vars from the system
+            env = dict(os.environ)
+
+            cpus = parse_cpus(options['cpus']) if options['cpus'] else range(cpu_count())
+            runs = benchmark_runs(env, options['threads'] if options['parallel'] > 1 else None)
+            try:
+                runs = select_runs(runs, options['only'], options['skip'])
+            except ValueError as e:
+                raise CommandError(str(e))
+            selected = options['only'] is not None or options['skip'] is not None
+
+            repeat = max(1, options['repeat'])
+            if repeat > 1:
+                seed = options['seed'] if options['seed'] is not None else random.randrange(2 ** 31)
+                self.stdout.write(self.style.WARNING('Running each sub-benchmark ' + str(repeat) +
+                                                     ' times, in random order (--seed ' + str(seed) + ')'))
+                runs = repeat_runs(runs, repeat, seed)
+
+            # the names of the repetitions of each sub-benchmark
+            repetitions = {}
+            for run in runs:
+                repetitions.setdefault((run.suite, run.key), []).append(run.name)
+
+            log_dir = os.path.join(options['log_dir'], urllib.quote(stored_job.name, safe=""),
+                                   urllib.quote(options['revision'] + "-" + options['tag'], safe=""))
+            try:
+                scheduler = BenchScheduler(cpus, options['parallel'], env, log_dir=log_dir)
+            except ValueError as e:
+                raise CommandError(str(e))
 
-            all_benchs = {
+            timestamp = datetime.now(tz=timezone.utc)
+            empty_benchs = {
                 'build_no': 0,
                 'revision': options['revision'],
-                'timestamp': datetime.now(tz=timezone.utc),
-                'specjvm': specjvm_res,
-                'dacapo': dacapo_res
+                'timestamp': timestamp
             }
             db = DatabaseManager()
+            # the oldest position of the record, from where the change-point detection runs
+            since = timestamp
+            resume = False
             try:
-                db.get_benchmarks(stored_job, options['revision'], options['tag'])
-            # if a record does not exist, create a new one and exit successfully
+                stored = db.get_benchmarks(stored_job, options['revision'], options['tag'])
+            # if a record does not exist, create a new one
             except Http404:
-                db.store_benchmarks(stored_job, all_benchs, options['tag'])
-                self.stdout.write(self.style.SUCCESS('Complete.'))
-                exit()
-
-            # if a record with the specified revision/tag exists in the database
-            self.stdout.write(self.style.WARNING('Found an existing set of benchmarks for this tag/revision'))
-            if options['overwrite']:
-                self.stdout.write(self.style.WARNING('Overwriting...'))
-                db.update_benchmarks(stored_job, options['revision'], all_benchs, options['tag'])
+                db.store_benchmarks(stored_job, empty_benchs, options['tag'], detect=False)
+            else:
+                # if a record with the specified revision/tag exists in the database
+                self.stdout.write(self.style.WARNING('Found an existing set of benchmarks for this tag/revision'))
+                since = min(since, stored['dacapo']['timestamp'])
+                if options['overwrite']:
+                    self.stdout.write(self.style.WARNING('Overwriting...'))
+                    db.update_benchmarks(stored_job, options['revision'], empty_benchs, options['tag'], detect=False)
+                else:
+                    resume = True
+
+            run_id = db.get_benchmarks(stored_job, options['revision'], options['tag'])['id']
+            checkpoint = Checkpoint(os.path.join(log_dir, "checkpoint.json"), run_id)
+
+            if not resume:
+                checkpoint.save()
+            elif selected:
+                # the selected sub-benchmarks run again, and their results replace the ones of the record
+                checkpoint.load()
+                checkpoint.discard(runs)
+                self.stdout.write(self.style.WARNING('Running ' + str(len(runs)) + ' sub-benchmarks again...'))
+            elif checkpoint.load():
+                runs = [run for run in runs if not checkpoint.is_finished(run)]
+                if not runs:
+                    self.stdout.write(self.style.ERROR('All the benchmarks of this tag/revision have finished. Specify '
+                                                       '--overwrite, --only or --skip to run them again'))
+                    exit()
+                self.stdout.write(self.style.WARNING('Resuming, ' + str(len(runs)) + ' sub-benchmarks left...'))
             else:
-                self.stdout.write(self.style.ERROR('Specify --overwrite option if you want to update the data'))
+                self.stdout.write(self.style.ERROR('Specify --overwrite option if you want to update the data, or '
+                                                   '--only/--skip to run some of the benchmarks again'))
                 exit()
 
+            # Running the pipeline via python
+
+            self.stdout.write(self.style.WARNING('Logging the output of the benchmarks to ' + log_dir))
+
+            def describe(run):
+                if repeat == 1:
+                    return run.suite + ' ' + run.key
+                return run.suite + ' ' + run.key + ' (' + str(run.repetition + 1) + '/' + str(repeat) + ')'
+
+            def on_start(run):
+                if scheduler.pin:
+                    self.stdout.write(self.style.WARNING(
+                        'Initiating ' + describe(run) + ' on CPUs ' + format_cpus(run.cpus) + '...'))
+                else:
+                    self.stdout.write(self.style.WARNING('Initiating ' + describe(run) + '...'))
+
+            def on_finish(run):
+                raw_score, samples = run.get_result()
+                checkpoint.record(run, raw_score, samples)
+                usage = run.get_usage()
+                self.stdout.write(self.style.SUCCESS(
+                    describe(run) + ' complete: ' + raw_score + ' (exit status ' + str(usage['exit_status']) +
+                    ', wall %.1fs, user %.1fs, sys %.1fs, peak RSS %d MiB)' % (
+                        usage['wall_time'], usage['user_time'], usage['system_time'], usage['max_rss'] // 1024)))
+
+                # the result of a repeated sub-benchmark is the median of its repetitions so far
+                finished = [checkpoint.finished[name] for name in repetitions[(run.suite, run.key)]
+                            if name in checkpoint.finished]
+                raw_score, samples, scores = aggregate_results(
+                    [(result['result'], result['samples']) for result in finished])
+                usage = aggregate_usage([result.get('usage') for result in finished])
+                db.store_result(stored_job, run_id, run.suite, run.key, raw_score, samples,
+                                scores if repeat > 1 else None, usage)
+
+            scheduler.run(runs, on_start, on_finish)
+
+            # the change-point detection runs once, over the updated record
+            db.detect_changes(stored_job, since)
+
         else:
             self.stdout.write(self.style.ERROR('You must specify a GIT revision or the --get_jenkins latest option'))
             exit()
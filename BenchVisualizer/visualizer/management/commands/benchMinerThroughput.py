@@ -0,0 +1,322 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from multiprocessing import Process, Queue
+from visualizer.utilities import BenchMiner
+from visualizer.utilities.BenchMiner import DACAPO_BENCHMARKS, SPECJVM_BENCHMARKS, MARKERS
+import json
+import os
+import platform
+import random
+import resource
+import tempfile
+import time
+
+FIXTURES = ["console_whole", "console_one_specjvm_interrupt", "console_dacapos"]
+
+# size of the pieces in which the synthetic consoles are read and fed to the miner
+CHUNK_SIZE = 1024 * 1024
+
+ENTRY_POINTS = ["mine_all_specjvms", "mine_all_dacapos"]
+
+
+def load_fixture_lines():
+
+    """
+    Reads the lines of the console fixtures used by the miner tests (static/test_files)
+    """
+
+    fixtures_dir = os.path.join(settings.BASE_DIR, "visualizer", "static", "test_files")
+
+    lines = []
+    for fixture in FIXTURES:
+        f = open(os.path.join(fixtures_dir, fixture), "r")
+        lines.extend(f.read().splitlines())
+        f.close()
+
+    return lines
+
+
+def synthesize_console(out, size, failure_rate, seed):
+
+    """
+    Writes a synthetic pipeline console of roughly `size` bytes to the file `out`.
+    The command, result and '+ true' lines are taken from the fixtures, and every sub-benchmark is padded with
+    fixture lines that cannot change the state of the miner. Each sub-benchmark independently passes, fails
+    (or is interrupted) or is missing, the last two with total probability failure_rate.
+
+    :return: A tuple (expected specjvm results, expected dacapo results), in the format of BenchMiner
+    """
+
+    rand = random.Random(seed)
+    lines = load_fixture_lines()
+
+    specjvm_command = [l for l in lines if "-jar SPECjvm2008.jar" in l][0].rsplit(" ", 1)[0] + " "
+    dacapo_command = [l for l in lines if "-jar dacapo-9.12-bach.jar" in l][0].rsplit(" ", 1)[0] + " "
+    true_line = [l for l in lines if l.endswith("+ true")][0]
+    noise = [l for l in lines if not MARKERS.search(l)]
+
+    # blocks of ~64KB of noise, so the padding is written in big pieces
+    blocks = []
+    for i in range(16):
+        block = []
+        block_size = 0
+        while block_size < 64 * 1024:
+            line = rand.choice(noise)
+            block.append(line)
+            block_size += len(line) + 1
+        blocks.append("\n".join(block) + "\n")
+
+    padding = max(0, size // (len(SPECJVM_BENCHMARKS) + len(DACAPO_BENCHMARKS)))
+
+    def pad():
+        written = 0
+        while written < padding:
+            block = rand.choice(blocks)
+            out.write(block)
+            written += len(block)
+
+    def outcome():
+        draw = rand.random()
+        if draw < failure_rate / 2:
+            return "missing"
+        if draw < failure_rate:
+            return "interpt/failed"
+        return "ok"
+
+    expected_dacapo = {}
+    for key, sub_bench in DACAPO_BENCHMARKS:
+        expected_dacapo[key] = outcome()
+        if expected_dacapo[key] == "missing":
+            continue
+        out.write(dacapo_command + sub_bench + "\n")
+        pad()
+        if expected_dacapo[key] == "ok":
+            expected_dacapo[key] = str(rand.randint(1000, 200000))
+            out.write("===== DaCapo 9.12 " + sub_bench + " PASSED in " + expected_dacapo[key] + " msec =====\n")
+
+    expected_specjvm = {}
+    for key, sub_bench in SPECJVM_BENCHMARKS:
+        expected_specjvm[key] = outcome()
+        if expected_specjvm[key] == "missing":
+            continue
+        out.write(specjvm_command + sub_bench + "\n")
+        pad()
+        if expected_specjvm[key] == "ok":
+            expected_specjvm[key] = "%.2f" % rand.uniform(1, 100)
+            out.write("Noncompliant composite result: " + expected_specjvm[key] + " ops/m\n")
+        out.write(true_line + "\n")
+
+    return expected_specjvm, expected_dacapo
+
+
+def peak_rss_mb():
+    # ru_maxrss is in KB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def measure(path, entry_point, in_memory, queue):
+
+    """
+    Mines the console at `path` with a fresh BenchMiner and puts (seconds, peak memory increase in MB, result)
+    in the queue. Runs in its own process, so that the peak memory of every measurement is isolated.
+    """
+
+    rss_before = peak_rss_mb()
+    f = open(path, "r")
+    if in_memory:
+        console = f.read()
+    else:
+        console = iter(lambda: f.read(CHUNK_SIZE), "")
+
+    start = time.time()
+    result = getattr(BenchMiner(console), entry_point)()
+    seconds = time.time() - start
+
+    f.close()
+    queue.put((seconds, peak_rss_mb() - rss_before, result))
+
+
+class Command(BaseCommand):
+
+    """
+    benchMinerThroughput measures how fast BenchMiner mines pipeline consoles.
+
+    Synthetic consoles of the given sizes are built from the test fixtures, and each one is mined by
+    mine_all_specjvms and mine_all_dacapos, either streamed from disk or read whole into memory.
+    For every measurement it reports the throughput (MB/s), the peak memory used on top of the process baseline
+    and the best time over the repetitions, and checks the mined results. The report is written as JSON.
+
+    Usage:
+     benchMinerThroughput --sizes 1,10,100,500 --output report.json
+     benchMinerThroughput --baseline report.json --max-regression 10 //fails when the throughput drops by more
+        than 10% against an earlier report
+    """
+
+    help = 'Measures the throughput and memory usage of the console miner on synthetic consoles'
+
+    def add_arguments(self, parser):
+
+        parser.add_argument(
+            '--sizes',
+            type=str,
+            default="1,10,100,500",
+            help="Comma separated sizes of the synthetic consoles, in MB"
+        )
+
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=3,
+            help="Number of times each measurement is repeated. The best time is reported"
+        )
+
+        parser.add_argument(
+            '--failure-rate',
+            type=float,
+            default=0.3,
+            help="Probability of a sub-benchmark being failed/interrupted or missing"
+        )
+
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help="Seed of the synthetic console generator"
+        )
+
+        parser.add_argument(
+            '--modes',
+            type=str,
+            default="stream,memory",
+            help="Comma separated ways of feeding the console: 'stream' (chunks read from disk), 'memory' (one string)"
+        )
+
+        parser.add_argument(
+            '--output',
+            type=str,
+            default=None,
+            help="File to write the JSON report to, instead of the standard output"
+        )
+
+        parser.add_argument(
+            '--baseline',
+            type=str,
+            default=None,
+            help="An earlier JSON report to compare the throughput against"
+        )
+
+        parser.add_argument(
+            '--max-regression',
+            type=float,
+            default=10.0,
+            help="The maximum allowed throughput drop against the baseline, in percent"
+        )
+
+    def handle(self, *args, **options):
+
+        sizes = [float(size) for size in options['sizes'].split(",")]
+        modes = options['modes'].split(",")
+
+        for mode in modes:
+            if mode not in ("stream", "memory"):
+                raise CommandError("Unknown mode: " + mode)
+
+        measurements = []
+
+        for size_mb in sizes:
+            fd, path = tempfile.mkstemp(prefix="synthetic_console_")
+            try:
+                out = os.fdopen(fd, "w")
+                expected = dict(zip(ENTRY_POINTS, synthesize_console(
+                    out, int(size_mb * 1024 * 1024), options['failure_rate'], options['seed'])))
+                out.close()
+                size_bytes = os.path.getsize(path)
+
+                for mode in modes:
+                    for entry_point in ENTRY_POINTS:
+                        self.stderr.write("Mining %.0f MB (%s) with %s..." % (size_mb, mode, entry_point))
+                        measurements.append(self.measure(
+                            path, size_mb, size_bytes, mode, entry_point, expected[entry_point], options['repeat']))
+            finally:
+                os.remove(path)
+
+        report = {
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'chunk_size': CHUNK_SIZE,
+            'failure_rate': options['failure_rate'],
+            'seed': options['seed'],
+            'measurements': measurements
+        }
+
+        output = json.dumps(report, indent=2, sort_keys=True)
+        if options['output']:
+            f = open(options['output'], "w")
+            f.write(output + "\n")
+            f.close()
+        else:
+            self.stdout.write(output)
+
+        wrong = [m for m in measurements if not m['correct']]
+        if wrong:
+            raise CommandError("The miner returned wrong results for: " + ", ".join(
+                "%s MB/%s/%s" % (m['size_mb'], m['mode'], m['entry_point']) for m in wrong))
+
+        if options['baseline']:
+            self.check_regressions(measurements, options['baseline'], options['max_regression'])
+
+    def measure(self, path, size_mb, size_bytes, mode, entry_point, expected, repeat):
+
+        times = []
+        peak_memory = 0
+        correct = True
+
+        for i in range(repeat):
+            queue = Queue()
+            process = Process(target=measure, args=(path, entry_point, mode == "memory", queue))
+            process.start()
+            seconds, memory, result = queue.get()
+            process.join()
+
+            times.append(seconds)
+            peak_memory = max(peak_memory, memory)
+            correct = correct and result == expected
+
+        best = min(times)
+
+        return {
+            'size_mb': size_mb,
+            'bytes': size_bytes,
+            'mode': mode,
+            'entry_point': entry_point,
+            'seconds': best,
+            'seconds_all': times,
+            'mb_per_s': size_bytes / (1024.0 * 1024.0) / best if best > 0 else None,
+            'peak_memory_mb': peak_memory,
+            'correct': correct
+        }
+
+    def check_regressions(self, measurements, baseline_path, max_regression):
+
+        f = open(baseline_path, "r")
+        baseline = json.load(f)
+        f.close()
+
+        previous = dict(
+            ((m['size_mb'], m['mode'], m['entry_point']), m['mb_per_s']) for m in baseline['measurements']
+        )
+
+        regressions = []
+        for m in measurements:
+            old = previous.get((m['size_mb'], m['mode'], m['entry_point']))
+            if not old or not m['mb_per_s']:
+                continue
+            drop = (old - m['mb_per_s']) / old * 100.0
+            if drop > max_regression:
+                regressions.append("%s MB/%s/%s: %.1f MB/s -> %.1f MB/s (-%.1f%%)" % (
+                    m['size_mb'], m['mode'], m['entry_point'], old, m['mb_per_s'], drop))
+
+        if regressions:
+            raise CommandError("Throughput regressions over %.1f%%:\n" % max_regression + "\n".join(regressions))
+
+        self.stderr.write(self.style.SUCCESS("No throughput regression over %.1f%%" % max_regression))
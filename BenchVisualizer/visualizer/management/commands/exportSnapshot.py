@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from visualizer.utilities import DatabaseManager
+from visualizer.utilities.Snapshot import save_snapshot
+
+
+class Command(BaseCommand):
+
+    """
+    exportSnapshot is a CLI tool that exports all the Jobs, Runs and Results of the DB to a columnar NumPy snapshot,
+    to move the benchmark history to another DB (see importSnapshot) or to analyse it directly.
+
+    Usage:
+     exportSnapshot benchmarks.npz //writes one compressed .npz file
+     exportSnapshot benchmarks/ //writes a directory with one .npy file per column, which can be memory-mapped
+    """
+
+    help = 'Exports the benchmark DB to a NumPy snapshot (.npz file or directory of .npy files)'
+
+    def add_arguments(self, parser):
+
+        parser.add_argument('path', type=str, help="The .npz file or the directory of the snapshot")
+
+    def handle(self, *args, **options):
+
+        db = DatabaseManager()
+        arrays = db.get_snapshot()
+        save_snapshot(options['path'], arrays)
+
+        self.stdout.write(self.style.SUCCESS(
+            'Complete. ' + str(len(arrays['job_name'])) + ' jobs, ' + str(len(arrays['run_job'])) + ' runs and ' +
+            str(len(arrays['result_run'])) + ' results exported to ' + options['path']))
@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand, CommandError
+from visualizer.utilities import DatabaseManager
+from visualizer.utilities.Snapshot import load_snapshot
+
+
+class Command(BaseCommand):
+
+    """
+    importSnapshot is a CLI tool that stores the Jobs of a snapshot of exportSnapshot in the DB, with bulk inserts in
+    one transaction. The regressions and improvements of the imported Jobs are detected again.
+
+    Usage:
+     importSnapshot benchmarks.npz //imports the Jobs that are not stored yet, and skips the others
+     importSnapshot benchmarks/ --replace //replaces the stored Jobs that are in the snapshot too
+    """
+
+    help = 'Imports a NumPy snapshot of exportSnapshot into the benchmark DB'
+
+    def add_arguments(self, parser):
+
+        parser.add_argument('path', type=str, help="The .npz file or the directory of the snapshot")
+
+        parser.add_argument(
+            '--replace',
+            action="store_true",
+            default=False,
+            help="Specify this flag to replace the stored Jobs that are in the snapshot"
+        )
+
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=None,
+            help="The number of rows per insert (default: DB_BATCH_SIZE)"
+        )
+
+    def handle(self, *args, **options):
+
+        try:
+            # the columns of a directory are memory-mapped, and read while they are inserted
+            arrays = load_snapshot(options['path'], mmap_mode='r')
+        except (IOError, OSError, ValueError) as e:
+            raise CommandError("Cannot read the snapshot <" + options['path'] + ">: " + str(e))
+
+        db = DatabaseManager()
+        stored, skipped = db.store_snapshot(arrays, options['replace'], options['batch_size'])
+
+        for job_name in skipped:
+            self.stdout.write(self.style.WARNING('Job: ' + job_name + ' ----> skipped, it is already stored'))
+
+        self.stdout.write(self.style.SUCCESS('Complete. ' + str(len(stored)) + ' jobs imported.'))
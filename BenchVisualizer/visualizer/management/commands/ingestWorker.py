@@ -0,0 +1,87 @@
+from django.core.management.base import BaseCommand
+from visualizer.models import IngestTask
+from visualizer.utilities import DatabaseManager, get_jenkins_connector
+import time
+
+# the progress of a running ingestion is written to the DB at most once per interval (in seconds)
+PROGRESS_INTERVAL = 1.0
+
+
+class Command(BaseCommand):
+
+    """
+    ingestWorker is a CLI tool that processes the queue of Jenkins ingestions submitted from the "Register Jobs" page.
+    For each queued job, it fetches and mines the builds from Jenkins and stores the benchmarks in the DB,
+    recording its progress, which is reported at registerStatus/progress/.
+    Several workers can run at the same time, each ingestion is processed by exactly one of them.
+
+    Usage:
+     ingestWorker //processes the queue forever, polling for new ingestions every 2 seconds
+     ingestWorker --once //processes the queued ingestions and exits when the queue is empty
+    """
+
+    help = 'Processes the queued Jenkins ingestions'
+
+    def add_arguments(self, parser):
+
+        parser.add_argument(
+            '--once',
+            action="store_true",
+            default=False,
+            help="Specify this flag to exit when the queue is empty"
+        )
+
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=2.0,
+            help="Seconds to wait before checking an empty queue again"
+        )
+
+    def handle(self, *args, **options):
+
+        db = DatabaseManager()
+
+        while True:
+            task = db.claim_ingest_task()
+
+            if task is None:
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
+                continue
+
+            self.stdout.write(self.style.WARNING('Ingesting (' + task.mode + ') Job: ' + task.job_name + '...'))
+            try:
+                self.ingest(db, task)
+            except (KeyboardInterrupt, SystemExit):
+                # the worker is stopped: put the task back on the queue for the next worker
+                IngestTask.objects.filter(id=task.id).update(status=IngestTask.QUEUED, started=None)
+                raise
+            except Exception as e:
+                db.finish_ingest_task(task, e)
+                self.stdout.write(self.style.ERROR('Job: ' + task.job_name + ' ----> failed: ' + str(e)))
+            else:
+                db.finish_ingest_task(task)
+                self.stdout.write(self.style.SUCCESS('Job: ' + task.job_name + ' ----> complete'))
+
+    def ingest(self, db, task):
+
+        jenkins_conn = get_jenkins_connector()
+        last_update = [0]
+
+        def progress(builds_scanned, builds_total, builds_failed):
+            now = time.time()
+            if builds_scanned == 0 or builds_scanned == builds_total or now - last_update[0] >= PROGRESS_INTERVAL:
+                db.update_ingest_progress(task, builds_scanned, builds_total, builds_failed)
+                last_update[0] = now
+
+        if task.mode == IngestTask.REFRESH:
+            job = jenkins_conn.get_job_and_benchmarks(task.job_name, progress=progress)
+            db.replace_job(job)
+        else:
+            # incremental sync: only the builds newer than the job's high-water mark are fetched and appended
+            last_build_no, last_build_timestamp = db.get_watermark(task.job_name)
+            job = jenkins_conn.get_job_and_benchmarks(
+                task.job_name, last_build_no, last_build_timestamp, progress=progress)
+            db.sync_database([job])
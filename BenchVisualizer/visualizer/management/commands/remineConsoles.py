@@ -0,0 +1,126 @@
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.http import Http404
+from multiprocessing import Pool, cpu_count
+from visualizer.models import Job, parse_score
+from visualizer.utilities import BenchMiner, ConsoleCache, DatabaseManager
+from visualizer.utilities.BenchMiner import SUITES
+from visualizer.utilities.JenkinsConnector import CONSOLE_CHUNK_SIZE
+
+
+def mine_cached_console(key):
+
+    """
+    Mines a cached console. Runs in the worker processes, which never touch the DB.
+
+    :param key: A (job name, build number) tuple
+    :return: A tuple (job name, build number, benchmarks dict), None if the console is not cached anymore
+    """
+
+    job_name, build_no = key
+    console = ConsoleCache().open(job_name, build_no)
+    if console is None:
+        return None
+
+    try:
+        miner = BenchMiner(iter(lambda: console.read(CONSOLE_CHUNK_SIZE), ""))
+        bench = {
+            'specjvm': miner.mine_all_specjvms(),
+            'dacapo': miner.mine_all_dacapos(),
+            'samples': miner.mine_all_samples()
+        }
+    finally:
+        console.close()
+
+    return job_name, build_no, bench
+
+
+class Command(BaseCommand):
+
+    """
+    remineConsoles is a CLI tool that runs BenchMiner again over the cached consoles of the Jenkins builds
+    and updates the stored benchmarks, without contacting the Jenkins server.
+    Use it to backfill a fix of the miner over the whole history.
+
+    Usage:
+     remineConsoles //re-mines the cached consoles of all the registered Jobs
+     remineConsoles <JobName> <JobName> --processes 8 //re-mines the consoles of the specified Jobs with 8 processes
+    """
+
+    help = 'Mines the cached Jenkins consoles again and updates the stored benchmarks'
+
+    def add_arguments(self, parser):
+
+        parser.add_argument('job_names', nargs='*', type=str, help="The Jobs to re-mine (default: all the Jobs)")
+
+        parser.add_argument(
+            '--processes',
+            type=int,
+            default=cpu_count(),
+            help="The number of processes that mine consoles in parallel"
+        )
+
+        parser.add_argument(
+            '--dry-run',
+            action="store_true",
+            default=False,
+            help="Specify this flag to only report the builds whose benchmarks would change"
+        )
+
+    def handle(self, *args, **options):
+
+        db = DatabaseManager()
+
+        stored_jobs = Job.objects.all()
+        if options['job_names']:
+            stored_jobs = stored_jobs.filter(name__in=options['job_names'])
+        stored_jobs = dict((stored_job.name, stored_job) for stored_job in stored_jobs)
+
+        keys = [key for key in ConsoleCache().keys() if key[0] in stored_jobs]
+        self.stdout.write(self.style.WARNING('Re-mining ' + str(len(keys)) + ' cached consoles...'))
+
+        changed = 0
+        skipped = 0
+        # the oldest changed build of each job, where the change-point detection starts again
+        since = {}
+        # the worker processes must not inherit the open DB connections
+        connections.close_all()
+        pool = Pool(max(1, options['processes']))
+        try:
+            for mined in pool.imap_unordered(mine_cached_console, keys):
+                if mined is None:
+                    skipped += 1
+                    continue
+
+                job_name, build_no, bench = mined
+                stored_job = stored_jobs[job_name]
+
+                try:
+                    stored = db.get_build_benchmarks(stored_job, build_no)
+                except Http404:
+                    skipped += 1
+                    continue
+
+                # the scores are compared as stored, e.g. "12.50" is stored as 12.5. The samples are compared too,
+                # so that the samples of the builds mined before they were captured are backfilled
+                if all(parse_score(stored[suite][key]) == parse_score(bench[suite][key])
+                       for suite, benchmarks in SUITES for key in bench[suite]) and \
+                        stored['samples'] == bench['samples']:
+                    continue
+
+                changed += 1
+                self.stdout.write('Job: ' + job_name + ' ----> build ' + str(build_no) + ' changed')
+                if not options['dry_run']:
+                    db.update_build_benchmarks(stored_job, build_no, bench, detect=False)
+                    timestamp = stored['dacapo']['timestamp']
+                    since[job_name] = min(since.get(job_name, timestamp), timestamp)
+        finally:
+            pool.close()
+            pool.join()
+
+        for job_name, timestamp in since.items():
+            db.detect_changes(stored_jobs[job_name], timestamp)
+
+        self.stdout.write(self.style.SUCCESS(
+            'Complete. ' + str(changed) + ' builds changed, ' + str(skipped) + ' skipped (not stored or evicted).'))
+
@@ -0,0 +1,446 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import math
+
+from django.db import migrations, models
+
+DACAPO_SCORES = [
+    'avrora', 'batik', 'eclipse', 'fop', 'h2', 'jython', 'luindex',
+    'lusearch', 'pmd', 'sunflow', 'tomcat', 'tradebeans', 'tradesoap', 'xalan'
+]
+
+SPECJVM_SCORES = [
+    'startup', 'compiler', 'compress', 'crypto', 'derby', 'mpegaudio', 'scimark', 'serial', 'sunflow', 'xml'
+]
+
+STATUS_OK = 0
+STATUS_MISSING = 1
+STATUS_FAILED = 2
+
+
+def parse_score(raw_score):
+    if raw_score == "missing":
+        return None, STATUS_MISSING
+
+    try:
+        score = float(raw_score)
+    except (TypeError, ValueError):
+        return None, STATUS_FAILED
+
+    if math.isnan(score) or math.isinf(score):
+        return None, STATUS_FAILED
+
+    return score, STATUS_OK
+
+
+def format_score(score, status):
+    if status == STATUS_MISSING:
+        return "missing"
+    if score is None or status != STATUS_OK:
+        return "interpt/failed"
+    if float(score) == int(float(score)):
+        return str(int(float(score)))
+    return repr(float(score))
+
+
+def convert_rows(model, names, convert):
+    for row in model.objects.all().iterator():
+        for name in names:
+            convert(row, name)
+        row.save()
+
+
+def to_typed_scores(apps, schema_editor):
+
+    """
+    Splits the old text scores into a number (kept as text until the columns become numeric) and a status code
+    """
+
+    def convert(row, name):
+        score, status = parse_score(getattr(row, name))
+        setattr(row, name, None if score is None else repr(score))
+        setattr(row, name + "_status", status)
+
+    convert_rows(apps.get_model('visualizer', 'Dacapo'), DACAPO_SCORES, convert)
+    convert_rows(apps.get_model('visualizer', 'Specjvm'), SPECJVM_SCORES, convert)
+
+
+def to_text_scores(apps, schema_editor):
+
+    def convert(row, name):
+        setattr(row, name, format_score(getattr(row, name), getattr(row, name + "_status")))
+
+    convert_rows(apps.get_model('visualizer', 'Dacapo'), DACAPO_SCORES, convert)
+    convert_rows(apps.get_model('visualizer', 'Specjvm'), SPECJVM_SCORES, convert)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('visualizer', '0003_ingesttask'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='dacapo',
+            name='avrora',
+            field=models.CharField(max_length=50, null=True),
+        ),
+        migrations.AlterField(
+            model_name='dacapo',
+            name='batik',
+            field=models.CharField(max_length=50, null=True),
+        ),
+        migrations.AlterField(
+            model_name='dacapo',
+            name='eclipse',
+            field=models.CharField(max_length=50, null=True),
+        ),
+        migrations.AlterField(
+            model_name='dacapo',
+            name='fop',
+            field=models.CharField(max_length=50, null=True),
+        ),
+        migrations.AlterField(
+            model_name='dacapo',
+            name='h2',
+            field=models.CharField(max_length=50, null=True),
+        ),
+        migrations.AlterField(
+            model_name='dacapo',
+            name='jython',
+            field=models.CharField(max_length=50, null=True),
+        ),
+        migrations.AlterField(
+            model_name='dacapo',
+            name='luindex',
+            field=models.CharField(max_length=50, null=True),
+        ),
+        migrations.AlterField(
+            model_name='dacapo',
+            name='lusearch',
+            field=models.CharField(max_length=50, null=True),
+        ),
+        migrations.AlterField(
+            model_name='dacapo',
+            name='pmd',
+            field=models.CharField(max_length=50, null=True),
+        ),
+        migrations.AlterField(
+            model_name='dacapo',
+            name='sunflow',
+            field=models.CharField(max_length=50, null=True),
+        ),
+        migrations.AlterField(
+            model_name='dacapo',
+            name='tomcat',
+            field=models.CharField(max_length=50, null=True),
+        ),
+        migrations.AlterField(
+            model_name='dacapo',
+            name='tradebeans',
+            field=models.CharField(max_length=50, null=True),
+        ),
+        migrations.AlterField(
+            model_name='dacapo',
+            name='tradesoap',
+            field=models.CharField(max_length=50, null=True),
+        ),
+        migrations.AlterField(
+            model_name='dacapo',
+            name='xalan',
+            field=models.CharField(max_length=50, null=True),
+        ),
+        migrations.AlterField(
+            model_name='specjvm',
+            name='startup',
+            field=models.CharField(max_length=50, null=True),
+        ),
+        migrations.AlterField(
+            model_name='specjvm',
+            name='compiler',
+            field=models.CharField(max_length=50, null=True),
+        ),
+        migrations.AlterField(
+            model_name='specjvm',
+            name='compress',
+            field=models.CharField(max_length=50, null=True),
+        ),
+        migrations.AlterField(
+            model_name='specjvm',
+            name='crypto',
+            field=models.CharField(max_length=50, null=True),
+        ),
+        migrations.AlterField(
+            model_name='specjvm',
+            name='derby',
+            field=models.CharField(max_length=50, null=True),
+        ),
+        migrations.AlterField(
+            model_name='specjvm',
+            name='mpegaudio',
+            field=models.CharField(max_length=50, null=True),
+        ),
+        migrations.AlterField(
+            model_name='specjvm',
+            name='scimark',
+            field=models.CharField(max_length=50, null=True),
+        ),
+        migrations.AlterField(
+            model_name='specjvm',
+            name='serial',
+            field=models.CharField(max_length=50, null=True),
+        ),
+        migrations.AlterField(
+            model_name='specjvm',
+            name='sunflow',
+            field=models.CharField(max_length=50, null=True),
+        ),
+        migrations.AlterField(
+            model_name='specjvm',
+            name='xml',
+            field=models.CharField(max_length=50, null=True),
+        ),
+        migrations.AddField(
+            model_name='dacapo',
+            name='avrora_status',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'ok'), (1, 'missing'), (2, 'interpt/failed')], default=0),
+        ),
+        migrations.AddField(
+            model_name='dacapo',
+            name='batik_status',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'ok'), (1, 'missing'), (2, 'interpt/failed')], default=0),
+        ),
+        migrations.AddField(
+            model_name='dacapo',
+            name='eclipse_status',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'ok'), (1, 'missing'), (2, 'interpt/failed')], default=0),
+        ),
+        migrations.AddField(
+            model_name='dacapo',
+            name='fop_status',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'ok'), (1, 'missing'), (2, 'interpt/failed')], default=0),
+        ),
+        migrations.AddField(
+            model_name='dacapo',
+            name='h2_status',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'ok'), (1, 'missing'), (2, 'interpt/failed')], default=0),
+        ),
+        migrations.AddField(
+            model_name='dacapo',
+            name='jython_status',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'ok'), (1, 'missing'), (2, 'interpt/failed')], default=0),
+        ),
+        migrations.AddField(
+            model_name='dacapo',
+            name='luindex_status',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'ok'), (1, 'missing'), (2, 'interpt/failed')], default=0),
+        ),
+        migrations.AddField(
+            model_name='dacapo',
+            name='lusearch_status',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'ok'), (1, 'missing'), (2, 'interpt/failed')], default=0),
+        ),
+        migrations.AddField(
+            model_name='dacapo',
+            name='pmd_status',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'ok'), (1, 'missing'), (2, 'interpt/failed')], default=0),
+        ),
+        migrations.AddField(
+            model_name='dacapo',
+            name='sunflow_status',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'ok'), (1, 'missing'), (2, 'interpt/failed')], default=0),
+        ),
+        migrations.AddField(
+            model_name='dacapo',
+            name='tomcat_status',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'ok'), (1, 'missing'), (2, 'interpt/failed')], default=0),
+        ),
+        migrations.AddField(
+            model_name='dacapo',
+            name='tradebeans_status',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'ok'), (1, 'missing'), (2, 'interpt/failed')], default=0),
+        ),
+        migrations.AddField(
+            model_name='dacapo',
+            name='tradesoap_status',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'ok'), (1, 'missing'), (2, 'interpt/failed')], default=0),
+        ),
+        migrations.AddField(
+            model_name='dacapo',
+            name='xalan_status',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'ok'), (1, 'missing'), (2, 'interpt/failed')], default=0),
+        ),
+        migrations.AddField(
+            model_name='specjvm',
+            name='startup_status',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'ok'), (1, 'missing'), (2, 'interpt/failed')], default=0),
+        ),
+        migrations.AddField(
+            model_name='specjvm',
+            name='compiler_status',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'ok'), (1, 'missing'), (2, 'interpt/failed')], default=0),
+        ),
+        migrations.AddField(
+            model_name='specjvm',
+            name='compress_status',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'ok'), (1, 'missing'), (2, 'interpt/failed')], default=0),
+        ),
+        migrations.AddField(
+            model_name='specjvm',
+            name='crypto_status',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'ok'), (1, 'missing'), (2, 'interpt/failed')], default=0),
+        ),
+        migrations.AddField(
+            model_name='specjvm',
+            name='derby_status',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'ok'), (1, 'missing'), (2, 'interpt/failed')], default=0),
+        ),
+        migrations.AddField(
+            model_name='specjvm',
+            name='mpegaudio_status',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'ok'), (1, 'missing'), (2, 'interpt/failed')], default=0),
+        ),
+        migrations.AddField(
+            model_name='specjvm',
+            name='scimark_status',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'ok'), (1, 'missing'), (2, 'interpt/failed')], default=0),
+        ),
+        migrations.AddField(
+            model_name='specjvm',
+            name='serial_status',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'ok'), (1, 'missing'), (2, 'interpt/failed')], default=0),
+        ),
+        migrations.AddField(
+            model_name='specjvm',
+            name='sunflow_status',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'ok'), (1, 'missing'), (2, 'interpt/failed')], default=0),
+        ),
+        migrations.AddField(
+            model_name='specjvm',
+            name='xml_status',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'ok'), (1, 'missing'), (2, 'interpt/failed')], default=0),
+        ),
+        migrations.RunPython(to_typed_scores, to_text_scores),
+        migrations.AlterField(
+            model_name='dacapo',
+            name='avrora',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='dacapo',
+            name='batik',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='dacapo',
+            name='eclipse',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='dacapo',
+            name='fop',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='dacapo',
+            name='h2',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='dacapo',
+            name='jython',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='dacapo',
+            name='luindex',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='dacapo',
+            name='lusearch',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='dacapo',
+            name='pmd',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='dacapo',
+            name='sunflow',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='dacapo',
+            name='tomcat',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='dacapo',
+            name='tradebeans',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='dacapo',
+            name='tradesoap',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='dacapo',
+            name='xalan',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='specjvm',
+            name='startup',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='specjvm',
+            name='compiler',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='specjvm',
+            name='compress',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='specjvm',
+            name='crypto',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='specjvm',
+            name='derby',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='specjvm',
+            name='mpegaudio',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='specjvm',
+            name='scimark',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='specjvm',
+            name='serial',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='specjvm',
+            name='sunflow',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='specjvm',
+            name='xml',
+            field=models.FloatField(null=True),
+        ),
+    ]
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 15:09
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+# (suite, table of the suite, the score columns of the table, which are also the names of the sub-benchmarks)
+SUITE_TABLES = [
+    ('dacapo', 'Dacapo', [
+        'avrora', 'batik', 'eclipse', 'fop', 'h2', 'jython', 'luindex', 'lusearch', 'pmd', 'sunflow', 'tomcat',
+        'tradebeans', 'tradesoap', 'xalan']),
+    ('specjvm', 'Specjvm', [
+        'startup', 'compiler', 'compress', 'crypto', 'derby', 'mpegaudio', 'scimark', 'serial', 'sunflow', 'xml']),
+]
+
+BATCH_SIZE = 500
+
+
+def move_to_runs(apps, schema_editor):
+
+    """
+    Copies every row of the tables Dacapo and Specjvm to a Run (one per job, revision and details)
+    and one Result per score column
+    """
+
+    Run = apps.get_model('visualizer', 'Run')
+    Result = apps.get_model('visualizer', 'Result')
+
+    runs = {}
+    for suite, table, columns in SUITE_TABLES:
+        results = []
+        for row in apps.get_model('visualizer', table).objects.all().iterator():
+            key = (row.job_id, row.revision, row.details)
+            if key not in runs:
+                runs[key] = Run.objects.create(
+                    job_id=row.job_id, build_no=row.build_no, timestamp=row.timestamp, revision=row.revision,
+                    details=row.details)
+            run = runs[key]
+
+            for column in columns:
+                results.append(Result(
+                    run_id=run.id, job_id=run.job_id, timestamp=run.timestamp, suite=suite, benchmark=column,
+                    score=getattr(row, column), status=getattr(row, column + '_status')))
+
+        Result.objects.bulk_create(results, batch_size=BATCH_SIZE)
+
+
+def move_to_suite_tables(apps, schema_editor):
+
+    Result = apps.get_model('visualizer', 'Result')
+
+    for suite, table, columns in SUITE_TABLES:
+        model = apps.get_model('visualizer', table)
+
+        rows = {}
+        for run in apps.get_model('visualizer', 'Run').objects.all().iterator():
+            row = model(
+                job_id=run.job_id, build_no=run.build_no, timestamp=run.timestamp, revision=run.revision,
+                details=run.details)
+            for column in columns:
+                # benchmarks without a result in the run are missing
+                setattr(row, column + '_status', 1)
+            rows[run.id] = row
+
+        for result in Result.objects.filter(suite=suite, benchmark__in=columns).iterator():
+            setattr(rows[result.run_id], result.benchmark, result.score)
+            setattr(rows[result.run_id], result.benchmark + '_status', result.status)
+
+        model.objects.bulk_create(rows.values(), batch_size=BATCH_SIZE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('visualizer', '0004_typed_scores'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Run',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('build_no', models.IntegerField(default=0)),
+                ('timestamp', models.DateTimeField()),
+                ('revision', models.CharField(default='0', max_length=50)),
+                ('details', models.CharField(default='default', max_length=50)),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='visualizer.Job')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Result',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('timestamp', models.DateTimeField()),
+                ('suite', models.CharField(max_length=20)),
+                ('benchmark', models.CharField(max_length=50)),
+                ('score', models.FloatField(null=True)),
+                ('status', models.PositiveSmallIntegerField(choices=[(0, 'ok'), (1, 'missing'), (2, 'interpt/failed')], default=0)),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='visualizer.Job')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='result',
+            name='run',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='visualizer.Run'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='run',
+            unique_together=set([('job', 'revision', 'details')]),
+        ),
+        migrations.AlterUniqueTogether(
+            name='result',
+            unique_together=set([('run', 'suite', 'benchmark')]),
+        ),
+        migrations.AddIndex(
+            model_name='result',
+            index=models.Index(fields=['job', 'suite', 'benchmark', 'timestamp'], name='result_history_idx'),
+        ),
+        migrations.RunPython(move_to_runs, move_to_suite_tables),
+        migrations.AlterUniqueTogether(
+            name='dacapo',
+            unique_together=set([]),
+        ),
+        migrations.RemoveField(
+            model_name='dacapo',
+            name='job',
+        ),
+        migrations.AlterUniqueTogether(
+            name='specjvm',
+            unique_together=set([]),
+        ),
+        migrations.RemoveField(
+            model_name='specjvm',
+            name='job',
+        ),
+        migrations.DeleteModel(
+            name='Dacapo',
+        ),
+        migrations.DeleteModel(
+            name='Specjvm',
+        ),
+    ]
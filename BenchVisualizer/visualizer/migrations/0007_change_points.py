@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 15:15
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('visualizer', '0006_run_job_timestamp_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Baseline',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('suite', models.CharField(max_length=20)),
+                ('benchmark', models.CharField(max_length=50)),
+                ('median', models.FloatField(null=True)),
+                ('mad', models.FloatField(null=True)),
+                ('count', models.IntegerField(default=0)),
+                ('start', models.DateTimeField(blank=True, null=True)),
+                ('analysed', models.DateTimeField(blank=True, null=True)),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='visualizer.Job')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ChangePoint',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('suite', models.CharField(max_length=20)),
+                ('benchmark', models.CharField(max_length=50)),
+                ('timestamp', models.DateTimeField()),
+                ('direction', models.CharField(choices=[('regression', 'Regression'), ('improvement', 'Improvement')], max_length=12)),
+                ('baseline', models.FloatField()),
+                ('score', models.FloatField()),
+                ('magnitude', models.FloatField()),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='visualizer.Job')),
+                ('previous_run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='visualizer.Run')),
+                ('run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='visualizer.Run')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='changepoint',
+            index=models.Index(fields=['job', 'timestamp'], name='changepoint_job_timestamp_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='changepoint',
+            unique_together=set([('run', 'suite', 'benchmark')]),
+        ),
+        migrations.AlterUniqueTogether(
+            name='baseline',
+            unique_together=set([('job', 'suite', 'benchmark')]),
+        ),
+    ]
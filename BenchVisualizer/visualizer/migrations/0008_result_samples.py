@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 15:20
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('visualizer', '0007_change_points'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='result',
+            name='samples',
+            field=models.BinaryField(null=True),
+        ),
+        migrations.AddField(
+            model_name='result',
+            name='warmups',
+            field=models.BinaryField(null=True),
+        ),
+    ]
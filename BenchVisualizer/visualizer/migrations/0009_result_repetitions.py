@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 18:05
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('visualizer', '0008_result_samples'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='result',
+            name='repetitions',
+            field=models.BinaryField(null=True),
+        ),
+        migrations.AddField(
+            model_name='result',
+            name='mad',
+            field=models.FloatField(null=True),
+        ),
+    ]
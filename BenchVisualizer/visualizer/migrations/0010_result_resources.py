@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 19:10
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('visualizer', '0009_result_repetitions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='result',
+            name='wall_time',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AddField(
+            model_name='result',
+            name='user_time',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AddField(
+            model_name='result',
+            name='system_time',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AddField(
+            model_name='result',
+            name='max_rss',
+            field=models.BigIntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='result',
+            name='exit_status',
+            field=models.SmallIntegerField(null=True),
+        ),
+    ]
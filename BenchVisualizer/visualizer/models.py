@@ -2,75 +2,247 @@
 from __future__ import unicode_literals
 
 from django.db import models
+from django.utils import timezone
+import math
+import struct
 
 # Create your models here.
 
 '''
 Job table: Holds meta-data about Jenkins Jobs. Job name is unique.
+It also holds the high-water mark of the incremental Jenkins sync (the last ingested build and its timestamp)
 
-Dacapo table: Holds all the sets of Dacapo benchmarks, related to the Jobs. 
-The triple of (job,revisision, details) must be unique
+Run table: One run of the benchmarks for a Job: a Jenkins build, or a run of addBenchToJob (tagged).
+The triple of (job,revisision, details) must be unique.
 
-Specjvm table: Similar to Dacapo table, but holds the sets of specjvm results
+Result table: The result of one sub-benchmark of a run, one row per (run, suite, benchmark), for example
+(run, "dacapo", "avrora"). The suites and their sub-benchmarks are listed in BenchMiner.SUITES.
+Every score (msec for dacapo, ops/m for specjvm) is stored as a number, along with the status of the sub-benchmark.
+The score is NULL when the sub-benchmark is missing or failed.
+The samples of the measured iterations and of the warmups are stored packed in the row (see pack_samples()),
+NULL when the console did not print them.
+A sub-benchmark that ran many times (addBenchToJob --repeat) stores the median of the scores of its repetitions as its
+score, the scores of all the repetitions (packed) and their median absolute deviation (MAD), which estimates its noise.
+A sub-benchmark run locally by addBenchToJob also stores the resources its process used (the median over its
+repetitions), and its exit status.
+The history of a benchmark of a Job is read from the index on (job, suite, benchmark, timestamp)
+
+Baseline table: The state of the change-point detection for each benchmark of a Job: the median and MAD of its recent
+successful scores, the start of its current segment (the run of its latest change) and the last run tested.
+
+ChangePoint table: The regressions and improvements found by the change-point detection. A change is between the last
+run before it (previous_run) and its first run (run), so the revision range of the change is
+(previous_run.revision, run.revision]. The magnitude is the change of the median score, relative to the baseline.
+
+IngestTask table: The queue of the Jenkins ingestions submitted from the web UI (registration or refresh of a job),
+processed in the background by the ingestWorker command. It also holds the progress of each ingestion
 
 '''
 
+# status of the result of a sub-benchmark
+STATUS_OK = 0
+STATUS_MISSING = 1
+STATUS_FAILED = 2
+
+# the labels are the values returned by BenchMiner for the sub-benchmarks without a result
+STATUSES = ((STATUS_OK, "ok"), (STATUS_MISSING, "missing"), (STATUS_FAILED, "interpt/failed"))
+
+
+def parse_score(raw_score):
+
+    '''
+    Converts a result of BenchMiner to a tuple (score, status). The score is None for a missing or failed sub-benchmark
+    '''
+
+    if raw_score == "missing":
+        return None, STATUS_MISSING
+
+    try:
+        score = float(raw_score)
+    except (TypeError, ValueError):
+        # "interpt/failed", or a result line that could not be read
+        return None, STATUS_FAILED
+
+    if math.isnan(score) or math.isinf(score):
+        return None, STATUS_FAILED
+
+    return score, STATUS_OK
+
+
+def format_score(score, status):
+
+    '''
+    Converts a stored (score, status) back to the format of BenchMiner: the score as a string (without a trailing ".0"
+    for whole numbers) or the label of the status
+    '''
+
+    if score is None or status != STATUS_OK:
+        return dict(STATUSES)[STATUS_MISSING if status == STATUS_MISSING else STATUS_FAILED]
+
+    if score == int(score):
+        return str(int(score))
+
+    return repr(score)
+
+
+def pack_samples(samples):
+
+    '''
+    Packs a list of samples to a compact binary string: little-endian 64-bit floats, 8 bytes per sample.
+    An empty list is packed to None (NULL)
+    '''
+
+    if not samples:
+        return None
+
+    return struct.pack("<%dd" % len(samples), *samples)
+
+
+def unpack_samples(packed):
+
+    '''
+    Unpacks the samples of pack_samples() to a list of floats (empty for NULL)
+    '''
+
+    if not packed:
+        return []
+
+    packed = bytes(packed)
+    return list(struct.unpack("<%dd" % (len(packed) // 8), packed))
+
+
 class Job(models.Model):
     name = models.CharField(max_length=50, default="n/a", unique=True)
     description = models.CharField(max_length=50, default="n/a")
     is_running = models.CharField(max_length=5, default="n/a")
     is_enabled = models.CharField(max_length=5, default="n/a")
+    last_build_no = models.IntegerField(default=0)
+    last_build_timestamp = models.DateTimeField(null=True, blank=True)
+    # the last time the benchmarks of the job changed (the Last-Modified time of its pages)
+    updated_at = models.DateTimeField(default=timezone.now)
 
     def __str__(self):
         return self.name
 
-class Dacapo(models.Model):
-    job = models.ForeignKey(Job, on_delete=models.CASCADE, default=1)
+class Run(models.Model):
+    job = models.ForeignKey(Job, on_delete=models.CASCADE)
     build_no = models.IntegerField(default=0)
     timestamp = models.DateTimeField()
     revision = models.CharField(max_length=50, default="0")
     details = models.CharField(max_length=50, default="default")
-    avrora = models.CharField(max_length=50, default="0")
-    batik = models.CharField(max_length=50, default="0")
-    eclipse = models.CharField(max_length=50, default="0")
-    fop = models.CharField(max_length=50, default="0")
-    h2 = models.CharField(max_length=50, default="0")
-    jython = models.CharField(max_length=50, default="0")
-    luindex = models.CharField(max_length=50, default="0")
-    lusearch = models.CharField(max_length=50, default="0")
-    pmd = models.CharField(max_length=50, default="0")
-    sunflow = models.CharField(max_length=50, default="0")
-    tomcat = models.CharField(max_length=50, default="0")
-    tradebeans = models.CharField(max_length=50, default="0")
-    tradesoap = models.CharField(max_length=50, default="0")
-    xalan = models.CharField(max_length=50, default="0")
 
     class Meta:
         unique_together = ('job', 'revision', 'details')
+        indexes = [
+            # the most recent runs of a job
+            models.Index(fields=['job', 'timestamp'], name='run_job_timestamp_idx'),
+        ]
 
     def __str__(self):
         return str(self.job) + str(self.build_no)
 
 
-class Specjvm(models.Model):
-    job = models.ForeignKey(Job, on_delete=models.CASCADE, default=1)
-    build_no = models.IntegerField(default=0)
+class Result(models.Model):
+    run = models.ForeignKey(Run, on_delete=models.CASCADE)
+    # copies of the job and timestamp of the run, so that the history of a benchmark is read from one index
+    job = models.ForeignKey(Job, on_delete=models.CASCADE)
     timestamp = models.DateTimeField()
-    revision = models.CharField(max_length=50, default="0")
-    details = models.CharField(max_length=50, default="default")
-    startup = models.CharField(max_length=50, default="0")
-    compiler = models.CharField(max_length=50, default="0")
-    compress = models.CharField(max_length=50, default="0")
-    crypto = models.CharField(max_length=50, default="0")
-    derby = models.CharField(max_length=50, default="0")
-    mpegaudio = models.CharField(max_length=50, default="0")
-    scimark = models.CharField(max_length=50, default="0")
-    serial = models.CharField(max_length=50, default="0")
-    sunflow = models.CharField(max_length=50, default="0")
-    xml = models.CharField(max_length=50, default="0")
+    suite = models.CharField(max_length=20)
+    benchmark = models.CharField(max_length=50)
+    score = models.FloatField(null=True)
+    status = models.PositiveSmallIntegerField(choices=STATUSES, default=STATUS_OK)
+    samples = models.BinaryField(null=True)
+    warmups = models.BinaryField(null=True)
+    # the scores of the repetitions of a sub-benchmark run many times (packed), and their MAD, NULL when it ran once
+    repetitions = models.BinaryField(null=True)
+    mad = models.FloatField(null=True)
+    # the resources used by the process of a sub-benchmark run locally, NULL for the Jenkins builds: wall, user and
+    # system CPU time (s), peak resident set size (KiB) and exit status (negative: killed by that signal)
+    wall_time = models.FloatField(null=True)
+    user_time = models.FloatField(null=True)
+    system_time = models.FloatField(null=True)
+    max_rss = models.BigIntegerField(null=True)
+    exit_status = models.SmallIntegerField(null=True)
 
     class Meta:
-        unique_together = ('job', 'revision', 'details')
+        unique_together = ('run', 'suite', 'benchmark')
+        indexes = [
+            models.Index(fields=['job', 'suite', 'benchmark', 'timestamp'], name='result_history_idx'),
+        ]
 
     def __str__(self):
-        return str(self.job) + str(self.build_no)
+        return str(self.run) + " " + self.suite + "/" + self.benchmark
+
+
+class Baseline(models.Model):
+    job = models.ForeignKey(Job, on_delete=models.CASCADE)
+    suite = models.CharField(max_length=20)
+    benchmark = models.CharField(max_length=50)
+    median = models.FloatField(null=True)
+    mad = models.FloatField(null=True)
+    count = models.IntegerField(default=0)
+    # the timestamp of the first run of the current segment (NULL: no change found yet)
+    start = models.DateTimeField(null=True, blank=True)
+    # the timestamp of the last run tested as the start of a change (NULL: none tested yet)
+    analysed = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        unique_together = ('job', 'suite', 'benchmark')
+
+    def __str__(self):
+        return str(self.job) + " " + self.suite + "/" + self.benchmark
+
+
+class ChangePoint(models.Model):
+    REGRESSION = "regression"
+    IMPROVEMENT = "improvement"
+    DIRECTIONS = ((REGRESSION, "Regression"), (IMPROVEMENT, "Improvement"))
+
+    job = models.ForeignKey(Job, on_delete=models.CASCADE)
+    suite = models.CharField(max_length=20)
+    benchmark = models.CharField(max_length=50)
+    # the first run after the change, and the last successful run before it
+    run = models.ForeignKey(Run, on_delete=models.CASCADE)
+    previous_run = models.ForeignKey(Run, on_delete=models.CASCADE, related_name='+')
+    # a copy of the timestamp of the run, so that the latest changes of a job are read from one index
+    timestamp = models.DateTimeField()
+    direction = models.CharField(max_length=12, choices=DIRECTIONS)
+    baseline = models.FloatField()
+    score = models.FloatField()
+    magnitude = models.FloatField()
+
+    class Meta:
+        unique_together = ('run', 'suite', 'benchmark')
+        indexes = [
+            models.Index(fields=['job', 'timestamp'], name='changepoint_job_timestamp_idx'),
+        ]
+
+    def __str__(self):
+        return str(self.run) + " " + self.suite + "/" + self.benchmark + " " + self.direction
+
+
+class IngestTask(models.Model):
+    SYNC = "sync"
+    REFRESH = "refresh"
+    MODES = ((SYNC, "Incremental sync"), (REFRESH, "Refresh"))
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUSES = ((QUEUED, "Queued"), (RUNNING, "Running"), (DONE, "Done"), (FAILED, "Failed"))
+
+    job_name = models.CharField(max_length=50)
+    mode = models.CharField(max_length=10, choices=MODES, default=SYNC)
+    status = models.CharField(max_length=10, choices=STATUSES, default=QUEUED, db_index=True)
+    # good builds to mine, good builds mined so far, builds skipped because they failed (or are still running)
+    builds_total = models.IntegerField(default=0)
+    builds_scanned = models.IntegerField(default=0)
+    builds_failed = models.IntegerField(default=0)
+    error = models.TextField(blank=True, default="")
+    created = models.DateTimeField(auto_now_add=True)
+    started = models.DateTimeField(null=True, blank=True)
+    finished = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return self.mode + " " + self.job_name + " (" + self.status + ")"
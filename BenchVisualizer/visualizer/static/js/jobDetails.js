@@ -1,12 +1,35 @@
 $(document).ready(function() {
     //when the page loads, do the following...
 
-    //draw the graphs
-    specjvm_data = gather_data(["startup", "compiler", "compress", "crypto", "derby", "mpegaudio", "scimark", "serial", "spec_sunflow", "xml"]);
-    draw_specjvm(specjvm_data);
+    //draw the graphs, from the runs and results of the JSON API
+    var runs = $('#runs').val();
+    var api_url = $('#api_url').val();
 
-    dacapo_data = gather_data(["avrora", "batik", "eclipse", "fop", "h2", "jython", "luindex", "lusearch", "pmd", "sunflow", "tomcat", "tradebeans", "tradesoap", "xalan"]);
-    draw_dacapo(dacapo_data);
+    //without any run to compare, there is nothing to fetch
+    var fetch = runs ? fetch_columns : function(url, callback){ callback({}); };
+
+    fetch(api_url + 'runs/?fields=id,build_no,revision,details&ids=' + runs, function(run_columns){
+        fetch(api_url + 'results/?fields=run,suite,benchmark,score,median,low,high,count,' +
+              'wall_time,user_time,system_time,max_rss,exit_status&runs=' + runs, function(result_columns){
+
+            function draw_charts(){
+                var metric = $('#metric').val();
+
+                specjvm_data = gather_data('specjvm', $('#specjvm_names').val().split(","), run_columns, result_columns, metric);
+                draw_specjvm(specjvm_data, metric);
+
+                dacapo_data = gather_data('dacapo', $('#dacapo_names').val().split(","), run_columns, result_columns, metric);
+                draw_dacapo(dacapo_data, metric);
+            }
+
+            draw_charts();
+            $("#metric").change(draw_charts);
+        });
+    });
+
+    //draw the history of the selected benchmark
+    draw_history();
+    $("#history_benchmark").change(draw_history);
 
     //add-remove button handlers
     $(".add_build").click(function(){
@@ -42,48 +65,120 @@ $(document).ready(function() {
 
  });
 
-function gather_data(bench_names){
+//fetches every page of a resource of the JSON API, then passes all its columns to callback
+function fetch_columns(url, callback){
+
+    var columns = {};
 
-    var num_bench = $('#no_bench').val();
+    function fetch_page(page_url){
+        $.getJSON(page_url, function(page){
+            $.each(page.columns, function(field, values){
+                columns[field] = (columns[field] || []).concat(values);
+            });
+
+            if(page.next){
+                fetch_page(url + '&after=' + page.next);
+            }
+            else{
+                callback(columns);
+            }
+        });
+    }
+
+    fetch_page(url);
+}
+
+//the resources used by the benchmarks run locally, by the value of the metric selection: how to read them from the
+//results of the JSON API, and the title of their axis
+var RESOURCES = {
+    wall_time: {title: 'Wall time (s)', value: function(results, row){ return results.wall_time[row]; }},
+    cpu_time: {title: 'CPU time, user + system (s)', value: function(results, row){
+        return results.user_time[row] === null ? null : results.user_time[row] + results.system_time[row];
+    }},
+    max_rss: {title: 'Peak RSS (MiB)', value: function(results, row){
+        return results.max_rss[row] === null ? null : results.max_rss[row] / 1024;
+    }}
+};
+
+function gather_data(suite, bench_names, runs, results, metric){
+
+    //the results of the suite, by run and sub-benchmark
+    var run_results = {};
+    $.each(results.run || [], function(i, run){
+        if(results.suite[i] == suite){
+            run_results[run] = run_results[run] || {};
+            run_results[run][results.benchmark[i]] = i;
+        }
+    });
 
     var data = [];
 
-    for(b = 1; b <= num_bench; b++){
+    //one trace per run, in the order of the table of the page
+    $.each($('#runs').val() ? $('#runs').val().split(",") : [], function(n, run_id){
+
+        var b = runs.id.indexOf(parseInt(run_id));
 
-        var build_no = $('#build'+b).text();
+        var build_no = runs.build_no[b];
 
-        var rev_short = $('#rev'+b).text().substring(0,7);
+        var rev_short = runs.revision[b].substring(0,7);
 
-        var tag = $('#tag'+b).text();
+        var tag = runs.details[b];
 
         var specjvm_bench = [];
+        var error_high = [];
+        var error_low = [];
+        var hover = [];
 
         for(i = 0; i < bench_names.length; i++){
-            var bench_value = $('#'+bench_names[i]+b).text()
-
-            //if there was something wrong with the benchmark, push "0"
-            if (bench_value == "missing" || bench_value == "interpt/failed")
-                specjvm_bench.push("0");
-            else
+            var row = (run_results[run_id] || {})[bench_names[i]];
+            var bench_value = row === undefined ? null : results.score[row];
+
+            if(metric in RESOURCES){
+                //the resources are known for the benchmarks run locally only, the others leave a gap
+                specjvm_bench.push(row === undefined ? null : RESOURCES[metric].value(results, row));
+                error_high.push(0);
+                error_low.push(0);
+                hover.push(row === undefined || results.exit_status[row] === null ? "" : "exit status " + results.exit_status[row]);
+            }
+            else if(bench_value !== null && results.count[row] > 1){
+                //several iterations: the bar is their median, the error bar its confidence interval
+                specjvm_bench.push(results.median[row]);
+                error_high.push(results.high[row] - results.median[row]);
+                error_low.push(results.median[row] - results.low[row]);
+                hover.push("median of " + results.count[row] + " iterations, 95% CI [" + results.low[row] + ", " + results.high[row] + "]");
+            }
+            else{
+                //if there was something wrong with the benchmark ("missing", "interpt/failed"), leave a gap
                 specjvm_bench.push(bench_value);
+                error_high.push(0);
+                error_low.push(0);
+                hover.push("");
+            }
         }
 
         var trace = {
               x: bench_names,
               y: specjvm_bench,
+              error_y: {
+                  type: 'data',
+                  symmetric: false,
+                  array: error_high,
+                  arrayminus: error_low
+              },
+              text: hover,
               name: rev_short+"_"+tag,
               type: 'bar'
         };
 
         data.push(trace);
 
-    }
+    });
 
     return data;
 
 }
 
- function draw_specjvm(data){
+ function draw_specjvm(data, metric){
 
     var layout = {
       title: 'SPECjvm benchmarks',
@@ -96,7 +191,7 @@ function gather_data(bench_names){
         }
       },
       yaxis: {
-        title: 'Ops/m',
+        title: metric in RESOURCES ? RESOURCES[metric].title : 'Ops/m',
         titlefont: {
           family: 'Courier New, monospace',
           size: 18,
@@ -107,10 +202,10 @@ function gather_data(bench_names){
     };
 
     TESTER = document.getElementById('tester');
-    Plotly.plot( TESTER, data, layout);
+    Plotly.newPlot( TESTER, data, layout);
  }
 
-  function draw_dacapo(data){
+  function draw_dacapo(data, metric){
 
     var layout = {
       title: 'Dacapo benchmarks',
@@ -123,7 +218,7 @@ function gather_data(bench_names){
         }
       },
       yaxis: {
-        title: 'Milliseconds',
+        title: metric in RESOURCES ? RESOURCES[metric].title : 'Milliseconds',
         titlefont: {
           family: 'Courier New, monospace',
           size: 18,
@@ -134,5 +229,38 @@ function gather_data(bench_names){
     };
 
     TESTER = document.getElementById('testerD');
-    Plotly.plot( TESTER, data, layout);
- }
\ No newline at end of file
+    Plotly.newPlot( TESTER, data, layout);
+ }
+
+ function draw_history(){
+
+    //the history is downsampled on the server, to one point per 3 pixels of the plot
+    var url = $('#history_url').val() + $('#history_benchmark').val() + '/?points=' + Math.round($('#history').width() / 3);
+
+    $.getJSON(url, function(history){
+
+        var trace = {
+            x: history.timestamp.map(function(timestamp){ return new Date(timestamp); }),
+            y: history.score,
+            text: history.revision.map(function(revision, i){
+                return "build " + history.build_no[i] + ", " + revision.substring(0,7);
+            }),
+            mode: 'lines+markers',
+            type: 'scatter'
+        };
+
+        var layout = {
+          title: history.suite + ' ' + history.benchmark + ' (' + history.timestamp.length + ' of ' + history.total + ' builds)',
+          yaxis: {
+            title: history.unit,
+            titlefont: {
+              family: 'Courier New, monospace',
+              size: 18,
+              color: '#7f7f7f'
+            }
+          }
+        };
+
+        Plotly.newPlot(document.getElementById('history'), [trace], layout);
+    });
+ }
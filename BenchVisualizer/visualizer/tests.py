@@ -1,12 +1,48 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
 
-#from django.test import TestCase
+from django.http import Http404
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from django.utils.http import http_date
+from datetime import timedelta
+from multiprocessing import Process
+from StringIO import StringIO
+from requests.exceptions import HTTPError
+import calendar
+import json
+import os
+import shutil
+import struct
+import tempfile
 import unittest
-from utilities import BenchMiner
+import zlib
+from utilities import BenchMiner, ConsoleCache, DatabaseManager, JenkinsConnector
+from utilities.BenchScheduler import BenchRun, BenchScheduler, Checkpoint, aggregate_results, aggregate_usage, \
+    benchmark_runs, parse_cpus, repeat_runs, select_runs
+from utilities import BenchScheduler as scheduler_module
+from utilities.ChangeDetector import detect_change_points
+from utilities.Downsampler import largest_triangle_three_buckets
+from utilities.PageCache import PageCache
+from utilities.Snapshot import save_snapshot, load_snapshot
+from utilities.Statistics import median_interval, median_mad
+from visualizer.models import Job, IngestTask, Result, ChangePoint, parse_score, format_score, pack_samples, unpack_samples, STATUS_OK, STATUS_MISSING, STATUS_FAILED
+from visualizer.management.commands.benchMinerThroughput import synthesize_console
 
 # Create your tests here.
 
+# the tests cache the pages in memory, never in the page cache of the app (CACHES of settings.py)
+test_cache = override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+
+
+def setUpModule():
+    test_cache.enable()
+
+
+def tearDownModule():
+    test_cache.disable()
+
 
 class MinerTests(unittest.TestCase):
 
@@ -83,6 +119,864 @@ class MinerTests(unittest.TestCase):
         f.close()
         self.assertEquals(spec_result, expected)
 
+    def test_mine_chunked_console_matches_whole_console(self):
+        f = open("visualizer/static/test_files/console_whole", "r")
+        console = f.read()
+        f.close()
+
+        whole_miner = BenchMiner(console)
+        # chunk boundaries fall in the middle of lines
+        chunked_miner = BenchMiner(console[i:i + 1000] for i in range(0, len(console), 1000))
+
+        self.assertEquals(chunked_miner.mine_all_specjvms(), whole_miner.mine_all_specjvms())
+        self.assertEquals(chunked_miner.mine_all_dacapos(), whole_miner.mine_all_dacapos())
+        self.assertEquals(chunked_miner.mine_all_samples(), whole_miner.mine_all_samples())
+
+    def test_mine_samples(self):
+        f = open("visualizer/static/test_files/console_whole", "r")
+        samples = BenchMiner(f.read()).mine_all_samples()
+        f.close()
+
+        # the samples of crypto.aes, crypto.rsa and crypto.signverify are combined like the composite result (21.78)
+        self.assertAlmostEqual(samples['specjvm']['crypto']['iteration'][0], 21.78, places=2)
+        self.assertEquals(samples['specjvm']['compress'], {'warmup': [24.38], 'iteration': [21.0]})
+        self.assertNotIn('derby', samples['specjvm'])
+
+        spec_miner = BenchMiner()
+        spec_miner.feed("+ mx --vm=maxine vm -jar dacapo-9.12-bach.jar h2 -n 3\n"
+                        "===== DaCapo 9.12 h2 completed warmup 1 in 5000 msec =====\n"
+                        "===== DaCapo 9.12 h2 completed warmup 2 in 4200 msec =====\n"
+                        "===== DaCapo 9.12 h2 PASSED in 4100 msec =====\n")
+        self.assertEquals(spec_miner.mine_all_samples()['dacapo'], {'h2': {'warmup': [5000, 4200], 'iteration': [4100]}})
+
+    def test_mine_fed_console(self):
+        spec_miner = BenchMiner()
+        spec_miner.feed("+ mx --vm=maxine vm -jar dacapo-9.12-bach.jar avrora\n===== DaCapo 9.12 avr")
+        spec_miner.feed("ora PASSED in 14490 msec =====\n+ mx --vm=maxine vm -jar dacapo-9.12-bach.jar batik")
+
+        spec_result = spec_miner.mine_all_dacapos()
+
+        self.assertEquals(spec_result['avrora'], "14490")
+        self.assertEquals(spec_result['batik'], "interpt/failed")
+        self.assertEquals(spec_result['xalan'], "missing")
+
+    def test_mine_synthetic_console(self):
+        console = StringIO()
+        expected_specjvm, expected_dacapo = synthesize_console(console, 200 * 1024, 0.5, 1)
+
+        spec_miner = BenchMiner(console.getvalue())
+
+        self.assertEquals(spec_miner.mine_all_specjvms(), expected_specjvm)
+        self.assertEquals(spec_miner.mine_all_dacapos(), expected_dacapo)
+
+
+class SchedulerTests(unittest.TestCase):
+
+    def test_parallel_runs_get_disjoint_cpus(self):
+        self.assertEquals(parse_cpus("0-3,8,2"), [0, 1, 2, 3, 8])
+
+        # the sleeps order the ends of the runs: run0, run2, run1, run3
+        runs = [BenchRun('dacapo', 'run' + str(i), 'sleep ' + seconds + '; echo run' + str(i) + '; exit ' + str(i),
+                         None, cores) for i, (cores, seconds) in enumerate([(2, "0.1"), (3, "0.1"), (1, "0.4"),
+                                                                            (1, "1.0"), (8, "0")])]
+        running = set()
+        overlaps = []
+
+        def on_start(run):
+            pinned = [cpu for other in running for cpu in other.cpus]
+            overlaps.append(len(running) >= 3 or any(cpu in pinned for cpu in run.cpus))
+            running.add(run)
+
+        log_dir = tempfile.mkdtemp()
+        try:
+            BenchScheduler(range(4), parallel=3, pin=False, log_dir=log_dir).run(runs, on_start, running.remove)
+            with open(os.path.join(log_dir, "dacapo-run1.log")) as log:
+                self.assertEquals(log.read(), "Executing: sleep 0.1; echo run1; exit 1\nrun1\n")
+        finally:
+            shutil.rmtree(log_dir)
+
+        self.assertEquals(overlaps, [False] * 5)
+        # run1 does not fit next to run0, so run2 and run3 start first. run4 gets all the CPUs
+        self.assertEquals([run.cpus for run in runs], [[0, 1], [0, 1, 2], [2], [3], [0, 1, 2, 3]])
+        self.assertEquals([run.returncode for run in runs], [0, 1, 2, 3, 4])
+
+    def test_sequential_runs_are_not_pinned(self):
+        run = BenchRun('dacapo', 'avrora', 'true', None, 2)
+        run.cpus = [0, 1]
+        # one at a time, a sub-benchmark has the whole machine, as in the pipeline
+        self.assertFalse(BenchScheduler(range(4)).pin)
+        self.assertEquals(BenchScheduler(range(4)).get_command(run), ["/bin/sh", "-c", "true"])
+
+        self.assertFalse(BenchScheduler(range(4), parallel=2, pin=False).pin)
+
+        # whether taskset is installed or not
+        find_executable = scheduler_module.find_executable
+        try:
+            scheduler_module.find_executable = lambda name: "/usr/bin/" + name
+            parallel = BenchScheduler(range(4), parallel=2, pin=True)
+            self.assertEquals(parallel.get_command(run), ["taskset", "-c", "0,1", "/bin/sh", "-c", "true"])
+            self.assertTrue(BenchScheduler(range(4), parallel=2).pin)
+
+            scheduler_module.find_executable = lambda name: None
+            self.assertRaises(ValueError, BenchScheduler, range(4), parallel=2)
+            self.assertFalse(BenchScheduler(range(4)).pin)
+        finally:
+            scheduler_module.find_executable = find_executable
+
+    def test_output_is_mined_as_it_finishes(self):
+        runs = [
+            BenchRun('dacapo', 'avrora', 'echo "===== DaCapo 9.12 avrora completed warmup 1 in 120 msec ====="; '
+                                         'echo "===== DaCapo 9.12 avrora PASSED in 100 msec ====="', None, 1),
+            BenchRun('specjvm', 'compress', 'echo "Noncompliant composite" "result: 10.5 ops/m"; exit 1', None, 1),
+            BenchRun('dacapo', 'batik', 'exit 1', None, 1)]
+        for run in runs:
+            run.command = "mx --vm=maxine vm -jar dacapo-9.12-bach.jar " + run.key + " >/dev/null; " + run.command
+        runs[1].command = runs[1].command.replace("dacapo-9.12-bach.jar", "SPECjvm2008.jar")
+
+        results = {}
+        usages = {}
+
+        def on_finish(run):
+            results[run.key] = run.get_result()
+            usages[run.key] = run.get_usage()
+
+        BenchScheduler([0], pin=False).run(runs, on_finish=on_finish)
+
+        self.assertEquals([usages[key]['exit_status'] for key in ('avrora', 'compress', 'batik')], [0, 1, 1])
+        for usage in usages.values():
+            self.assertTrue(usage['wall_time'] > 0 and usage['max_rss'] > 0)
+            self.assertTrue(usage['user_time'] >= 0 and usage['system_time'] >= 0)
+        self.assertEquals(results['avrora'], ("100", {'warmup': [120.0], 'iteration': [100.0]}))
+        self.assertEquals(results['compress'], ("10.5", None))
+        self.assertEquals(results['batik'], ("interpt/failed", None))
+
+    def test_checkpoint_and_selection(self):
+        runs = benchmark_runs({'MX': "mx", 'DACAPO': None, 'SPECJVM2008': None})
+        self.assertEquals([run.key for run in select_runs(runs, only="avrora,dacapo:sunflow,spec_sunflow")],
+                          ["avrora", "sunflow", "spec_sunflow"])
+        self.assertEquals(len(select_runs(runs, skip="dacapo")), 10)
+        self.assertEquals([run.key for run in select_runs(runs, only="specjvm", skip="startup, xml")][0], "compiler")
+        self.assertRaises(ValueError, select_runs, runs, "nonexistent")
+
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, "J", "checkpoint.json")
+            checkpoint = Checkpoint(path, 7)
+            self.assertFalse(checkpoint.load())
+            runs[0].returncode = 0
+            checkpoint.record(runs[0], "100", {'warmup': [], 'iteration': [100.0]})
+            checkpoint.record(runs[1], "interpt/failed", None)
+
+            resumed = Checkpoint(path, 7)
+            self.assertTrue(resumed.load())
+            self.assertEquals([run.key for run in runs if not resumed.is_finished(run)][:2], ["eclipse", "fop"])
+            self.assertEquals(resumed.finished['dacapo:avrora'],
+                              {'result': "100", 'samples': {'warmup': [], 'iteration': [100.0]}, 'returncode': 0,
+                               'usage': {'wall_time': None, 'user_time': None, 'system_time': None, 'max_rss': None,
+                                         'exit_status': 0}})
+            resumed.discard([runs[1]])
+            reloaded = Checkpoint(path, 7)
+            reloaded.load()
+            self.assertEquals(list(reloaded.finished), ["dacapo:avrora"])
+            # the checkpoint of another build of the same revision/tag
+            self.assertFalse(Checkpoint(path, 8).load())
+        finally:
+            shutil.rmtree(directory)
+
+    def test_repetitions_are_interleaved_and_aggregated(self):
+        runs = benchmark_runs({'MX': "mx", 'DACAPO': None, 'SPECJVM2008': None})
+        repeated = repeat_runs(runs, 3, seed=1)
+        self.assertEquals(len(repeated), 72)
+        # every round runs every sub-benchmark once, in its own order
+        for repetition in range(3):
+            round_runs = repeated[24 * repetition:24 * (repetition + 1)]
+            self.assertEquals(set(run.repetition for run in round_runs), set([repetition]))
+            self.assertEquals(sorted(run.key for run in round_runs), sorted(run.key for run in runs))
+        self.assertNotEqual([run.key for run in repeated[:24]], [run.key for run in repeated[24:48]])
+        self.assertEquals([run.name for run in repeated if run.key == "avrora"],
+                          ["dacapo:avrora", "dacapo:avrora#1", "dacapo:avrora#2"])
+        self.assertEquals([run.name for run in repeat_runs(runs, 3, seed=1)], [run.name for run in repeated])
+
+        self.assertEquals(aggregate_results([("120", {'warmup': [150.0], 'iteration': [120.0]}),
+                                             ("interpt/failed", None),
+                                             ("100", {'warmup': [130.0], 'iteration': [100.0]})]),
+                          ("110.0", {'warmup': [150.0, 130.0], 'iteration': [120.0, 100.0]}, [120.0, 100.0]))
+        self.assertEquals(aggregate_results([("interpt/failed", None), ("missing", None)]),
+                          ("interpt/failed", None, []))
+        self.assertEquals(aggregate_results([("10.5", None)]), ("10.5", None, [10.5]))
+
+        usage = {'wall_time': 10.0, 'user_time': 8.0, 'system_time': 1.0, 'max_rss': 1000, 'exit_status': 0}
+        self.assertEquals(aggregate_usage([usage, dict(usage, wall_time=14.0, max_rss=1100, exit_status=1), None]),
+                          {'wall_time': 12.0, 'user_time': 8.0, 'system_time': 1.0, 'max_rss': 1050, 'exit_status': 1})
+        self.assertIsNone(aggregate_usage([None]))
+
+
+class ConsoleCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_store_and_open(self):
+        cache = ConsoleCache(self.directory, 1024 * 1024)
+        cache.store('MaxinePipeline', 3, ["first chunk\n", "second chunk\n"])
+
+        console = cache.open('MaxinePipeline', 3)
+        self.assertEquals(console.read(), "first chunk\nsecond chunk\n")
+        console.close()
+
+        self.assertEquals(cache.open('MaxinePipeline', 4), None)
+        self.assertEquals(cache.keys(), [('MaxinePipeline', 3)])
+
+    def test_identical_consoles_share_an_object(self):
+        cache = ConsoleCache(self.directory, 1024 * 1024)
+        cache.store('MaxinePipeline', 1, "same console")
+        cache.store('OtherJob', 1, "same console")
+
+        objects = [name for root, dirs, files in os.walk(cache.objects_dir) for name in files]
+        self.assertEquals(len(objects), 1)
+        self.assertEquals(cache.keys(), [('MaxinePipeline', 1), ('OtherJob', 1)])
+
+    def test_least_recently_used_console_is_evicted(self):
+        # random contents do not compress, so each console takes ~1KB
+        cache = ConsoleCache(self.directory, 2500)
+        consoles = dict((build_no, os.urandom(1000)) for build_no in range(1, 4))
+
+        cache.store('MaxinePipeline', 1, consoles[1])
+        cache.store('MaxinePipeline', 2, consoles[2])
+        # make build 2 the least recently used
+        os.utime(cache.object_path(open(cache.ref_path('MaxinePipeline', 2)).read()), (0, 0))
+        cache.store('MaxinePipeline', 3, consoles[3])
+
+        self.assertEquals(cache.open('MaxinePipeline', 2), None)
+        self.assertEquals(cache.open('MaxinePipeline', 1).read(), consoles[1])
+        self.assertEquals(cache.open('MaxinePipeline', 3).read(), consoles[3])
+
+    def test_objects_are_listed_only_when_the_limit_is_crossed(self):
+        cache = ConsoleCache(self.directory, 2500)
+        evict = cache.evict
+        evictions = []
+        cache.evict = lambda: evictions.append(True) or evict()
+
+        def objects_size():
+            return sum(os.path.getsize(os.path.join(root, name))
+                       for root, dirs, files in os.walk(cache.objects_dir) for name in files)
+
+        # the first store has no running total yet
+        cache.store('MaxinePipeline', 1, os.urandom(1000))
+        cache.store('MaxinePipeline', 2, os.urandom(1000))
+        self.assertEquals(len(evictions), 1)
+        self.assertEquals(cache.read_size(), objects_size())
+
+        cache.store('MaxinePipeline', 3, os.urandom(1000))
+        self.assertEquals(len(evictions), 2)
+        self.assertEquals(cache.read_size(), objects_size())
+
+        # processes that share the cache (e.g. several ingestWorkers) keep the running total right
+        def store_consoles(job_name):
+            for build_no in range(20):
+                ConsoleCache(self.directory, 1024 * 1024).store(job_name, build_no, os.urandom(1000))
+
+        workers = [Process(target=store_consoles, args=(job_name,)) for job_name in ['First', 'Second', 'Third']]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEquals(cache.read_size(), objects_size())
+
+    def test_failed_console_download_is_not_mined_nor_cached(self):
+        connector = JenkinsConnector("http://jenkins", "user", "key", 1)
+        connector.cache = ConsoleCache(self.directory, 1024 * 1024)
+        build = {'build_no': 5, 'url': "http://jenkins/job/MaxinePipeline/5/", 'building': False, 'is_good': True,
+                 'revision': "rev5", 'timestamp': timezone.now()}
+
+        connector.jenkins = FakeServer(FakeResponse(404, b"Not Found"))
+        self.assertRaises(HTTPError, connector._mine_build, 'MaxinePipeline', build)
+        self.assertTrue(connector.jenkins.requester.response.closed)
+        self.assertEquals(connector.cache.keys(), [])
+
+
+class FakeResponse:
+
+    def __init__(self, status_code, content):
+        self.status_code = status_code
+        self.content = content
+        self.closed = False
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise HTTPError(str(self.status_code) + " Error")
+
+    def iter_content(self, chunk_size):
+        return iter([self.content])
+
+    def close(self):
+        self.closed = True
+
+
+class FakeRequester:
+
+    def __init__(self, response):
+        self.response = response
+
+    def get_url(self, url, **kwargs):
+        return self.response
+
+
+class FakeServer:
+
+    def __init__(self, response):
+        self.requester = FakeRequester(response)
+
+
+def make_build(build_no, timestamp, revision):
+    return {
+        'build_no': build_no,
+        'timestamp': timestamp,
+        'revision': revision,
+        'dacapo': dict((bench, "100") for bench in [
+            'avrora', 'batik', 'eclipse', 'fop', 'h2', 'jython', 'luindex', 'lusearch', 'pmd', 'sunflow', 'tomcat',
+            'tradebeans', 'tradesoap', 'xalan']),
+        'specjvm': dict((bench, "10") for bench in [
+            'startup', 'compiler', 'compress', 'crypto', 'derby', 'mpegaudio', 'scimark', 'serial', 'spec_sunflow',
+            'xml'])
+    }
+
+
+class BenchTestCase(TestCase):
+
+    """
+    The base of the tests over the DB: every test starts with an empty page cache, a DatabaseManager (db),
+    the current time (now) and the details of a job named MaxinePipeline (details)
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.db = DatabaseManager()
+        self.now = timezone.now()
+        self.details = {'name': 'MaxinePipeline', 'description': 'd', 'is_running': 'False', 'is_enabled': 'True'}
+
+
+class SyncTests(BenchTestCase):
+
+    def test_sync_registers_job_and_sets_watermark(self):
+        builds = [make_build(1, self.now - timedelta(days=2), "rev1"), make_build(3, self.now, "rev3")]
+
+        self.assertEquals(self.db.get_watermark('MaxinePipeline'), (0, None))
+        self.db.sync_database([{'details': self.details, 'builds': builds}])
+
+        self.assertEquals(self.db.get_watermark('MaxinePipeline'), (3, self.now))
+        self.assertEquals(Job.objects.get(name='MaxinePipeline').run_set.count(), 2)
+
+    def test_sync_appends_new_builds_and_skips_stored_revisions(self):
+        self.db.sync_database([{'details': self.details, 'builds': [make_build(1, self.now - timedelta(days=1), "rev1")]}])
+
+        builds = [make_build(2, self.now - timedelta(hours=1), "rev1"), make_build(3, self.now, "rev3")]
+        self.db.sync_database([{'details': self.details, 'builds': builds}])
+
+        stored_job = Job.objects.get(name='MaxinePipeline')
+        self.assertEquals(
+            list(stored_job.run_set.order_by('build_no').values_list('build_no', flat=True)), [1, 3])
+        self.assertEquals(self.db.get_watermark('MaxinePipeline'), (3, self.now))
+
+    def test_sync_keeps_watermark_below_running_build(self):
+        # build 2 is still running when build 3 finishes
+        first = [make_build(1, self.now - timedelta(days=1), "rev1"), make_build(3, self.now, "rev3")]
+        self.db.sync_database([{'details': self.details, 'builds': first, 'oldest_building': 2}])
+
+        self.assertEquals(self.db.get_watermark('MaxinePipeline'), (1, self.now - timedelta(days=1)))
+
+        # the next sync fetches build 2 again, once it has finished, and build 3 is skipped
+        second = [make_build(2, self.now - timedelta(hours=1), "rev2"), make_build(3, self.now, "rev3")]
+        self.db.sync_database([{'details': self.details, 'builds': second, 'oldest_building': None}])
+
+        stored_job = Job.objects.get(name='MaxinePipeline')
+        self.assertEquals(
+            list(stored_job.run_set.order_by('build_no').values_list('build_no', flat=True)), [1, 2, 3])
+        self.assertEquals(self.db.get_watermark('MaxinePipeline'), (3, self.now))
+
+    def test_bulk_store_jobs_uses_batched_inserts(self):
+        builds = [make_build(n, self.now - timedelta(hours=n), "rev" + str(n)) for n in range(1, 11)]
+
+        # savepoint, job insert, job ids, run insert, run ids, 3 batches of 100 results, release savepoint
+        # and the change-point detection: savepoint, baselines, runs, results, baselines delete and insert, release
+        with self.assertNumQueries(16):
+            self.db.bulk_store_jobs([{'details': self.details, 'builds': builds}], batch_size=100)
+
+        stored_job = Job.objects.get(name='MaxinePipeline')
+        self.assertEquals(stored_job.run_set.count(), 10)
+        self.assertEquals(stored_job.result_set.count(), 240)
+        self.assertEquals((stored_job.last_build_no, stored_job.last_build_timestamp), (1, self.now - timedelta(hours=1)))
+
+    def test_failed_refresh_keeps_old_contents(self):
+        self.db.sync_database([{'details': self.details, 'builds': [make_build(1, self.now, "rev1")]}])
+
+        other = dict(self.details, name='Other')
+        duplicated = [make_build(1, self.now, "rev1"), make_build(2, self.now, "rev1")]
+        result = self.db.refresh_database([{'details': other, 'builds': duplicated}])
+
+        self.assertTrue(result.startswith("Integrity Error"))
+        self.assertEquals(list(Job.objects.values_list('name', flat=True)), ['MaxinePipeline'])
+        self.assertEquals(Job.objects.get(name='MaxinePipeline').run_set.count(), 1)
+
+
+class ScoreTests(BenchTestCase):
+
+    def test_parse_and_format_scores(self):
+        self.assertEquals(parse_score("16847"), (16847.0, STATUS_OK))
+        self.assertEquals(parse_score("missing"), (None, STATUS_MISSING))
+        self.assertEquals(parse_score("interpt/failed"), (None, STATUS_FAILED))
+
+        self.assertEquals(format_score(16847.0, STATUS_OK), "16847")
+        self.assertEquals(format_score(12.5, STATUS_OK), "12.5")
+        self.assertEquals(format_score(None, STATUS_MISSING), "missing")
+        self.assertEquals(format_score(None, STATUS_FAILED), "interpt/failed")
+
+    def test_scores_are_stored_as_numbers(self):
+        builds = [make_build(1, timezone.now(), "rev1"), make_build(2, timezone.now(), "rev2")]
+        builds[0]['dacapo']['avrora'] = "120"
+        builds[1]['dacapo']['avrora'] = "interpt/failed"
+        builds[1]['specjvm']['xml'] = "12.25"
+        self.db.sync_database([{'details': self.details, 'builds': builds}])
+
+        stored_job = Job.objects.get(name='MaxinePipeline')
+        self.assertEquals(self.db.get_benchmarks(stored_job, "rev2")['dacapo']['avrora'], "interpt/failed")
+        self.assertEquals(self.db.get_benchmarks(stored_job, "rev2")['specjvm']['xml'], "12.25")
+
+        stats = self.db.get_benchmark_stats('MaxinePipeline')
+        self.assertEquals(stats['dacapo']['avrora'], {'min': 120, 'max': 120, 'avg': 120, 'count': 1})
+        self.assertEquals(stats['specjvm']['xml'], {'min': 10, 'max': 12.25, 'avg': 11.125, 'count': 2})
+
+
+class SampleTests(BenchTestCase):
+
+    def test_samples_are_packed(self):
+        self.assertEquals(len(pack_samples([1.5, 2.25, 3.0])), 24)
+        self.assertEquals(unpack_samples(pack_samples([1.5, 2.25, 3.0])), [1.5, 2.25, 3.0])
+        self.assertIsNone(pack_samples([]))
+        self.assertEquals(unpack_samples(None), [])
+
+    def test_median_interval(self):
+        interval = median_interval(range(100, 0, -1))
+        self.assertEquals((interval['median'], interval['low'], interval['high'], interval['count']), (50.5, 40, 61, 100))
+        self.assertEquals(median_interval([3.0, 1.0, 2.0]), {'median': 2.0, 'low': 1.0, 'high': 3.0, 'count': 3})
+        self.assertIsNone(median_interval([]))
+        self.assertEquals(median_mad([10.0, 12.0, 11.0, 30.0]), (11.5, 1.0))
+        self.assertIsNone(median_mad([]))
+
+    def test_samples_are_stored_and_compared(self):
+        builds = [make_build(1, timezone.now() - timedelta(hours=1), "rev1"), make_build(2, timezone.now(), "rev2")]
+        builds[1]['samples'] = {'dacapo': {}, 'specjvm': {'xml': {'warmup': [8.5], 'iteration': [9.5, 10.5, 10.0]}}}
+        self.db.sync_database([{'details': self.details, 'builds': builds}])
+
+        stored_job = Job.objects.get(name='MaxinePipeline')
+        self.assertEquals(self.db.get_benchmarks(stored_job, "rev2")['samples']['specjvm'],
+                          {'xml': {'warmup': [8.5], 'iteration': [9.5, 10.5, 10.0]}})
+
+        runs = self.client.get('/visualizer/MaxinePipeline/').context['runs']
+        columns = json.loads(self.client.get('/visualizer/api/v1/jobs/MaxinePipeline/results/', {
+            'runs': runs, 'suite': 'specjvm', 'benchmark': 'xml', 'fields': 'run,median,low,high,count'}).content)['columns']
+        self.assertEquals(columns['run'], [int(run_id) for run_id in reversed(runs.split(","))])
+        self.assertEquals((columns['median'], columns['low'], columns['high'], columns['count']),
+                          ([None, 10.0], [None, 9.5], [None, 10.5], [0, 3]))
+
+
+class ResultStoreTests(BenchTestCase):
+
+    def test_benchmark_history_uses_result_index(self):
+        self.db.sync_database([{'details': self.details, 'builds': [make_build(1, timezone.now(), "rev1")]}])
+
+        stored_job = Job.objects.get(name='MaxinePipeline')
+        history = Result.objects.filter(job=stored_job, suite="specjvm", benchmark="sunflow").order_by('timestamp')
+        self.assertEquals([(result.score, result.status) for result in history], [(10.0, STATUS_OK)])
+
+        bench = self.db.get_benchmarks(stored_job, "rev1")
+        self.assertEquals((bench['specjvm']['spec_sunflow'], bench['dacapo']['sunflow']), ("10", "100"))
+
+    def test_new_benchmarks_read_as_missing_for_old_runs(self):
+        self.db.sync_database([{'details': self.details, 'builds': [make_build(1, timezone.now(), "rev1")]}])
+
+        stored_job = Job.objects.get(name='MaxinePipeline')
+        Result.objects.filter(benchmark="xalan").delete()
+        self.assertEquals(self.db.get_benchmarks(stored_job, "rev1")['dacapo']['xalan'], "missing")
+
+    def test_failed_store_leaves_no_run(self):
+        stored_job = self.db.store_job(self.details)
+        build = make_build(1, self.now, "rev1")
+        build['samples'] = {'dacapo': {'h2': {'warmup': [], 'iteration': ["not a number"]}}, 'specjvm': {}}
+
+        self.assertRaises(struct.error, self.db.store_benchmarks, stored_job, build)
+        self.assertEquals(stored_job.run_set.count(), 0)
+
+        del build['samples']
+        self.db.store_benchmarks(stored_job, build)
+        self.assertEquals(self.db.get_benchmarks(stored_job, "rev1")['dacapo']['h2'], "100")
+
+    def test_results_are_stored_one_at_a_time(self):
+        stored_job = self.db.store_job(self.details)
+        self.db.store_benchmarks(stored_job, {'build_no': 0, 'revision': "rev1", 'timestamp': timezone.now()},
+                                 "local", detect=False)
+        run_id = self.db.get_benchmarks(stored_job, "rev1", "local")['id']
+        self.assertEquals(Result.objects.filter(run_id=run_id, status=STATUS_MISSING).count(), 24)
+
+        self.db.store_result(stored_job, run_id, "specjvm", "spec_sunflow", "12.5", {'warmup': [], 'iteration': [12.5]})
+        self.db.store_result(stored_job, run_id, "dacapo", "avrora", "interpt/failed")
+        self.db.store_result(stored_job, run_id, "dacapo", "avrora", "120")
+
+        bench = self.db.get_benchmarks(stored_job, "rev1", "local")
+        self.assertEquals((bench['specjvm']['spec_sunflow'], bench['dacapo']['avrora'], bench['dacapo']['h2']),
+                          ("12.5", "120", "missing"))
+        self.assertEquals(bench['samples']['specjvm'], {'spec_sunflow': {'warmup': [], 'iteration': [12.5]}})
+        self.assertEquals(Result.objects.filter(run_id=run_id).count(), 24)
+        self.assertRaises(Http404, self.db.store_result, stored_job, run_id, "dacapo", "nonexistent", "1")
+
+        self.db.store_result(stored_job, run_id, "dacapo", "h2", "101.0", None, [100.0, 104.0, 101.0])
+        result = Result.objects.get(run_id=run_id, benchmark="h2")
+        self.assertEquals((result.score, result.mad, unpack_samples(result.repetitions)), (101.0, 1.0, [100.0, 104.0, 101.0]))
+        self.assertIsNone(Result.objects.get(run_id=run_id, benchmark="avrora").mad)
+
+        self.db.store_result(stored_job, run_id, "dacapo", "pmd", "interpt/failed", None, None, {
+            'wall_time': 61.5, 'user_time': 90.25, 'system_time': 2.5, 'max_rss': 524288.0, 'exit_status': -9})
+        columns = json.loads(self.client.get('/visualizer/api/v1/jobs/MaxinePipeline/results/', {
+            'runs': run_id, 'suite': 'dacapo', 'benchmark': 'pmd',
+            'fields': 'status,wall_time,user_time,system_time,max_rss,exit_status'}).content)['columns']
+        self.assertEquals(columns, {'status': ["interpt/failed"], 'wall_time': [61.5], 'user_time': [90.25],
+                                    'system_time': [2.5], 'max_rss': [524288], 'exit_status': [-9]})
+
+
+class ComparisonFetchTests(BenchTestCase):
+
+    def setUp(self):
+        BenchTestCase.setUp(self)
+        builds = [make_build(n, self.now - timedelta(hours=50 - n), "rev" + str(n)) for n in range(1, 51)]
+        self.db.bulk_store_jobs([{'details': self.details, 'builds': builds}])
+
+    def test_last_benchmarks_in_constant_queries(self):
+        # the last two runs, then their results
+        with self.assertNumQueries(2):
+            benchmarks = self.db.get_last_benchmarks('MaxinePipeline')
+
+        self.assertEquals([bench['build_no'] for bench in benchmarks], [50, 49])
+        self.assertEquals(benchmarks[0]['dacapo']['avrora'], "100")
+
+    def test_selected_benchmarks_in_constant_queries(self):
+        revisions = ["rev7", "rev3", "rev42", "rev1", "rev20"]
+
+        with self.assertNumQueries(2):
+            benchmarks = self.db.get_selected_benchmarks('MaxinePipeline', revisions, ["default"] * 5)
+
+        self.assertEquals([bench['specjvm']['revision'] for bench in benchmarks], revisions)
+        self.assertRaises(Http404, self.db.get_selected_benchmarks, 'MaxinePipeline', ["rev7", "nope"], ["default"] * 2)
+
+
+class HistoryTests(BenchTestCase):
+
+    def setUp(self):
+        BenchTestCase.setUp(self)
+        builds = [make_build(n, self.now - timedelta(hours=300 - n), "rev" + str(n)) for n in range(1, 301)]
+        builds[149]['dacapo']['h2'] = "5000"
+        builds[10]['dacapo']['h2'] = "interpt/failed"
+        self.db.bulk_store_jobs([{'details': self.details, 'builds': builds}])
+
+    def test_lttb_keeps_ends_and_peaks(self):
+        points = [(x, 10 if x != 42 else 90) for x in range(1000)]
+        sampled = largest_triangle_three_buckets(points, 20)
+
+        self.assertEquals(len(sampled), 20)
+        self.assertEquals((sampled[0], sampled[-1]), (points[0], points[-1]))
+        self.assertIn((42, 90), sampled)
+        self.assertEquals(largest_triangle_three_buckets(points[:5], 20), points[:5])
+
+    def test_downsampled_history(self):
+        response = self.client.get('/visualizer/MaxinePipeline/history/dacapo/h2/?points=50')
+        history = json.loads(response.content)
+
+        self.assertEquals((history['total'], len(history['score']), history['unit']), (299, 50, "msec"))
+        self.assertIn(5000, history['score'])
+        self.assertEquals(history['build_no'][0], 1)
+
+    def test_history_below_three_points(self):
+        points = [(x, 10) for x in range(1000)]
+        self.assertEquals(largest_triangle_three_buckets(points, 2), [points[0], points[-1]])
+        self.assertEquals(largest_triangle_three_buckets(points, 1), [points[0]])
+
+        for value, build_nos in [("0", [1]), ("-5", [1]), ("1", [1]), ("2", [1, 300])]:
+            history = json.loads(self.client.get('/visualizer/MaxinePipeline/history/dacapo/h2/?points=' + value).content)
+            self.assertEquals((history['total'], history['build_no']), (299, build_nos))
+
+    def test_keyset_pages_cover_the_history(self):
+        url = '/visualizer/MaxinePipeline/history/dacapo/h2/?raw=1&limit=128'
+        build_nos = []
+        statuses = []
+        while url:
+            page = json.loads(self.client.get(url).content)
+            build_nos.extend(page['build_no'])
+            statuses.extend(page['status'])
+            url = '/visualizer/MaxinePipeline/history/dacapo/h2/?raw=1&limit=128&after=' + page['next'] \
+                if page['next'] else None
+
+        self.assertEquals(build_nos, range(1, 301))
+        self.assertEquals(statuses[10], "interpt/failed")
+        self.assertEquals(self.client.get('/visualizer/MaxinePipeline/history/dacapo/nope/').status_code, 404)
+
+    def test_streamed_export(self):
+        response = self.client.get('/visualizer/MaxinePipeline/export/')
+        self.assertTrue(response.streaming)
+        lines = b"".join(response.streaming_content).splitlines()
+
+        self.assertEquals(lines[0], "timestamp,build_no,revision,tag,suite,benchmark,score,status")
+        self.assertEquals(len(lines), 1 + 300 * 24)
+        self.assertEquals([line.split(",")[1:] for line in lines[1:3]],
+                          [["1", "rev1", "default", "dacapo", "avrora", "100.0", "ok"],
+                           ["1", "rev1", "default", "dacapo", "batik", "100.0", "ok"]])
+        self.assertIn(",11,rev11,default,dacapo,h2,,interpt/failed", lines[10 * 24 + 5])
+
+        since = (self.now - timedelta(hours=100)).isoformat()
+        response = self.client.get('/visualizer/MaxinePipeline/export/', {'since': since, 'revision': 'rev250,rev1',
+                                                                           'gzip': 1})
+        lines = zlib.decompress(b"".join(response.streaming_content), 16 + zlib.MAX_WBITS).splitlines()
+        self.assertEquals(set(line.split(",")[2] for line in lines[1:]), {"rev250"})
+        self.assertEquals(self.client.get('/visualizer/MaxinePipeline/export/?until=yesterday').status_code, 404)
+
+
+class ApiTests(BenchTestCase):
+
+    def setUp(self):
+        BenchTestCase.setUp(self)
+        builds = [make_build(n, self.now - timedelta(hours=10 - n), "rev" + str(n)) for n in range(1, 6)]
+        self.db.bulk_store_jobs([{'details': self.details, 'builds': builds}])
+
+    def get(self, url, **params):
+        return json.loads(self.client.get('/visualizer/api/v1/' + url, params).content)
+
+    def test_selected_fields_as_columns(self):
+        jobs = self.get('jobs/', fields='name,last_build_no')
+        self.assertEquals(jobs, {'version': 1, 'count': 1, 'next': None,
+                                 'columns': {'name': ['MaxinePipeline'], 'last_build_no': [5]}})
+
+        runs = self.get('jobs/MaxinePipeline/runs/', fields='id,build_no,revision')['columns']
+        self.assertEquals(runs['build_no'], [1, 2, 3, 4, 5])
+
+        results = self.get('jobs/MaxinePipeline/results/', runs=",".join(str(run_id) for run_id in runs['id'][-2:]),
+                           suite='dacapo', fields='run,benchmark,score,status')
+        self.assertEquals(results['count'], 28)
+        self.assertEquals(set(results['columns']), {'run', 'benchmark', 'score', 'status'})
+        self.assertEquals((results['columns']['score'][0], results['columns']['status'][0]), (100.0, "ok"))
+
+        self.assertEquals(self.client.get('/visualizer/api/v1/jobs/MaxinePipeline/runs/?fields=secret').status_code, 404)
+        self.assertEquals(self.client.get('/visualizer/api/v1/jobs/Unknown/results/').status_code, 404)
+
+    def test_keyset_pages_cover_the_results(self):
+        ids, after = [], None
+        while True:
+            params = {'fields': 'id', 'limit': 7}
+            if after:
+                params['after'] = after
+            # the job and the page of results (the validators of the job are cached)
+            with self.assertNumQueries(2 if ids else 3):
+                page = self.get('jobs/MaxinePipeline/results/', **params)
+            ids.extend(page['columns']['id'])
+            after = page['next']
+            if after is None:
+                break
+
+        self.assertEquals(sorted(ids), sorted(Result.objects.values_list('id', flat=True)))
+        self.assertEquals(len(ids), 5 * 24)
+
+
+class ChangePointTests(BenchTestCase):
+
+    def make_builds(self, first, last):
+        # h2 (msec) slows down from build 30, compress (ops/m) speeds up from build 45, with some noise
+        builds = []
+        for n in range(first, last + 1):
+            build = make_build(n, self.now - timedelta(hours=100 - n), "rev" + str(n))
+            build['dacapo']['h2'] = str((100 if n < 30 else 130) + n % 3)
+            build['specjvm']['compress'] = str((10 if n < 45 else 12) + (n % 2) * 0.1)
+            builds.append(build)
+        return builds
+
+    def test_step_test_is_vectorized_and_incremental(self):
+        scores = [[10, 11, 10, 9, 10, 11, 10, 20, 21, 20, 19], [5] * 11]
+        changes, start, analysed = detect_change_points(scores, [0, 0], [0, 0], min_baseline=5, confirm=3)
+
+        self.assertEquals([change[:3] for change in changes], [(0, 7, 6)])
+        self.assertEquals((list(start), analysed), ([7, 0], 9))
+        # with a new run, only the columns not tested yet are tested, from the returned state
+        scores = [row + [20] for row in scores[:1]] + [[5] * 12]
+        self.assertEquals(detect_change_points(scores, start, [analysed, analysed], min_baseline=5, confirm=3)[0], [])
+
+    def test_ingest_flags_regressions_and_improvements(self):
+        self.db.bulk_store_jobs([{'details': self.details, 'builds': self.make_builds(1, 40)}])
+        self.db.sync_database([{'details': self.details, 'builds': self.make_builds(41, 60)}])
+
+        changes = self.db.get_change_points('MaxinePipeline')
+        self.assertEquals(
+            [(change['benchmark'], change['direction'], change['from_build_no'], change['to_build_no'])
+             for change in changes],
+            [('compress', ChangePoint.IMPROVEMENT, 44, 45), ('h2', ChangePoint.REGRESSION, 29, 30)])
+        self.assertAlmostEqual(changes[1]['magnitude'], 0.3, delta=0.02)
+
+    def test_updated_build_is_tested_again(self):
+        self.db.bulk_store_jobs([{'details': self.details, 'builds': self.make_builds(1, 40)}])
+        stored_job = Job.objects.get(name='MaxinePipeline')
+
+        # the builds 30 to 32 are fixed: the regression starts at build 33
+        for n in range(30, 33):
+            self.db.update_build_benchmarks(stored_job, n, dict(make_build(n, None, None), dacapo=dict(
+                make_build(n, None, None)['dacapo'], h2="100")))
+
+        changes = self.db.get_change_points('MaxinePipeline', ChangePoint.REGRESSION)
+        self.assertEquals([(change['benchmark'], change['to_build_no']) for change in changes], [('h2', 33)])
+
+
+class PageCacheTests(BenchTestCase):
+
+    def setUp(self):
+        BenchTestCase.setUp(self)
+        builds = [make_build(n, self.now - timedelta(hours=10 - n), "rev" + str(n)) for n in range(1, 3)]
+        self.db.bulk_store_jobs([{'details': self.details, 'builds': builds}])
+
+    def test_index_is_cached_until_jobs_change(self):
+        self.client.get('/visualizer/')
+        with self.assertNumQueries(0):
+            self.assertIn("MaxinePipeline", self.client.get('/visualizer/').content)
+
+        self.db.sync_database([{'details': dict(self.details, name='Other'), 'builds': []}])
+        self.assertIn("Other", self.client.get('/visualizer/').content)
+
+    def test_job_details_are_cached_per_job_version(self):
+        self.db.sync_database([{'details': dict(self.details, name='Other'), 'builds': []}])
+        self.client.get('/visualizer/MaxinePipeline/')
+        self.client.get('/visualizer/Other/')
+        with self.assertNumQueries(0):
+            self.assertEquals(self.client.get('/visualizer/MaxinePipeline/').context['benchmarks'][0]['build_no'], 2)
+
+        self.db.store_benchmarks(Job.objects.get(name='MaxinePipeline'), make_build(3, self.now, "rev3"))
+        self.assertEquals(self.client.get('/visualizer/MaxinePipeline/').context['benchmarks'][0]['build_no'], 3)
+        # the pages of the other jobs stay cached
+        with self.assertNumQueries(0):
+            self.client.get('/visualizer/Other/')
+
+    def test_pages_of_another_deploy_are_not_served(self):
+        old, new = PageCache(salt="old-deploy"), PageCache(salt="new-deploy")
+        old.set("old page", 'jobDetails', 'MaxinePipeline')
+
+        self.assertEquals(old.get('jobDetails', 'MaxinePipeline'), "old page")
+        self.assertIsNone(new.get('jobDetails', 'MaxinePipeline'))
+        self.assertNotEquals(old.tag('MaxinePipeline'), new.tag('MaxinePipeline'))
+
+        with self.settings(PAGE_CACHE_SALT="old-deploy"):
+            self.assertEquals(PageCache().tag('MaxinePipeline'), old.tag('MaxinePipeline'))
+
+    def test_conditional_get(self):
+        an_hour_ago = http_date(calendar.timegm((self.now - timedelta(hours=1)).utctimetuple()))
+        Job.objects.filter(name='MaxinePipeline').update(updated_at=self.now - timedelta(hours=1))
+
+        response = self.client.get('/visualizer/MaxinePipeline/')
+        etag, last_modified = response['ETag'], response['Last-Modified']
+        self.assertEquals(last_modified, an_hour_ago)
+
+        with self.assertNumQueries(0):
+            response = self.client.get('/visualizer/MaxinePipeline/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEquals(response.status_code, 304)
+        self.assertEquals(self.client.get('/visualizer/MaxinePipeline/changes/',
+                                          HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+
+        # updating an older build changes both validators
+        stored_job = Job.objects.get(name='MaxinePipeline')
+        self.db.update_build_benchmarks(stored_job, 1, make_build(1, self.now, "rev1"))
+        response = self.client.get('/visualizer/MaxinePipeline/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEquals(response.status_code, 200)
+        self.assertNotEquals(response['ETag'], etag)
+        self.assertEquals(self.client.get('/visualizer/MaxinePipeline/changes/',
+                                          HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 200)
+        self.assertEquals(self.client.get('/visualizer/Unknown/', HTTP_IF_NONE_MATCH=etag).status_code, 404)
+
+        # and so does storing the result of a single benchmark
+        Job.objects.filter(name='MaxinePipeline').update(updated_at=self.now - timedelta(hours=1))
+        self.db.store_result(stored_job, stored_job.run_set.get(build_no=2).id, 'dacapo', 'h2', "90")
+        self.assertEquals(self.client.get('/visualizer/MaxinePipeline/changes/',
+                                          HTTP_IF_MODIFIED_SINCE=an_hour_ago).status_code, 200)
+
+
+class SnapshotTests(BenchTestCase):
+
+    def setUp(self):
+        BenchTestCase.setUp(self)
+        self.directory = tempfile.mkdtemp()
+        builds = [make_build(n, self.now - timedelta(hours=10 - n), "rev" + str(n)) for n in range(1, 4)]
+        builds[1]['dacapo']['h2'] = "interpt/failed"
+        builds[2]['samples'] = {'dacapo': {}, 'specjvm': {'xml': {'warmup': [8.5], 'iteration': [9.5, 10.5]}}}
+        self.db.bulk_store_jobs([{'details': self.details, 'builds': builds},
+                                 {'details': dict(self.details, name='Other'), 'builds': builds[:1]}])
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_snapshot_round_trip(self):
+        for path in [os.path.join(self.directory, "snapshot.npz"), os.path.join(self.directory, "snapshot")]:
+            save_snapshot(path, self.db.get_snapshot())
+            self.db.clear_database()
+
+            self.assertEquals(self.db.store_snapshot(load_snapshot(path, mmap_mode='r')), (['MaxinePipeline', 'Other'], []))
+
+            stored_job = Job.objects.get(name='MaxinePipeline')
+            self.assertEquals(stored_job.last_build_no, 3)
+            self.assertEquals(self.db.get_benchmarks(stored_job, "rev2")['dacapo']['h2'], "interpt/failed")
+            self.assertEquals(self.db.get_benchmarks(stored_job, "rev3")['samples']['specjvm'],
+                              {'xml': {'warmup': [8.5], 'iteration': [9.5, 10.5]}})
+            self.assertEquals(Result.objects.count(), 4 * 24)
+
+    def test_columns_are_memory_mapped_and_stored_jobs_skipped(self):
+        path = os.path.join(self.directory, "snapshot")
+        save_snapshot(path, self.db.get_snapshot())
+
+        arrays = load_snapshot(path, mmap_mode='r')
+        self.assertEquals(type(arrays['result_score']).__name__, 'memmap')
+        self.assertEquals(arrays['run_timestamp'].dtype.str, '<M8[us]')
+        self.assertEquals(arrays['result_samples'].tolist(), [9.5, 10.5])
+
+        Job.objects.filter(name='Other').delete()
+        self.assertEquals(self.db.store_snapshot(arrays), (['Other'], ['MaxinePipeline']))
+        self.assertEquals(Result.objects.count(), 4 * 24)
+
+
+class IngestQueueTests(BenchTestCase):
+
+    def test_tasks_are_claimed_once_in_order(self):
+        first, second = self.db.enqueue_ingest(['MaxinePipeline', 'Other'], IngestTask.REFRESH)
+
+        self.assertEquals(self.db.claim_ingest_task().id, first)
+        self.assertEquals(self.db.claim_ingest_task().id, second)
+        self.assertIsNone(self.db.claim_ingest_task())
+
+    def test_progress_reports_eta(self):
+        task_id, = self.db.enqueue_ingest(['MaxinePipeline'])
+        task = self.db.claim_ingest_task()
+        task.started = self.now - timedelta(seconds=10)
+        task.save()
+
+        self.db.update_ingest_progress(task, 5, 20, 3)
+        progress, = self.db.get_ingest_progress([task_id])
+        self.assertEquals((progress['status'], progress['builds_scanned'], progress['builds_failed']), ("running", 5, 3))
+        self.assertAlmostEqual(progress['eta_seconds'], 30, delta=1)
+
+        self.db.finish_ingest_task(task, ValueError("no builds"))
+        progress, = self.db.get_ingest_progress([task_id])
+        self.assertEquals((progress['status'], progress['error'], progress['eta_seconds']), ("failed", "no builds", None))
+        self.assertEquals(self.db.get_ingest_progress(), [])
+
+    def test_replace_job_drops_old_builds(self):
+        self.db.sync_database([{'details': self.details, 'builds': [make_build(1, self.now - timedelta(days=1), "rev1")]}])
+        self.db.replace_job({'details': self.details, 'builds': [make_build(2, self.now, "rev2")]})
+
+        stored_job = Job.objects.get(name='MaxinePipeline')
+        self.assertEquals(list(stored_job.run_set.values_list('build_no', flat=True)), [2])
+        self.assertEquals(self.db.get_watermark('MaxinePipeline'), (2, self.now))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -1,6 +1,6 @@
 from django.conf.urls import url
 
-from . import views
+from . import api, views
 
 app_name = 'visualizer'
 
@@ -8,6 +8,14 @@ urlpatterns = [
     url(r'^$', views.index, name='index'),
     url(r'^registerJobs/$', views.registerJobs, name='registerJobs'),
     url(r'^registerStatus/$', views.registerStatus, name='registerStatus'),
+    url(r'^registerStatus/progress/$', views.ingestProgress, name='ingestProgress'),
+    url(r'^api/v1/jobs/$', api.jobs, name='apiJobs'),
+    url(r'^api/v1/jobs/(?P<job_name>[A-Za-z0-9_]+)/runs/$', api.runs, name='apiRuns'),
+    url(r'^api/v1/jobs/(?P<job_name>[A-Za-z0-9_]+)/results/$', api.results, name='apiResults'),
     url(r'^(?P<job_name>[A-Za-z0-9_]+)/$', views.jobDetails, name='jobDetails'),
-    url(r'^(?P<job_name>[A-Za-z0-9_]+)/raw/(?P<bench_type>(specjvm|dacapo))/$', views.raw, name='raw'),
+    url(r'^(?P<job_name>[A-Za-z0-9_]+)/history/(?P<suite>[a-z0-9_]+)/(?P<benchmark>[A-Za-z0-9_]+)/$',
+        views.benchmarkHistory, name='benchmarkHistory'),
+    url(r'^(?P<job_name>[A-Za-z0-9_]+)/changes/$', views.changePoints, name='changePoints'),
+    url(r'^(?P<job_name>[A-Za-z0-9_]+)/export/$', views.export, name='export'),
+    url(r'^(?P<job_name>[A-Za-z0-9_]+)/raw/(?P<bench_type>[a-z0-9_]+)/$', views.raw, name='raw'),
 ]
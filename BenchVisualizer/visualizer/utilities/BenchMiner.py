@@ -1,128 +1,269 @@
+import math
 import re
 
+'''
+The sub-benchmarks run by the pipeline, in execution order.
+Each entry is (key of the sub-benchmark in the result dicts, name of the sub-benchmark on the command line)
+'''
+DACAPO_BENCHMARKS = [
+    ('avrora', 'avrora'), ('batik', 'batik'), ('eclipse', 'eclipse'), ('fop', 'fop'), ('h2', 'h2'),
+    ('jython', 'jython'), ('luindex', 'luindex'), ('lusearch', 'lusearch'), ('pmd', 'pmd'), ('sunflow', 'sunflow'),
+    ('tomcat', 'tomcat'), ('tradebeans', 'tradebeans'), ('tradesoap', 'tradesoap'), ('xalan', 'xalan')
+]
+
+SPECJVM_BENCHMARKS = [
+    ('startup', 'startup'), ('compiler', 'compiler'), ('compress', 'compress'), ('crypto', 'crypto'),
+    ('derby', 'derby'), ('mpegaudio', 'mpegaudio'), ('scimark', 'scimark'), ('serial', 'serial'),
+    ('spec_sunflow', 'sunflow'), ('xml', 'xml')
+]
+
+# the benchmark suites, by the key of their results in the benchmark dicts ('dacapo' for mine_all_dacapos() etc.)
+SUITES = [('dacapo', DACAPO_BENCHMARKS), ('specjvm', SPECJVM_BENCHMARKS)]
+
+# the unit of the scores of each suite
+SUITE_UNITS = {'dacapo': 'msec', 'specjvm': 'ops/m'}
+
+# whether a higher score is better (throughput) or worse (time) in each suite
+SUITE_HIGHER_IS_BETTER = {'dacapo': False, 'specjvm': True}
+
+# the command lines that start each sub-benchmark
+SPECJVM_COMMANDS = [(key, re.compile(r"-jar.*SPECjvm2008.jar.*" + sub_bench)) for key, sub_bench in SPECJVM_BENCHMARKS]
+DACAPO_COMMANDS = [
+    (key, sub_bench, re.compile(r"-jar.*dacapo-9.12-bach.jar.*" + sub_bench)) for key, sub_bench in DACAPO_BENCHMARKS
+]
+
+DACAPO_PASSED = re.compile(r"===== DaCapo 9.12 (\S+) PASSED in ([0-9]+) msec =====")
+DACAPO_WARMUP = re.compile(r"===== DaCapo 9.12 (\S+) completed warmup [0-9]+ in ([0-9]+) msec =====")
+
+# the result of a warmup or a measured iteration of a specjvm (sub-)benchmark, e.g. "Iteration 1 (5s) result: 48.95 ops/m"
+SPECJVM_SAMPLE = re.compile(r"(Warmup|Iteration [0-9]+) \([^)]*\) result: ([0-9.]+) ops/m")
+
+# every line that can change the state of the parser contains at least one of these
+MARKERS = re.compile(r"SPECjvm2008|dacapo-9|result: |Score on |\+ true|PASSED in|completed warmup")
+
+
+def composite_samples(parts):
+
+    """
+    Combines the per-iteration samples of the parts of a specjvm benchmark (for example crypto.aes, crypto.rsa and
+    crypto.signverify) like its composite result: the i-th sample is the geometric mean of the i-th samples of
+    the parts. The parts without samples (for example the "check" of startup) are skipped.
+
+    :param parts: A list with the list of samples of each part
+    :return: A list of samples, as many as the samples of the shortest part
+    """
+
+    parts = [part for part in parts if part]
+    if not parts:
+        return []
+    if len(parts) == 1:
+        return list(parts[0])
+
+    return [math.exp(sum(math.log(part[i]) for part in parts) / len(parts))
+            for i in range(min(len(part) for part in parts))]
+
+
 class BenchMiner:
 
     """
     This class provides an API for the retrieval of benchmark data from a string.
     The string has the contents of the console output from the Jenkins Pipeline
+
+    The console is parsed in a single pass, line by line, by a state machine. It can be given as a whole string or
+    as an iterable of text chunks (for example a file, or a streamed HTTP response), or it can be fed chunk by chunk
+    with feed(). Only the current line is kept in memory, so memory stays bounded however long the console is.
     """
 
-    def __init__(self, console):
-        #contains the whole console output of the pipeline
-        self.console_inp = console
+    def __init__(self, console=None):
+        # the console chunks that have not been parsed yet
+        if console is None:
+            self.console_chunks = []
+        elif isinstance(console, basestring):
+            self.console_chunks = [console]
+        else:
+            self.console_chunks = console
 
-        #contains dacapo console
-        self.console_dacapo = ""
+        # the end of the last chunk that was fed, if it is not a whole line yet
+        self.pending = ""
 
-        #contains specjvm_console
-        self.console_specjvm = ""
+        self.closed = False
 
-    def mine_specjvm(self, sub_bench):
+        # specjvm sub-benchmarks that have started, and the ones that have not met their '+ true' line yet
+        self.specjvm_started = set()
+        self.specjvm_open = {}
+        self.specjvm_results = {}
+
+        # the warmup and iteration samples of the parts of the open specjvm sub-benchmarks: the finished parts
+        # (closed by their "Score on" line), and the part that is running
+        self.specjvm_parts = []
+        self.specjvm_part = ([], [])
+        self.specjvm_samples = {}
+
+        # dacapo sub-benchmarks that have started, and the ones still waiting for their result (by command line name)
+        self.dacapo_started = set()
+        self.dacapo_waiting = {}
+        self.dacapo_results = {}
+        self.dacapo_warmups = {}
+        self.dacapo_samples = {}
+
+    def feed(self, chunk):
 
         """
-        Looks for the result of a specific SpecJvm benchmark in the console output.
+        Parses the next chunk of the console output. The chunk does not have to end at a line boundary.
 
-        :param sub_bench: The name of the sub-bench, for example 'startup'
-        :return:  The result of the benchmark/ "missing" if missing/ "interpt/failed" if failed or interrupted
+        :param chunk: A piece of text of any length
         """
 
-        search_term = r".*-jar.*SPECjvm2008.jar.*" + sub_bench
+        text = self.pending + chunk if self.pending else chunk
 
-        search_result = re.search(search_term, self.console_specjvm)
+        # only whole lines are parsed, the rest waits for the next chunk
+        limit = text.rfind("\n")
+        if limit == -1:
+            self.pending = text
+            return
 
-        # if the sub-benchmark was not executed, return "missing"
-        if search_result == None:
-            return "missing"
+        position = 0
+        while True:
+            # skip straight to the next line that can change the state of the parser
+            marker = MARKERS.search(text, position, limit)
+            if marker is None:
+                break
+            line_start = text.rfind("\n", 0, marker.start()) + 1
+            line_end = text.find("\n", marker.start())
+            self.parse_line(text[line_start:line_end])
+            position = line_end + 1
 
-        sub_console = self.console_specjvm[search_result.start():]
-        # "+ true" comes after the interrupt signal
-        search_term = r".*\+ true.*"
-        search_result = re.search(search_term, sub_console)
-        '''
-        All the specjvm commands should ALWAYS be followed by a 'true' command.
-        For the sake of coverage, in the non - likely event that 'true is not found' treat the benchmark as missing.
-        '''
-        if search_result == None:
-            return "missing"
-        sub_bench_output = sub_console[0:search_result.end()]
+        self.pending = text[limit + 1:]
 
-        # look for the composite result inside the output of the sub benchmark
-        search_term = r".*Noncompliant composite result: .*"
-        search_result = re.search(search_term, sub_bench_output)
+    def close(self):
 
-        # if the benchark was interrupted (no result printed), return "interpt/failed"
-        if search_result == None:
-            return "interpt/failed"
+        """
+        Parses whatever is left of the console. After this call the results are final.
+        """
 
-        # the raw benchmark value is second word from the end, in the result line
-        raw_benchmark = search_result.group().split(" ")[-2]
+        if self.closed:
+            return
 
-        return raw_benchmark
+        for chunk in self.console_chunks:
+            self.feed(chunk)
+        self.console_chunks = []
 
-    def mine_all_specjvms(self):
+        if self.pending:
+            self.feed("\n")
 
-        """
-        Looks for the result of all the specjvm benchmarks
+        self.closed = True
 
-        :return:  A dict containing the results of the sub-benchmarks
+    def parse_line(self, line):
+
+        """
+        Moves the state machine by one line of the console output (without the line break).
         """
 
-        # narrow the search by finding the execution of the first test
-        search_term = r".*-jar.*SPECjvm2008.jar.*"
+        # specjvm: the output of a sub-benchmark extends from its command line up to the first '+ true' line
+        if "SPECjvm2008" in line:
+            for key, command in SPECJVM_COMMANDS:
+                if key not in self.specjvm_started and command.search(line):
+                    self.specjvm_started.add(key)
+                    self.specjvm_open[key] = None
+
+        if self.specjvm_open:
+            if "result: " in line:
+                sample = SPECJVM_SAMPLE.search(line)
+                if sample is not None:
+                    self.specjvm_part[0 if sample.group(1) == "Warmup" else 1].append(float(sample.group(2)))
+
+            if "Score on " in line:
+                self.specjvm_parts.append(self.specjvm_part)
+                self.specjvm_part = ([], [])
+
+            if "Noncompliant composite result: " in line:
+                # the raw benchmark value is second word from the end, in the result line
+                raw_benchmark = line.split(" ")[-2]
+                for key in self.specjvm_open:
+                    if self.specjvm_open[key] is None:
+                        self.specjvm_open[key] = raw_benchmark
+
+            # "+ true" comes after the interrupt signal
+            if "+ true" in line:
+                for key, raw_benchmark in self.specjvm_open.items():
+                    # if the benchark was interrupted (no result printed), it is "interpt/failed"
+                    self.specjvm_results[key] = raw_benchmark if raw_benchmark is not None else "interpt/failed"
+                    warmups = composite_samples([part[0] for part in self.specjvm_parts])
+                    iterations = composite_samples([part[1] for part in self.specjvm_parts])
+                    if raw_benchmark is not None and (warmups or iterations):
+                        self.specjvm_samples[key] = {'warmup': warmups, 'iteration': iterations}
+                self.specjvm_open = {}
+                self.specjvm_parts = []
+                self.specjvm_part = ([], [])
+
+        # dacapo: the result of a sub-benchmark is its first PASSED line after its command line
+        if "dacapo-9" in line:
+            for key, sub_bench, command in DACAPO_COMMANDS:
+                if key not in self.dacapo_started and command.search(line):
+                    self.dacapo_started.add(key)
+                    self.dacapo_waiting[sub_bench] = key
+
+        if self.dacapo_waiting and "completed warmup" in line:
+            for warmup in DACAPO_WARMUP.finditer(line):
+                if warmup.group(1) in self.dacapo_waiting:
+                    self.dacapo_warmups.setdefault(warmup.group(1), []).append(float(warmup.group(2)))
+
+        if self.dacapo_waiting and "PASSED in" in line:
+            for passed in DACAPO_PASSED.finditer(line):
+                if passed.group(1) in self.dacapo_waiting:
+                    key = self.dacapo_waiting.pop(passed.group(1))
+                    self.dacapo_results[key] = passed.group(2)
+                    # the iteration that passes is the measured one, the ones before it are the warmups
+                    self.dacapo_samples[key] = {
+                        'warmup': self.dacapo_warmups.pop(passed.group(1), []),
+                        'iteration': [float(passed.group(2))]
+                    }
 
-        search_result = re.search(search_term, self.console_inp)
+    def mine_specjvm(self, sub_bench):
 
-        if search_result == None:
-            return {
-                'startup': "missing", 'compiler': "missing", 'compress': "missing", 'crypto': "missing", 'derby': "missing",
-                'mpegaudio': "missing", 'scimark': "missing", 'serial': "missing", 'spec_sunflow': "missing", 'xml': "missing"
-            }
+        """
+        Looks for the result of a specific SpecJvm benchmark in the console output.
 
-        self.console_specjvm = self.console_inp[search_result.start():]
+        :param sub_bench: The name of the sub-bench, for example 'startup'
+        :return:  The result of the benchmark/ "missing" if missing/ "interpt/failed" if failed or interrupted
+        """
 
-        return {
-            'startup': self.mine_specjvm('startup'),
-            'compiler': self.mine_specjvm('compiler'),
-            'compress': self.mine_specjvm('compress'),
-            'crypto': self.mine_specjvm('crypto'),
-            'derby': self.mine_specjvm('derby'),
-            'mpegaudio': self.mine_specjvm('mpegaudio'),
-            'scimark': self.mine_specjvm('scimark'),
-            'serial': self.mine_specjvm('serial'),
-            'spec_sunflow': self.mine_specjvm('sunflow'),
-            'xml': self.mine_specjvm('xml')
-        }
+        for key, name in SPECJVM_BENCHMARKS:
+            if name == sub_bench:
+                return self.mine_all_specjvms()[key]
 
+        return "missing"
 
-    def mine_dacapo(self, sub_bench):
+    def mine_all_specjvms(self):
 
         """
-        Looks for the result of a specific Dacapo benchmark in the console output.
+        Looks for the result of all the specjvm benchmarks
 
-        :param sub_bench: The name of the sub-bench, for example 'avrora'
-        :return:  The result of the benchmark/ "missing" if missing/ "interpt/failed" if failed or interrupted
+        :return:  A dict containing the results of the sub-benchmarks
         """
 
-        search_term = r".*-jar.*dacapo-9.12-bach.jar.*" + sub_bench
-        search_result = re.search(search_term, self.console_dacapo)
+        self.close()
 
-        # subtest missing
-        if search_result == None:
-            return "missing"
+        '''
+        All the specjvm commands should ALWAYS be followed by a 'true' command.
+        For the sake of coverage, in the non - likely event that 'true is not found' treat the benchmark as missing.
+        '''
+        return dict((key, self.specjvm_results.get(key, "missing")) for key, _ in SPECJVM_BENCHMARKS)
 
-        sub_console = self.console_dacapo[search_result.start():]
+    def mine_dacapo(self, sub_bench):
 
-        search_term = r"===== DaCapo 9.12 " + sub_bench + r" PASSED in [0-9]+ msec ====="
-        search_result = re.search(search_term, sub_console)
+        """
+        Looks for the result of a specific Dacapo benchmark in the console output.
 
-        # subtest failed
-        if search_result == None:
-            return "interpt/failed"
+        :param sub_bench: The name of the sub-bench, for example 'avrora'
+        :return:  The result of the benchmark/ "missing" if missing/ "interpt/failed" if failed or interrupted
+        """
 
-        # the raw benchmark value is second word from the end, in the result line
-        raw_benchmark = search_result.group().split(" ")[-3]
+        for key, name in DACAPO_BENCHMARKS:
+            if name == sub_bench:
+                return self.mine_all_dacapos()[key]
 
-        return raw_benchmark
+        return "missing"
 
     def mine_all_dacapos(self):
 
@@ -132,31 +273,33 @@ class BenchMiner:
         :return:  A dict containing the results of the sub-benchmarks
         """
 
-        # firstly, we narrow the search for the dacapo results
-        search_term = r".*-jar.*dacapo-9.12-bach.jar.*"
-        search_result = re.search(search_term, self.console_inp)
+        self.close()
+
+        results = {}
+        for key, _ in DACAPO_BENCHMARKS:
+            if key in self.dacapo_results:
+                results[key] = self.dacapo_results[key]
+            elif key in self.dacapo_started:
+                # subtest failed
+                results[key] = "interpt/failed"
+            else:
+                # subtest missing
+                results[key] = "missing"
+
+        return results
 
-        if search_result == None:
-            return {
-                'avrora': "missing", 'batik': "missing", 'eclipse': "missing", 'fop': "missing", 'h2': "missing", 'jython': "missing", 'luindex': "missing",
-                'lusearch': "missing", 'pmd': "missing", 'sunflow': "missing", 'tomcat': "missing", 'tradebeans': "missing", 'tradesoap': "missing", 'xalan': "missing"
-            }
+    def mine_all_samples(self):
+
+        """
+        Looks for the warmup and measured iteration samples of all the benchmarks that have a result
+
+        :return: A dict {'dacapo': {sub-bench: {'warmup': [...], 'iteration': [...]}}, 'specjvm': {...}}, the samples
+            in msec for dacapo and ops/m for specjvm
+        """
 
-        self.console_dacapo = self.console_inp[search_result.start():]
+        self.close()
 
         return {
-            'avrora': self.mine_dacapo('avrora'),
-            'batik': self.mine_dacapo('batik'),
-            'eclipse': self.mine_dacapo('eclipse'),
-            'fop': self.mine_dacapo('fop'),
-            'h2': self.mine_dacapo('h2'),
-            'jython': self.mine_dacapo('jython'),
-            'luindex': self.mine_dacapo('luindex'),
-            'lusearch': self.mine_dacapo('lusearch'),
-            'pmd': self.mine_dacapo('pmd'),
-            'sunflow': self.mine_dacapo('sunflow'),
-            'tomcat': self.mine_dacapo('tomcat'),
-            'tradebeans': self.mine_dacapo('tradebeans'),
-            'tradesoap': self.mine_dacapo('tradesoap'),
-            'xalan': self.mine_dacapo('xalan')
+            'dacapo': dict(self.dacapo_samples),
+            'specjvm': dict(self.specjvm_samples)
         }
@@ -0,0 +1,459 @@
+from BenchMiner import BenchMiner, DACAPO_BENCHMARKS, SPECJVM_BENCHMARKS
+from Statistics import median_mad
+from visualizer.models import parse_score, STATUS_OK, STATUS_FAILED
+from distutils.spawn import find_executable
+from multiprocessing import cpu_count
+import json
+import os
+import random
+import select
+import subprocess
+import tempfile
+import time
+
+'''
+The number of threads that each sub-benchmark runs, to reserve as many cores for it when the benchmarks run in parallel.
+The single-threaded DaCapo benchmarks run 1 thread, the scalable ones run as many as their -t option, and SPECjvm runs
+the 2 threads of its -bt option.
+'''
+SCALABLE_DACAPOS = ('h2', 'lusearch', 'pmd', 'sunflow', 'tomcat', 'tradebeans', 'tradesoap', 'xalan')
+SPECJVM_THREADS = 2
+# the cores reserved on top of the benchmark threads, for the compiler and GC threads of the VM
+VM_CORES = 1
+
+
+def parse_cpus(cpus):
+
+    """
+    Parses a CPU list in the format of taskset, e.g. "0-3,8,10-11"
+
+    :return: A sorted list of CPU numbers
+    :raise: ValueError when the list is malformed
+    """
+
+    parsed = set()
+    for part in cpus.split(","):
+        if "-" in part:
+            first, last = part.split("-")
+            parsed.update(range(int(first), int(last) + 1))
+        else:
+            parsed.add(int(part))
+
+    return sorted(parsed)
+
+
+def format_cpus(cpus):
+    return ",".join(str(cpu) for cpu in cpus)
+
+
+class BenchRun:
+
+    """
+    A sub-benchmark for the scheduler: the shell command that runs it, and the number of cores it needs.
+    Its output is mined as it comes (see feed()), and copied to its log file.
+    A sub-benchmark that runs many times has a BenchRun per repetition.
+    """
+
+    def __init__(self, suite, key, command, cwd, cores, repetition=0):
+        self.suite = suite
+        self.key = key
+        self.command = command
+        self.cwd = cwd
+        self.cores = cores
+        self.repetition = repetition
+        # "<suite>:<key>", and "#<repetition>" after the first repetition
+        self.name = suite + ":" + key + ("#" + str(repetition) if repetition else "")
+        # the CPUs it is pinned to, its log, exit status and resource usage, once it runs
+        self.cpus = None
+        self.process = None
+        self.log = None
+        self.returncode = None
+        self.started = None
+        self.wall_time = None
+        self.rusage = None
+        self.miner = BenchMiner()
+
+    def feed(self, chunk):
+
+        """
+        Copies the next chunk of the output of the sub-benchmark to its log, and mines it
+
+        :param chunk: A piece of the output, of any length
+        """
+
+        if self.log is not None:
+            self.log.write(chunk)
+            self.log.flush()
+        self.miner.feed(chunk)
+
+    def start(self):
+        # the miner sees the output in the format of a pipeline console: the command line first (logged too)
+        self.feed("Executing: " + self.command + "\n")
+        self.started = time.time()
+
+    def finish(self, returncode, rusage=None):
+        # and for specjvm, the "+ true" line that marks its end
+        self.wall_time = time.time() - self.started
+        self.returncode = returncode
+        self.rusage = rusage
+        if self.suite == 'specjvm':
+            self.miner.feed("+ true\n")
+        self.miner.close()
+        if self.log is not None:
+            self.log.close()
+
+    def get_result(self):
+
+        """
+        The result of the finished sub-benchmark
+
+        :return: A tuple (result of BenchMiner: the score, "missing" or "interpt/failed", its samples: a dict
+            {'warmup': [...], 'iteration': [...]} or None)
+        """
+
+        if self.suite == 'dacapo':
+            results = self.miner.mine_all_dacapos()
+        else:
+            results = self.miner.mine_all_specjvms()
+
+        return results[self.key], self.miner.mine_all_samples()[self.suite].get(self.key)
+
+    def get_usage(self):
+
+        """
+        The resources used by the process of the finished sub-benchmark and all its descendants (mx, the VM), as
+        reported by wait4()
+
+        :return: A dict {'wall_time', 'user_time', 'system_time' (s), 'max_rss' (KiB, the peak of the largest process),
+            'exit_status'}. A forked process starts with the peak RSS of its parent, so 'max_rss' is never less than the
+            RSS of the scheduler when it started the sub-benchmark
+        """
+
+        return {
+            'wall_time': self.wall_time,
+            'user_time': self.rusage.ru_utime if self.rusage is not None else None,
+            'system_time': self.rusage.ru_stime if self.rusage is not None else None,
+            'max_rss': self.rusage.ru_maxrss if self.rusage is not None else None,
+            'exit_status': self.returncode
+        }
+
+
+def benchmark_runs(env, threads=None):
+
+    """
+    Builds the runs of all the sub-benchmarks of the pipeline, in execution order
+
+    :param env: The environment, with the paths of MX, DACAPO and SPECJVM2008
+    :param threads: The number of threads of the scalable DaCapo benchmarks (their -t option), None for their
+        default (one per core of the machine, so they use all the cores)
+    :return: A list of BenchRuns
+    """
+
+    runs = []
+    for key, dacapo_bench in DACAPO_BENCHMARKS:
+        command = env['MX'] + ' --vm=maxine vm -jar dacapo-9.12-bach.jar ' + dacapo_bench
+        cores = VM_CORES + 1
+        if dacapo_bench in SCALABLE_DACAPOS:
+            if threads is not None:
+                command += ' -t ' + str(threads)
+            cores = VM_CORES + (threads if threads is not None else cpu_count())
+        runs.append(BenchRun('dacapo', key, command, env['DACAPO'], cores))
+
+    for key, specjvm_bench in SPECJVM_BENCHMARKS:
+        command = 'timeout -s SIGINT 7m ' + env['MX'] + ' --vm=maxine vm -jar SPECjvm2008.jar -bt ' + \
+                  str(SPECJVM_THREADS) + ' ' + specjvm_bench
+        runs.append(BenchRun('specjvm', key, command, env['SPECJVM2008'], VM_CORES + SPECJVM_THREADS))
+
+    return runs
+
+
+def repeat_runs(runs, repeat, seed=None):
+
+    """
+    Repeats the sub-benchmarks in randomized, interleaved order: repeat rounds, each one running every sub-benchmark
+    once in a new random order. So a slow drift of the machine (e.g. thermal) spreads evenly across the sub-benchmarks
+    instead of biasing the ones that run last, and no sub-benchmark runs all its repetitions back to back.
+
+    :param runs: A list of BenchRuns, one per sub-benchmark
+    :param repeat: The number of repetitions. Once leaves the runs in their order
+    :param seed: The seed of the random order, None for a random one
+    :return: A list of BenchRuns, repeat per sub-benchmark (numbered by their repetition)
+    """
+
+    if repeat <= 1:
+        return list(runs)
+
+    shuffler = random.Random(seed)
+    repeated = []
+    for repetition in range(repeat):
+        round_runs = [BenchRun(run.suite, run.key, run.command, run.cwd, run.cores, repetition) for run in runs]
+        shuffler.shuffle(round_runs)
+        repeated.extend(round_runs)
+
+    return repeated
+
+
+def aggregate_results(results):
+
+    """
+    Combines the results of the repetitions of a sub-benchmark: its score is the median of the scores of the
+    repetitions that succeeded, and its samples are the samples of all of them
+
+    :param results: A list of tuples (result of BenchMiner, samples or None), one per repetition
+    :return: A tuple (result: the median score, or the result of the repetitions if none succeeded, samples or None,
+        list of the scores of the repetitions that succeeded)
+    """
+
+    scores = []
+    samples = {'warmup': [], 'iteration': []}
+    statuses = set()
+    for result, result_samples in results:
+        score, status = parse_score(result)
+        statuses.add(status)
+        if status == STATUS_OK:
+            scores.append(score)
+            for kind in samples:
+                samples[kind].extend((result_samples or {}).get(kind, []))
+
+    if not scores:
+        # a sub-benchmark that failed once is failed, not missing
+        return ("interpt/failed" if STATUS_FAILED in statuses else "missing"), None, []
+
+    if len(results) == 1:
+        return results[0][0], results[0][1], scores
+
+    median = median_mad(scores)[0]
+    return repr(median), (samples if samples['warmup'] or samples['iteration'] else None), scores
+
+
+def aggregate_usage(usages):
+
+    """
+    Combines the resource usage of the repetitions of a sub-benchmark: the median of each resource, and the exit status
+    of the last repetition that failed (0 if none did)
+
+    :param usages: A list of the usages of the repetitions (see BenchRun.get_usage()), None for unknown ones
+    :return: A dict of the usage, None if none is known
+    """
+
+    usages = [usage for usage in usages if usage is not None]
+    if not usages:
+        return None
+
+    aggregated = {}
+    for resource in ('wall_time', 'user_time', 'system_time', 'max_rss'):
+        values = [usage[resource] for usage in usages if usage.get(resource) is not None]
+        aggregated[resource] = median_mad(values)[0] if values else None
+
+    failed = [usage['exit_status'] for usage in usages if usage.get('exit_status')]
+    aggregated['exit_status'] = failed[-1] if failed else usages[-1].get('exit_status')
+
+    return aggregated
+
+
+def select_runs(runs, only=None, skip=None):
+
+    """
+    Selects sub-benchmarks by name. A name is a suite ("dacapo"), the key of a sub-benchmark ("avrora", "spec_sunflow")
+    or both ("dacapo:sunflow")
+
+    :param runs: A list of BenchRuns
+    :param only: A comma-separated list of the names to select, None for all
+    :param skip: A comma-separated list of the names to leave out, None for none
+    :return: The selected BenchRuns, in order
+    :raise: ValueError when a name matches no sub-benchmark
+    """
+
+    def parse(names):
+        names = set(name.strip() for name in names.split(",") if name.strip())
+        for name in names:
+            if not any(matches(run, name) for run in runs):
+                raise ValueError("Unknown benchmark <" + name + ">")
+        return names
+
+    def matches(run, name):
+        return name in (run.suite, run.key, run.suite + ":" + run.key)
+
+    if only is not None:
+        only = parse(only)
+        runs = [run for run in runs if any(matches(run, name) for name in only)]
+    if skip is not None:
+        skip = parse(skip)
+        runs = [run for run in runs if not any(matches(run, name) for name in skip)]
+
+    return runs
+
+
+class Checkpoint:
+
+    """
+    The progress of a local run of the benchmarks of a revision/tag: the sub-benchmarks that have finished and their
+    results, saved to a JSON file after each one, so that an interrupted run resumes from the ones left.
+    The checkpoint belongs to one stored build (its run id). The checkpoint of another build is ignored.
+    """
+
+    def __init__(self, path, run_id):
+        self.path = path
+        self.run_id = run_id
+        # {name of the BenchRun: {'result': result of BenchMiner, 'samples': samples or None, 'returncode': exit status,
+        #  'usage': resource usage (see BenchRun.get_usage())}}
+        self.finished = {}
+
+    def load(self):
+
+        """
+        Reads the checkpoint file
+
+        :return: True if the file holds the checkpoint of the build, False if it is missing or of another build
+        """
+
+        try:
+            with open(self.path) as f:
+                checkpoint = json.load(f)
+        except (IOError, ValueError):
+            return False
+
+        if checkpoint.get('run_id') != self.run_id:
+            return False
+
+        self.finished = checkpoint['finished']
+        return True
+
+    def save(self):
+
+        directory = os.path.dirname(self.path)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        # the file is replaced at once, so an interruption never leaves half of it
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump({'run_id': self.run_id, 'finished': self.finished}, f, indent=1, sort_keys=True)
+        os.rename(temp_path, self.path)
+
+    def is_finished(self, run):
+        return run.name in self.finished
+
+    def record(self, run, result, samples):
+
+        """
+        Records a finished sub-benchmark and saves the checkpoint
+
+        :param run: The finished BenchRun
+        :param result: Its result (see BenchRun.get_result())
+        :param samples: Its samples, or None
+        """
+
+        self.finished[run.name] = {'result': result, 'samples': samples, 'returncode': run.returncode,
+                                   'usage': run.get_usage()}
+        self.save()
+
+    def discard(self, runs):
+        # the sub-benchmarks that run again
+        for run in runs:
+            self.finished.pop(run.name, None)
+        self.save()
+
+
+class BenchScheduler:
+
+    """
+    Runs sub-benchmarks in parallel, each one pinned (with taskset) to its own set of CPUs, which no other running
+    sub-benchmark shares, so that the parallel runs do not disturb each other's measurements. One at a time (the
+    default), they are not pinned: each one has the whole machine, as in the pipeline.
+    The output of the running sub-benchmarks is read as it comes, and mined and logged by their BenchRuns, so that the
+    result of each one is known as soon as it finishes.
+    """
+
+    def __init__(self, cpus, parallel=1, env=None, pin=None, log_dir=None):
+
+        """
+        :param cpus: The CPUs that the benchmarks may use
+        :param parallel: The maximum number of sub-benchmarks that run at the same time
+        :param env: The environment of the benchmark processes
+        :param pin: Pin the sub-benchmarks to their CPUs, None to pin them only when they run in parallel
+        :param log_dir: The directory of the logs of the sub-benchmarks (<suite>-<key>[#<repetition>].log), None for no
+            logs
+        :raise: ValueError when the sub-benchmarks must be pinned, but taskset is not installed
+        """
+
+        self.cpus = sorted(cpus)
+        self.parallel = max(1, parallel)
+        self.env = env
+        if pin is None:
+            pin = self.parallel > 1
+        if pin and find_executable("taskset") is None:
+            # unpinned, the parallel runs would disturb each other's measurements
+            raise ValueError("taskset is not installed, the sub-benchmarks cannot be pinned to their CPUs. Install it "
+                             "(util-linux), or run them one at a time (--parallel 1)")
+        self.pin = pin
+        self.log_dir = log_dir
+
+    def start(self, run):
+
+        if self.log_dir is not None:
+            if not os.path.isdir(self.log_dir):
+                os.makedirs(self.log_dir)
+            run.log = open(os.path.join(self.log_dir, run.name.replace(":", "-") + ".log"), "w")
+        run.start()
+
+        run.process = subprocess.Popen(self.get_command(run), cwd=run.cwd, env=self.env, stdout=subprocess.PIPE,
+                                       stderr=subprocess.STDOUT)
+
+    def get_command(self, run):
+        # the command line of the process of a sub-benchmark, once its CPUs are chosen
+        command = ["/bin/sh", "-c", run.command]
+        if self.pin:
+            command = ["taskset", "-c", format_cpus(run.cpus)] + command
+
+        return command
+
+    def run(self, runs, on_start=None, on_finish=None):
+
+        """
+        Runs the sub-benchmarks, as many at a time as fit in the free CPUs (up to parallel), in order: when the next one
+        needs more CPUs than are free, the following ones that fit start first. A sub-benchmark that needs more CPUs
+        than there are gets all of them.
+
+        :param runs: A list of BenchRuns
+        :param on_start: Called with each BenchRun when it starts
+        :param on_finish: Called with each BenchRun when it finishes, with its returncode set and its output mined
+        """
+
+        pending = list(runs)
+        # the running benchmarks, by the descriptor of their output
+        running = {}
+        free = list(self.cpus)
+
+        while pending or running:
+            for run in list(pending):
+                if len(running) >= self.parallel:
+                    break
+
+                cores = min(run.cores, len(self.cpus))
+                if cores <= len(free):
+                    run.cpus, free = free[:cores], free[cores:]
+                    self.start(run)
+                    running[run.process.stdout.fileno()] = run
+                    pending.remove(run)
+                    if on_start is not None:
+                        on_start(run)
+
+            # the output is read from whichever benchmarks print it. A benchmark has finished when its output ends
+            readable, _, _ = select.select(list(running), [], [])
+            for fd in readable:
+                chunk = os.read(fd, 64 * 1024)
+                if chunk:
+                    running[fd].feed(chunk)
+                    continue
+
+                run = running.pop(fd)
+                run.process.stdout.close()
+                # the usage of the process includes its descendants, which it waited for
+                _, status, rusage = os.wait4(run.process.pid, 0)
+                run.process.returncode = -os.WTERMSIG(status) if os.WIFSIGNALED(status) else os.WEXITSTATUS(status)
+                run.finish(run.process.returncode, rusage)
+                free = sorted(free + run.cpus)
+
+                if on_finish is not None:
+                    on_finish(run)
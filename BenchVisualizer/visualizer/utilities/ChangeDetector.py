@@ -0,0 +1,129 @@
+import numpy as np
+
+# the number of runs before a candidate change that form the rolling baseline of a benchmark
+BASELINE_WINDOW = 20
+# the minimum number of successful runs in the baseline to test a change
+MIN_BASELINE = 10
+# the number of consecutive runs that must all deviate from the baseline, in the same direction
+CONFIRM_RUNS = 3
+# how far from the baseline median a run must be to deviate, in robust standard deviations (1.4826 * MAD)
+THRESHOLD = 4.0
+# the minimum change of the median, relative to the baseline median, e.g. 0.02 for 2%
+MIN_CHANGE = 0.02
+
+# the MAD of a normal distribution is 0.6745 times its standard deviation
+MAD_SCALE = 1.4826
+
+
+def nanmedian(values):
+
+    """
+    The median of each row of a 2D array, ignoring the NaNs (NaN for a row without any value).
+    Much faster than np.nanmedian() on the small windows of the step test: the NaNs are sorted last,
+    so the median of a row is in the middle of its first count values.
+    """
+
+    if values.shape[1] == 0:
+        return np.full(values.shape[0], np.nan)
+
+    ordered = np.sort(values, axis=1)
+    count = np.sum(~np.isnan(ordered), axis=1)
+    low = np.take_along_axis(ordered, np.maximum((count - 1) // 2, 0)[:, None], axis=1)[:, 0]
+    high = np.take_along_axis(ordered, (count // 2)[:, None], axis=1)[:, 0]
+
+    return np.where(count > 0, (low + high) / 2.0, np.nan)
+
+
+def detect_change_points(scores, start, first, window=BASELINE_WINDOW, min_baseline=MIN_BASELINE,
+                         confirm=CONFIRM_RUNS, threshold=THRESHOLD, min_change=MIN_CHANGE):
+
+    """
+    Median/MAD step test over the runs of many benchmarks at once (one row per benchmark, one column per run).
+
+    A run t is the start of a change of a benchmark when the scores of the runs t .. t + confirm - 1 are all more than
+    threshold robust standard deviations above (or all below) the median of the baseline, and the median of these runs
+    differs from the baseline median by more than min_change. The baseline of a benchmark is its successful runs among
+    the window runs before t, but not before the start of its current segment: once a change is found at t,
+    the baseline starts again from t, so a benchmark that changed is compared to its new level.
+
+    The test is incremental: only the runs from first are tested, the previous ones are the context of the baselines.
+    The last confirm - 1 runs cannot be confirmed yet, they are tested again when newer runs arrive.
+
+    :param scores: A 2D float array (benchmarks x runs, sorted by time), NaN for the missing or failed runs
+    :param start: An int array with the column where the segment of each benchmark starts
+    :param first: An int array with the first column to test for each benchmark
+    :return: A tuple (changes, start, analysed):
+        changes: A list of tuples (row, column of the change, column of the last successful run before it,
+            baseline median, median after the change)
+        start: The updated start of the segment of each benchmark
+        analysed: The number of columns that are tested (the columns from it are tested again next time)
+    """
+
+    scores = np.asarray(scores, dtype=float)
+    rows, columns = scores.shape
+    start = np.array(start, dtype=int)
+    first = np.asarray(first, dtype=int)
+    analysed = max(columns - confirm + 1, 0)
+
+    changes = []
+    if rows == 0 or analysed == 0:
+        return changes, start, analysed
+
+    valid = ~np.isnan(scores)
+    # the column of the last successful run up to each column, -1 before the first one
+    last_valid = np.maximum.accumulate(np.where(valid, np.arange(columns), -1), axis=1)
+
+    for t in range(max(first.min(), 1), analysed):
+        begin = max(t - window, 0)
+        baseline = scores[:, begin:t].copy()
+        # the runs before the segment of a benchmark are not in its baseline
+        baseline[np.arange(begin, t) < start[:, None]] = np.nan
+
+        median = nanmedian(baseline)
+        sigma = MAD_SCALE * nanmedian(np.abs(baseline - median[:, None]))
+        # a perfectly stable baseline (MAD 0) would flag any noise
+        sigma = np.maximum(sigma, np.abs(median) * min_change / threshold)
+
+        after = scores[:, t:t + confirm]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            deviation = (after - median[:, None]) / sigma[:, None]
+            after_median = nanmedian(after)
+            shift = np.abs(after_median - median)
+
+            flagged = (
+                (first <= t) &
+                (np.sum(~np.isnan(baseline), axis=1) >= min_baseline) &
+                valid[:, t:t + confirm].all(axis=1) &
+                ((deviation > threshold).all(axis=1) | (deviation < -threshold).all(axis=1)) &
+                (shift > np.abs(median) * min_change)
+            )
+
+        for row in np.flatnonzero(flagged):
+            changes.append((int(row), t, int(last_valid[row, t - 1]), float(median[row]), float(after_median[row])))
+            start[row] = t
+
+    return changes, start, analysed
+
+
+def rolling_baseline(scores, start, window=BASELINE_WINDOW):
+
+    """
+    Computes the current baseline of each benchmark: the median and the MAD of its last window runs,
+    in its current segment.
+
+    :param scores: A 2D float array (benchmarks x runs, sorted by time), NaN for the missing or failed runs
+    :param start: An int array with the column where the segment of each benchmark starts
+    :return: A tuple of arrays (median, mad, count), NaN where a benchmark has no successful run
+    """
+
+    scores = np.asarray(scores, dtype=float)
+    columns = scores.shape[1]
+    begin = max(columns - window, 0)
+
+    baseline = scores[:, begin:].copy()
+    baseline[np.arange(begin, columns) < np.asarray(start)[:, None]] = np.nan
+
+    median = nanmedian(baseline)
+    mad = nanmedian(np.abs(baseline - median[:, None]))
+
+    return median, mad, np.sum(~np.isnan(baseline), axis=1)
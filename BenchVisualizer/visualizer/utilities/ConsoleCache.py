@@ -0,0 +1,239 @@
+from django.conf import settings
+import fcntl
+import gzip
+import hashlib
+import os
+import tempfile
+import threading
+import urllib
+
+# serializes the writes and the evictions of the threads of a process (see ConsoleCache.commit())
+cache_lock = threading.Lock()
+
+
+class ConsoleCache:
+
+    """
+    A local, content-addressed and compressed cache of the consoles of finished Jenkins builds,
+    keyed by (job, build number). Finished builds never change, so their consoles are downloaded only once.
+
+    Layout of the cache directory:
+        objects/<ab>/<abcdef...>.gz : a gzip-compressed console, named by the SHA-1 of its contents
+        refs/<job>/<build_no> : the SHA-1 of the console of a build
+        size : the running total of the sizes of the objects, in bytes
+        lock : locked while a console is added, so the processes that share the cache keep the running total right
+
+    Reading a console marks it as recently used (the mtime of its object). When the objects take more than
+    max_bytes, the least recently used ones are evicted. The objects are listed only then: the running total
+    tells when the limit is crossed.
+    """
+
+    def __init__(self, directory=None, max_bytes=None):
+        self.directory = directory if directory is not None else settings.CONSOLE_CACHE_DIR
+        self.max_bytes = max_bytes if max_bytes is not None else settings.CONSOLE_CACHE_MAX_BYTES
+
+        self.objects_dir = os.path.join(self.directory, "objects")
+        self.refs_dir = os.path.join(self.directory, "refs")
+        self.size_path = os.path.join(self.directory, "size")
+        self.lock_path = os.path.join(self.directory, "lock")
+
+    def ref_path(self, job_name, build_no):
+        # job names may contain '/' (jobs inside folders)
+        return os.path.join(self.refs_dir, urllib.quote(job_name, safe=""), str(build_no))
+
+    def object_path(self, digest):
+        return os.path.join(self.objects_dir, digest[:2], digest + ".gz")
+
+    def open(self, job_name, build_no):
+
+        """
+        Opens the cached console of a build.
+
+        :param job_name: The name of the Job
+        :param build_no: The number of the build
+        :return: A file-like object with the uncompressed console, None if the console is not cached
+        """
+
+        try:
+            f = open(self.ref_path(job_name, build_no), "r")
+            digest = f.read().strip()
+            f.close()
+        except IOError:
+            return None
+
+        path = self.object_path(digest)
+        try:
+            console = gzip.open(path, "rb")
+            os.utime(path, None)
+        except (IOError, OSError):
+            # the console was evicted, drop the dangling reference
+            self.remove(job_name, build_no)
+            return None
+
+        return console
+
+    def tee(self, job_name, build_no, chunks):
+
+        """
+        Passes the chunks of a console through, while storing them in the cache.
+        The console is added to the cache only after the last chunk, so a broken download is never cached.
+
+        :param job_name: The name of the Job
+        :param build_no: The number of the build
+        :param chunks: An iterable of the chunks of the console
+        :return: A generator of the same chunks
+        """
+
+        self.make_dirs(self.objects_dir)
+        fd, temp_path = tempfile.mkstemp(dir=self.objects_dir, suffix=".tmp")
+        raw = os.fdopen(fd, "wb")
+        temp = gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=6)
+        digest = hashlib.sha1()
+
+        complete = False
+        try:
+            for chunk in chunks:
+                temp.write(chunk)
+                digest.update(chunk)
+                yield chunk
+            complete = True
+        finally:
+            temp.close()
+            raw.close()
+            if complete:
+                self.commit(job_name, build_no, temp_path, digest.hexdigest())
+            else:
+                os.remove(temp_path)
+
+    def store(self, job_name, build_no, console):
+
+        """
+        Stores the console of a build in the cache.
+
+        :param job_name: The name of the Job
+        :param build_no: The number of the build
+        :param console: The console, as a string or an iterable of chunks
+        """
+
+        if isinstance(console, basestring):
+            console = [console]
+
+        for chunk in self.tee(job_name, build_no, console):
+            pass
+
+    def commit(self, job_name, build_no, temp_path, digest):
+
+        with cache_lock:
+            # the lock file serializes the commits of the processes that share the cache (e.g. several ingestWorkers),
+            # the thread lock the ones of the threads of a process
+            lock_file = open(self.lock_path, "a")
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                path = self.object_path(digest)
+                self.make_dirs(os.path.dirname(path))
+                if os.path.exists(path):
+                    # same contents as an already cached console
+                    os.remove(temp_path)
+                    os.utime(path, None)
+                    added = 0
+                else:
+                    os.rename(temp_path, path)
+                    added = os.path.getsize(path)
+
+                ref_path = self.ref_path(job_name, build_no)
+                self.make_dirs(os.path.dirname(ref_path))
+                fd, temp_ref = tempfile.mkstemp(dir=os.path.dirname(ref_path))
+                os.write(fd, digest)
+                os.close(fd)
+                os.rename(temp_ref, ref_path)
+
+                total = self.read_size()
+                if total is None or total + added > self.max_bytes:
+                    # no running total yet (e.g. a cache filled by an older version), or the limit is crossed
+                    total = self.evict()
+                else:
+                    total += added
+                self.write_size(total)
+            finally:
+                # releases the lock
+                lock_file.close()
+
+    def remove(self, job_name, build_no):
+        try:
+            os.remove(self.ref_path(job_name, build_no))
+        except OSError:
+            pass
+
+    def keys(self):
+
+        """
+        Lists the builds whose consoles are in the cache.
+
+        :return: A sorted list of (job name, build number) tuples
+        """
+
+        keys = []
+        if not os.path.isdir(self.refs_dir):
+            return keys
+
+        for quoted_job in os.listdir(self.refs_dir):
+            for build_no in os.listdir(os.path.join(self.refs_dir, quoted_job)):
+                if build_no.isdigit():
+                    keys.append((urllib.unquote(quoted_job), int(build_no)))
+
+        return sorted(keys)
+
+    def evict(self):
+
+        """
+        Removes the least recently used consoles until the cache fits in max_bytes.
+        References to removed consoles are dropped lazily, when they are read.
+
+        :return: The size of the remaining objects, in bytes
+        """
+
+        objects = []
+        total = 0
+        for root, dirs, files in os.walk(self.objects_dir):
+            for name in files:
+                if not name.endswith(".gz"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                objects.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+
+        objects.sort()
+        for mtime, size, path in objects:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+
+        return total
+
+    def read_size(self):
+        try:
+            with open(self.size_path, "r") as f:
+                return int(f.read())
+        except (IOError, ValueError):
+            return None
+
+    def write_size(self, total):
+        fd, temp_path = tempfile.mkstemp(dir=self.directory)
+        os.write(fd, str(total))
+        os.close(fd)
+        os.rename(temp_path, self.size_path)
+
+    def make_dirs(self, path):
+        try:
+            os.makedirs(path)
+        except OSError:
+            if not os.path.isdir(path):
+                raise
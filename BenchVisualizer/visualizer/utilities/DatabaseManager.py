@@ -1,6 +1,257 @@
-from visualizer.models import Job, Specjvm, Dacapo
+from visualizer.models import Job, Run, Result, Baseline, ChangePoint, IngestTask, parse_score, format_score, \
+    pack_samples, unpack_samples, STATUS_OK, STATUS_MISSING, STATUSES
 from django.http import Http404
-from django.db import IntegrityError
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Avg, Count, Max, Min, Q
+from django.utils import timezone
+from BenchMiner import SUITES, SUITE_HIGHER_IS_BETTER
+from ChangeDetector import detect_change_points, rolling_baseline, BASELINE_WINDOW, CONFIRM_RUNS
+from Downsampler import largest_triangle_three_buckets
+from PageCache import PageCache
+from Snapshot import pack_ragged, unpack_ragged
+from Statistics import median_interval, median_mad
+from datetime import datetime, timedelta
+import bisect
+import calendar
+import math
+import numpy as np
+
+def make_result(run, suite, benchmark, raw_score, samples=None, repetitions=None, usage=None):
+
+    """
+    Builds the (unsaved) Result row of a sub-benchmark of a run
+
+    :param run: A Run, with its id set
+    :param suite: The suite of the sub-benchmark, e.g. "dacapo"
+    :param benchmark: The name of the sub-benchmark, e.g. "avrora"
+    :param raw_score: The result of BenchMiner: the score, "missing" or "interpt/failed"
+    :param samples: The samples of the sub-benchmark ({'warmup': [...], 'iteration': [...]}), if any
+    :param repetitions: The scores of the repetitions, when the sub-benchmark ran many times (raw_score is their
+        median). Their MAD is stored along with them
+    :param usage: The resources used by the process of the sub-benchmark (see BenchScheduler.BenchRun.get_usage()),
+        None when they are unknown
+    :return: A Result
+    """
+
+    score, status = parse_score(raw_score)
+    samples = samples or {}
+    dispersion = median_mad(repetitions) if repetitions else None
+    usage = usage or {}
+
+    return Result(
+        run_id=run.id,
+        job_id=run.job_id,
+        timestamp=run.timestamp,
+        suite=suite,
+        benchmark=benchmark,
+        score=score,
+        status=status,
+        samples=pack_samples(samples.get('iteration')),
+        warmups=pack_samples(samples.get('warmup')),
+        repetitions=pack_samples(repetitions),
+        mad=dispersion[1] if dispersion is not None else None,
+        wall_time=usage.get('wall_time'),
+        user_time=usage.get('user_time'),
+        system_time=usage.get('system_time'),
+        max_rss=int(round(usage['max_rss'])) if usage.get('max_rss') is not None else None,
+        exit_status=usage.get('exit_status'))
+
+
+def make_results(run, bench):
+
+    """
+    Builds the (unsaved) Result rows of a run, one per sub-benchmark of every suite
+
+    :param run: A Run, with its id set
+    :param bench: A dict with the results of BenchMiner for every suite ('dacapo', 'specjvm'), and optionally their
+        samples ('samples', as returned by BenchMiner.mine_all_samples())
+    :return: A list of Results
+    """
+
+    return [make_result(run, suite, benchmark, bench.get(suite, {}).get(key, "missing"),
+                        bench.get('samples', {}).get(suite, {}).get(key))
+            for suite, benchmarks in SUITES for key, benchmark in benchmarks]
+
+
+# the fields of a Run that are copied to the benchmark dicts
+RUN_FIELDS = ('id', 'build_no', 'timestamp', 'revision', 'details')
+
+
+def get_bench(run, scores):
+
+    """
+    Reads a Run and its scores back to a dict of benchmarks, in the format of get_benchmarks()
+
+    :param run: A dict with the RUN_FIELDS of the Run
+    :param scores: A dict {(suite, benchmark): (score, status, samples, warmups)} with the Results of the Run,
+        the samples packed
+    """
+
+    bench = {
+        'id': run['id'],
+        'build_no': run['build_no'],
+        'samples': {}
+    }
+    for suite, benchmarks in SUITES:
+        bench['samples'][suite] = {}
+        bench[suite] = {
+            'build_no': run['build_no'],
+            'timestamp': run['timestamp'],
+            'revision': run['revision'],
+            'details': run['details'],
+        }
+        for key, benchmark in benchmarks:
+            score, status, samples, warmups = scores.get((suite, benchmark), (None, STATUS_MISSING, None, None))
+            bench[suite][key] = format_score(score, status)
+            if samples or warmups:
+                bench['samples'][suite][key] = {'iteration': unpack_samples(samples), 'warmup': unpack_samples(warmups)}
+
+    return bench
+
+
+def get_runs_benchmarks(runs):
+
+    """
+    Fetches the Results of many Runs in one query, and reads them back to dicts of benchmarks
+
+    :param runs: A list of dicts with the RUN_FIELDS of the Runs
+    :return: A list with the dict of benchmarks of each Run, in the same order
+    """
+
+    scores = dict((run['id'], {}) for run in runs)
+    results = Result.objects.filter(run_id__in=list(scores)).values_list(
+        'run_id', 'suite', 'benchmark', 'score', 'status', 'samples', 'warmups')
+    for run_id, suite, benchmark, score, status, samples, warmups in results:
+        scores[run_id][(suite, benchmark)] = (score, status, samples, warmups)
+
+    return [get_bench(run, scores[run['id']]) for run in runs]
+
+
+def bulk_create_runs(runs, batch_size):
+
+    """
+    Inserts many Runs with bulk inserts and sets their ids
+    """
+
+    Run.objects.bulk_create(runs, batch_size=batch_size)
+
+    # bulk_create() does not set the ids of the new rows on every DB backend, so they are fetched once
+    if any(run.id is None for run in runs):
+        run_ids = dict(
+            ((job_id, revision, details), run_id) for job_id, revision, details, run_id in
+            Run.objects.filter(job_id__in=set(run.job_id for run in runs)).values_list(
+                'job_id', 'revision', 'details', 'id')
+        )
+        for run in runs:
+            run.id = run_ids[(run.job_id, run.revision, run.details)]
+
+
+def to_datetime64(timestamps):
+
+    """
+    Converts aware datetimes (None for unknown) to a datetime64[us] array in UTC (NaT for unknown)
+    """
+
+    return np.array([timestamp.astimezone(timezone.utc).replace(tzinfo=None) if timestamp is not None else None
+                     for timestamp in timestamps], dtype='datetime64[us]')
+
+
+def from_datetime64(timestamps):
+
+    """
+    Converts a datetime64 array in UTC back to a list of aware datetimes (None for NaT)
+    """
+
+    return [timezone.make_aware(timestamp, timezone.utc) if timestamp is not None else None
+            for timestamp in timestamps.astype('datetime64[us]').astype(object)]
+
+
+def to_epoch_ms(timestamp):
+    return calendar.timegm(timestamp.utctimetuple()) * 1000 + timestamp.microsecond // 1000
+
+
+def format_cursor(timestamp, result_id):
+
+    """
+    Encodes the position of a Result in the history of a benchmark (its timestamp and id) as a pagination cursor
+    """
+
+    return "%d.%d" % (calendar.timegm(timestamp.utctimetuple()) * 1000000 + timestamp.microsecond, result_id)
+
+
+def parse_cursor(cursor):
+
+    """
+    Decodes a pagination cursor of format_cursor()
+
+    :return: A tuple (timestamp, result id)
+    :raise: ValueError when the cursor is malformed
+    """
+
+    micros, result_id = cursor.split(".")
+    timestamp = datetime(1970, 1, 1, tzinfo=timezone.utc) + timedelta(microseconds=int(micros))
+
+    return timestamp, int(result_id)
+
+
+def keyset_page(rows, after, limit):
+
+    """
+    Reads a page of rows ordered by (timestamp, id), right after the cursor of the previous page
+
+    :param rows: A values() queryset with the 'timestamp' and 'id' fields
+    :param after: The cursor of the previous page (see parse_cursor()), None for the first page
+    :param limit: The maximum number of rows in the page
+    :return: A tuple (list of rows, cursor of the next page, None for the last page)
+    """
+
+    if after is not None:
+        timestamp, row_id = after
+        rows = rows.filter(Q(timestamp__gt=timestamp) | Q(timestamp=timestamp, id__gt=row_id))
+
+    # one more row than the page tells if there is a next page
+    rows = list(rows.order_by('timestamp', 'id')[:limit + 1])
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = format_cursor(rows[-1]['timestamp'], rows[-1]['id'])
+
+    return rows, next_cursor
+
+
+# the number columns of a Result besides its score, NULL when unknown: the MAD of its repetitions and the resources used
+RESULT_NUMBER_FIELDS = ('mad', 'wall_time', 'user_time', 'system_time', 'max_rss', 'exit_status')
+RESULT_INTEGER_FIELDS = ('max_rss', 'exit_status')
+
+
+# the fields of the resources of the JSON API (see api.py)
+JOB_API_FIELDS = ('name', 'description', 'is_running', 'is_enabled', 'last_build_no', 'last_build_timestamp')
+RUN_API_FIELDS = ('id', 'build_no', 'timestamp', 'revision', 'details')
+RESULT_API_FIELDS = ('id', 'run', 'timestamp', 'suite', 'benchmark', 'score', 'status', 'mad', 'wall_time', 'user_time',
+                     'system_time', 'max_rss', 'exit_status')
+# the fields of a Result computed from its samples, returned only when they are selected
+SAMPLE_API_FIELDS = ('median', 'low', 'high', 'count', 'samples', 'warmups', 'repetitions')
+
+
+def to_columns(rows, fields):
+
+    """
+    Turns rows (dicts) into columns, with the timestamps in ms since the epoch
+
+    :return: A dict {field: list of the values of the rows}
+    """
+
+    columns = {}
+    for field in fields:
+        values = [row[field] for row in rows]
+        if field.endswith('timestamp'):
+            values = [to_epoch_ms(value) if value is not None else None for value in values]
+        columns[field] = values
+
+    return columns
+
 
 class DatabaseManager:
 
@@ -17,6 +268,7 @@ class DatabaseManager:
         """
 
         Job.objects.all().delete()
+        PageCache().invalidate()
 
         return "ok"
 
@@ -44,6 +296,22 @@ class DatabaseManager:
 
         return job
 
+    def get_job_id(self, job_name):
+
+        """
+        Fetches the id of a Job, in one query
+
+        :param job_name: Name of the Job
+        :return: The id of a Job
+        :raise: Http404 when the job is not found
+        """
+
+        job_id = Job.objects.filter(name=job_name).values_list('id', flat=True).first()
+        if job_id is None:
+            raise Http404("Job <" + str(job_name) + "> does not exist!")
+
+        return job_id
+
     def get_jobs(self):
 
         """
@@ -52,15 +320,36 @@ class DatabaseManager:
         :return: a list of 'Job' dicts
         """
 
-        job_names = Job.objects.values_list('name', flat=True)
+        # one query for all the jobs, in the format of get_job()
+        return list(Job.objects.values('name', 'description', 'is_running', 'is_enabled'))
 
-        jobs = []
+    def get_last_modified(self, job_name):
 
-        for job_name in job_names:
-            jobs.append(self.get_job(job_name))
+        """
+        Fetches the last time the benchmarks of a Job changed (see touch_job()), in one query
 
-        return jobs
+        :param job_name: Name of the Job
+        :return: The time of the last change
+        :raise: Http404 exception when job not found
+        """
+
+        updated_at = Job.objects.filter(name=job_name).values_list('updated_at', flat=True).first()
+        if updated_at is None:
+            raise Http404("Job <" + str(job_name) + "> does not exist!")
+
+        return updated_at
+
+    def touch_job(self, job_name):
+
+        """
+        Records that the benchmarks of a Job changed: its modification time moves to now and its cached pages are
+        dropped. Call it after every write to the builds, the results or the changes of the job.
+
+        :param job_name: Name of the Job
+        """
 
+        Job.objects.filter(name=job_name).update(updated_at=timezone.now())
+        PageCache().invalidate(job_name)
 
     def get_benchmarks(self, stored_job, build_rev, details="default"):
 
@@ -74,57 +363,11 @@ class DatabaseManager:
         :raise: Http404 when build is not found
         """
 
-        try:
-            stored_dacapo = stored_job.dacapo_set.get(revision=build_rev, details=details)
-            stored_specjvm = stored_job.specjvm_set.get(revision=build_rev, details=details)
-        except Dacapo.DoesNotExist:
+        run = stored_job.run_set.filter(revision=build_rev, details=details).values(*RUN_FIELDS).first()
+        if run is None:
             raise Http404("Build for revision,tag: <" + str(build_rev) + "," + str(details) + "> of Job <" + stored_job.name + "> does not exist!")
 
-        dacapo = {
-            'build_no': stored_dacapo.build_no,
-            'timestamp': stored_dacapo.timestamp,
-            'revision': stored_dacapo.revision,
-            'details': stored_dacapo.details,
-            'avrora': stored_dacapo.avrora,
-            'batik': stored_dacapo.batik,
-            'eclipse': stored_dacapo.eclipse,
-            'fop': stored_dacapo.fop,
-            'h2': stored_dacapo.h2,
-            'jython': stored_dacapo.jython,
-            'luindex': stored_dacapo.luindex,
-            'lusearch': stored_dacapo.lusearch,
-            'pmd': stored_dacapo.pmd,
-            'sunflow': stored_dacapo.sunflow,
-            'tomcat': stored_dacapo.tomcat,
-            'tradebeans': stored_dacapo.tradebeans,
-            'tradesoap': stored_dacapo.tradesoap,
-            'xalan': stored_dacapo.xalan
-        }
-
-        specjvm = {
-            'build_no': stored_specjvm.build_no,
-            'timestamp': stored_specjvm.timestamp,
-            'revision': stored_specjvm.revision,
-            'details': stored_specjvm.details,
-            'startup': stored_specjvm.startup,
-            'compiler': stored_specjvm.compiler,
-            'compress': stored_specjvm.compress,
-            'crypto': stored_specjvm.crypto,
-            'derby': stored_specjvm.derby,
-            'mpegaudio': stored_specjvm.mpegaudio,
-            'scimark': stored_specjvm.scimark,
-            'serial': stored_specjvm.serial,
-            'spec_sunflow': stored_specjvm.sunflow,
-            'xml': stored_specjvm.xml
-        }
-
-        bench = {
-            'build_no': stored_dacapo.build_no,
-            'dacapo': dacapo,
-            'specjvm': specjvm
-        }
-
-        return bench
+        return get_runs_benchmarks([run])[0]
 
     def get_last_benchmarks(self, job_name):
 
@@ -136,30 +379,249 @@ class DatabaseManager:
         :return: A list of build data
         """
 
-        stored_job = Job.objects.get(name=job_name)
-
         '''
-        The build numbers can be fetched from either the dacapo or the specjvm table (after desc sort on build_no).
-        Here dacapo table is used. 
+        The last two runs are fetched from the Run table (index on job, timestamp), then their results in one query.
         The simplest workaround would be to take only the last_build_no from the Job and get 
         (last_build_no - 1), but this wouldn't work if build numbers are not consecutive
         '''
-        recent_builds = stored_job.dacapo_set.all().order_by('-timestamp')
+        recent_builds = list(Run.objects.filter(job__name=job_name).order_by('-timestamp').values(*RUN_FIELDS)[:2])
+
+        return get_runs_benchmarks(recent_builds)
+
+    def get_benchmark_stats(self, job_name):
+
+        """
+        Computes the minimum, maximum and average score, and the number of successful runs, of every sub-benchmark
+        of a Job, in the DB. Missing and failed runs are not counted.
+
+        :param job_name: The name of the Job
+        :return: A dict {'dacapo': {sub-bench: {'min', 'max', 'avg', 'count'}}, 'specjvm': {...}}
+        """
 
-        if len(recent_builds) >= 2:
+        stored_job = Job.objects.get(name=job_name)
 
-            bench1 = self.get_benchmarks(stored_job, recent_builds[0].revision, recent_builds[0].details)
-            bench2 = self.get_benchmarks(stored_job, recent_builds[1].revision, recent_builds[1].details)
-            return [bench1, bench2]
+        rows = Result.objects.filter(job=stored_job).order_by().values('suite', 'benchmark').annotate(
+            min=Min('score'), max=Max('score'), avg=Avg('score'), count=Count('score'))
+        rows = dict(((row['suite'], row['benchmark']), row) for row in rows)
 
-        elif len(recent_builds) == 1:
+        stats = {}
+        for suite, benchmarks in SUITES:
+            stats[suite] = {}
+            for key, benchmark in benchmarks:
+                row = rows.get((suite, benchmark), {'min': None, 'max': None, 'avg': None, 'count': 0})
+                stats[suite][key] = {'min': row['min'], 'max': row['max'], 'avg': row['avg'], 'count': row['count']}
 
-            bench1 = self.get_benchmarks(stored_job, recent_builds[0].revision)
-            return [bench1]
+        return stats
 
-        elif len(recent_builds) == 0:
+    def get_history_results(self, job_name, suite, benchmark):
 
-            return []
+        """
+        Selects the Results of a benchmark of a Job, with the index on (job, suite, benchmark, timestamp)
+
+        :raise: Http404 when the job is not found
+        """
+
+        return Result.objects.filter(job_id=self.get_job_id(job_name), suite=suite, benchmark=benchmark)
+
+    def get_benchmark_history(self, job_name, suite, benchmark, max_points=500):
+
+        """
+        Fetches the time series of the successful scores of a benchmark of a Job, downsampled to max_points
+        with largest-triangle-three-buckets
+
+        :param job_name: The name of the Job
+        :param suite: The suite of the benchmark, for example "dacapo"
+        :param benchmark: The name of the sub-benchmark, for example "h2"
+        :param max_points: The maximum number of points returned
+        :return: A dict of columns ('timestamp' (ms since the epoch), 'score', 'build_no', 'revision' (abbreviated
+            to 7 characters, as by git)) and the number of points before downsampling ('total')
+        """
+
+        results = self.get_history_results(job_name, suite, benchmark).filter(status=STATUS_OK).order_by(
+            'timestamp', 'id').values_list('timestamp', 'score', 'run__build_no', 'run__revision')
+
+        points = [(to_epoch_ms(timestamp), score, build_no, revision) for timestamp, score, build_no, revision in results]
+        sampled = largest_triangle_three_buckets(points, max_points)
+
+        return {
+            'total': len(points),
+            'timestamp': [point[0] for point in sampled],
+            'score': [point[1] for point in sampled],
+            'build_no': [point[2] for point in sampled],
+            'revision': [point[3][:7] for point in sampled]
+        }
+
+    def get_benchmark_history_page(self, job_name, suite, benchmark, after=None, limit=1000):
+
+        """
+        Fetches a page of the raw history of a benchmark of a Job (all the runs, including the missing or failed
+        ones), with keyset pagination: a page starts right after the (timestamp, id) of the last Result of the
+        previous page, so every page is an index range scan, however deep.
+
+        :param job_name: The name of the Job
+        :param suite: The suite of the benchmark, for example "dacapo"
+        :param benchmark: The name of the sub-benchmark, for example "h2"
+        :param after: The cursor of the previous page (see parse_cursor()), None for the first page
+        :param limit: The maximum number of Results in the page
+        :return: A dict of columns ('timestamp' (ms since the epoch), 'score', 'status', 'build_no', 'revision')
+            and the cursor of the next page ('next', None for the last page)
+        """
+
+        results = self.get_history_results(job_name, suite, benchmark).values(
+            'id', 'timestamp', 'score', 'status', 'run__build_no', 'run__revision')
+        rows, next_cursor = keyset_page(results, after, limit)
+
+        labels = dict(STATUSES)
+
+        return {
+            'timestamp': [to_epoch_ms(row['timestamp']) for row in rows],
+            'score': [row['score'] for row in rows],
+            'status': [labels[row['status']] for row in rows],
+            'build_no': [row['run__build_no'] for row in rows],
+            'revision': [row['run__revision'] for row in rows],
+            'next': next_cursor
+        }
+
+    def get_api_jobs(self, fields, after=None, limit=1000):
+
+        """
+        Fetches a page of the Jobs for the JSON API, ordered by name
+
+        :param fields: The fields to return, from JOB_API_FIELDS
+        :param after: The name of the last Job of the previous page, None for the first page
+        :param limit: The maximum number of Jobs in the page
+        :return: A tuple (dict of columns, name of the last Job as the cursor of the next page, None for the last page)
+        """
+
+        jobs = Job.objects.order_by('name')
+        if after is not None:
+            jobs = jobs.filter(name__gt=after)
+
+        rows = list(jobs.values(*JOB_API_FIELDS)[:limit + 1])
+        next_cursor = rows[limit - 1]['name'] if len(rows) > limit else None
+
+        return to_columns(rows[:limit], fields), next_cursor
+
+    def get_api_runs(self, job_name, fields, ids=None, after=None, limit=1000):
+
+        """
+        Fetches a page of the Runs of a Job for the JSON API, in time order (index on job, timestamp)
+
+        :param job_name: The name of the Job
+        :param fields: The fields to return, from RUN_API_FIELDS
+        :param ids: The ids of the Runs to return, None for all of them
+        :param after: The cursor of the previous page (see parse_cursor()), None for the first page
+        :param limit: The maximum number of Runs in the page
+        :return: A tuple (dict of columns, cursor of the next page, None for the last page)
+        :raise: Http404 when the job is not found
+        """
+
+        runs = Run.objects.filter(job_id=self.get_job_id(job_name))
+        if ids is not None:
+            runs = runs.filter(id__in=ids)
+
+        rows, next_cursor = keyset_page(runs.values(*RUN_API_FIELDS), after, limit)
+
+        return to_columns(rows, fields), next_cursor
+
+    def get_api_results(self, job_name, fields, runs=None, suite=None, benchmark=None, after=None, limit=1000):
+
+        """
+        Fetches a page of the Results of a Job for the JSON API, in time order. With a suite and a benchmark, the page is
+        read from the index on (job, suite, benchmark, timestamp).
+
+        :param job_name: The name of the Job
+        :param fields: The fields to return, from RESULT_API_FIELDS and SAMPLE_API_FIELDS: the median, the confidence
+            interval ('low', 'high', see median_interval()) and the number of the measured iterations, or the samples
+            of the iterations and of the warmups, and the scores of the repetitions
+        :param runs: The ids of the Runs whose Results are returned, None for all of them
+        :param suite: The suite of the Results, None for all the suites
+        :param benchmark: The name of the sub-benchmark of the Results, None for all of them
+        :param after: The cursor of the previous page (see parse_cursor()), None for the first page
+        :param limit: The maximum number of Results in the page
+        :return: A tuple (dict of columns, cursor of the next page, None for the last page)
+        :raise: Http404 when the job is not found
+        """
+
+        results = Result.objects.filter(job_id=self.get_job_id(job_name))
+        if runs is not None:
+            results = results.filter(run_id__in=runs)
+        if suite is not None:
+            results = results.filter(suite=suite)
+        if benchmark is not None:
+            results = results.filter(benchmark=benchmark)
+
+        # the samples are read only when they are selected
+        with_samples = any(field in SAMPLE_API_FIELDS for field in fields)
+        values = ['id', 'run_id', 'timestamp', 'suite', 'benchmark', 'score', 'status', 'mad', 'wall_time', 'user_time',
+                  'system_time', 'max_rss', 'exit_status']
+        if with_samples:
+            values += ['samples', 'warmups', 'repetitions']
+        rows, next_cursor = keyset_page(results.values(*values), after, limit)
+
+        labels = dict(STATUSES)
+        for row in rows:
+            row['run'] = row['run_id']
+            row['status'] = labels[row['status']]
+            if with_samples:
+                row['samples'] = unpack_samples(row['samples'])
+                row['warmups'] = unpack_samples(row['warmups'])
+                row['repetitions'] = unpack_samples(row['repetitions'])
+                interval = median_interval(row['samples']) or {'median': None, 'low': None, 'high': None, 'count': 0}
+                row.update(interval)
+
+        return to_columns(rows, fields), next_cursor
+
+    def get_export_rows(self, job_name, since=None, until=None, revisions=None, batch_size=200):
+
+        """
+        Reads the whole history of a Job lazily, for an export: one row per Result, the runs in time order and their
+        Results in the order of SUITES. The runs are read in keyset pages of batch_size (index on job, timestamp)
+        and then their Results in one query per page, so the memory does not grow with the history.
+
+        :param job_name: The name of the Job
+        :param since: Only the runs from this (aware) datetime, None for no limit
+        :param until: Only the runs before this (aware) datetime, None for no limit
+        :param revisions: Only the runs of these revisions, None for all of them
+        :param batch_size: The number of runs read per page
+        :return: A generator of rows (timestamp, build_no, revision, tag, suite, benchmark, score, status)
+        :raise: Http404 when the job is not found (before the generator is returned)
+        """
+
+        runs = Run.objects.filter(job_id=self.get_job_id(job_name))
+        if since is not None:
+            runs = runs.filter(timestamp__gte=since)
+        if until is not None:
+            runs = runs.filter(timestamp__lt=until)
+        if revisions is not None:
+            runs = runs.filter(revision__in=revisions)
+        runs = runs.values(*RUN_FIELDS)
+
+        order = dict(((suite, benchmark), i) for i, (suite, benchmark) in
+                     enumerate((suite, benchmark) for suite, benchmarks in SUITES for key, benchmark in benchmarks))
+        labels = dict(STATUSES)
+
+        def generate():
+            after = None
+            while True:
+                page, next_cursor = keyset_page(runs, after, batch_size)
+
+                results = dict((run['id'], []) for run in page)
+                for row in Result.objects.filter(run_id__in=list(results)).values_list(
+                        'run_id', 'suite', 'benchmark', 'score', 'status'):
+                    results[row[0]].append(row[1:])
+
+                for run in page:
+                    for suite, benchmark, score, status in sorted(
+                            results[run['id']], key=lambda result: order.get(result[:2], len(order))):
+                        yield (run['timestamp'].isoformat(), run['build_no'], run['revision'], run['details'],
+                               suite, benchmark, score, labels[status])
+
+                if next_cursor is None:
+                    return
+                after = parse_cursor(next_cursor)
+
+        return generate()
 
     def get_selected_benchmarks(self, job_name, revisions, tags):
 
@@ -172,14 +634,22 @@ class DatabaseManager:
         :return: A list of benchmark data for the specific builds
         """
 
-        stored_job = Job.objects.get(name=job_name)
+        builds = zip(revisions, tags)
+        if not builds:
+            return []
 
-        benchmarks = []
+        # all the requested runs are fetched in one query
+        selection = Q()
+        for revision, tag in builds:
+            selection |= Q(revision=revision, details=tag)
+        runs = Run.objects.filter(selection, job__name=job_name).values(*RUN_FIELDS)
+        runs = dict(((run['revision'], run['details']), run) for run in runs)
 
-        for revision, tag in zip(revisions, tags):
-            benchmarks.append(self.get_benchmarks(stored_job, revision, tag))
+        for revision, tag in builds:
+            if (revision, tag) not in runs:
+                raise Http404("Build for revision,tag: <" + str(revision) + "," + str(tag) + "> of Job <" + job_name + "> does not exist!")
 
-        return benchmarks
+        return get_runs_benchmarks([runs[build] for build in builds])
 
     def store_job(self, job):
 
@@ -190,136 +660,649 @@ class DatabaseManager:
         :return: A reference to the newly stored job in the DB
         """
 
+        # the new job is listed on the index page
+        PageCache().invalidate()
+
         #firstly, store the new job in the Job table
-        stored_job = Job(
+        '''
+        #return a "reference" to the new row in the table Job. 
+        Will be used to add specjvm/dacapo results to this job
+        '''
+        return Job.objects.create(
             name=job["name"],
             description=job["description"],
             is_running=job["is_running"],
             is_enabled=job["is_enabled"])
-        stored_job.save()
 
-        '''
-        #return a "reference" to the new row in the table Job. 
-        Will be used to add specjvm/dacapo results to this job
-        '''
-        stored_job = Job.objects.get(name=job["name"])
-        return stored_job
+    def get_watermark(self, job_name):
 
-    def store_benchmarks(self, job, bench, details="default"):
+        """
+        Fetches the high-water mark of the incremental Jenkins sync for a job.
+
+        :param job_name: The name of the Job
+        :return: A tuple (number of the last ingested build, its timestamp), (0, None) if the job is not registered
+        """
+
+        try:
+            stored_job = Job.objects.get(name=job_name)
+        except Job.DoesNotExist:
+            return 0, None
+
+        return stored_job.last_build_no, stored_job.last_build_timestamp
+
+    def update_watermark(self, stored_job, builds, oldest_building=None):
+
+        """
+        Advances the high-water mark of a job to the newest (by timestamp) of the given Jenkins builds.
+        The mark never moves backwards, nor past a build that is still running: such a build is fetched again
+        by the next sync, once it has finished, even if later builds finished before it.
+
+        :param stored_job: A Django reference to a stored Job (result of store_job())
+        :param builds: A list of build dicts, as returned by the JenkinsConnector
+        :param oldest_building: The number of the oldest build that is still running, None if none is
+        :return: "ok" for successful operation
+        """
+
+        newest = self.get_newest_build(builds, oldest_building)
+
+        if newest is None:
+            return "ok"
+
+        if stored_job.last_build_timestamp is not None and newest['timestamp'] <= stored_job.last_build_timestamp:
+            return "ok"
+
+        stored_job.last_build_no = newest['build_no']
+        stored_job.last_build_timestamp = newest['timestamp']
+        stored_job.save(update_fields=['last_build_no', 'last_build_timestamp'])
+
+        return "ok"
+
+    def get_newest_build(self, builds, oldest_building=None):
+
+        newest = None
+        for build in builds:
+            if oldest_building is not None and build['build_no'] >= oldest_building:
+                continue
+            if newest is None or build['timestamp'] > newest['timestamp']:
+                newest = build
+
+        return newest
+
+    def store_benchmarks(self, job, bench, details="default", detect=True):
 
         """
-        Stores a set of benchmarks of a specific build in the DB (to the tables Specjvm and Dacapo)
+        Stores a set of benchmarks of a specific build in the DB (a Run, and its Results)
 
         :param job: The name of the Job of the build
         :param bench: A dict that contains the sets of benchmarks
         :param details: The TAG if the build is tagged, "default" otherwise
+        :param detect: Run the change-point detection over the new build. Pass False when its results are stored later
+            (see store_result()), and call detect_changes() once they are all stored
         :return: "ok" for successful operation
         """
 
-        dacapo = bench['dacapo']
-        specjvm = bench['specjvm']
+        run = self.make_run(job, bench, details)
+        # a Run without its Results would read as all missing, and block its revision/tag
+        with transaction.atomic():
+            run.save()
+            Result.objects.bulk_create(make_results(run, bench))
+        if detect:
+            self.detect_changes(job, run.timestamp)
+        self.touch_job(job.name)
 
-        job.dacapo_set.create(
-            build_no=bench['build_no'],
-            timestamp=bench['timestamp'],
-            revision=bench['revision'],
-            details=details,
-            avrora=dacapo['avrora'],
-            batik=dacapo['batik'],
-            eclipse=dacapo['eclipse'],
-            fop=dacapo['fop'],
-            h2=dacapo['h2'],
-            jython=dacapo['jython'],
-            luindex=dacapo['luindex'],
-            lusearch=dacapo['lusearch'],
-            pmd=dacapo['pmd'],
-            sunflow=dacapo['sunflow'],
-            tomcat=dacapo['tomcat'],
-            tradebeans=dacapo['tradebeans'],
-            tradesoap=dacapo['tradesoap'],
-            xalan=dacapo['xalan']
-        )
+        return "ok"
+
+    def store_result(self, stored_job, run_id, suite, key, raw_score, samples=None, repetitions=None, usage=None):
+
+        """
+        Stores (or replaces) the result of one sub-benchmark of a stored build, for example as soon as it finishes
+        while the rest of the benchmarks are still running. The change-point detection is not run again.
+
+        :param stored_job: A Django reference to a stored Job
+        :param run_id: The id of the build (the 'id' of get_benchmarks())
+        :param suite: The suite of the sub-benchmark, e.g. "dacapo"
+        :param key: The key of the sub-benchmark in the results of BenchMiner, e.g. "avrora"
+        :param raw_score: The result of BenchMiner: the score, "missing" or "interpt/failed"
+        :param samples: The samples of the sub-benchmark ({'warmup': [...], 'iteration': [...]}), if any
+        :param repetitions: The scores of its repetitions, when it ran many times (see make_result())
+        :param usage: The resources used by its process, if known (see make_result())
+        :return: "ok" for successful operation
+        :raise: Http404 when the build or the sub-benchmark is not found
+        """
+
+        try:
+            run = stored_job.run_set.get(id=run_id)
+        except Run.DoesNotExist:
+            raise Http404("Build <" + str(run_id) + "> of Job <" + stored_job.name + "> does not exist!")
+
+        benchmark = dict(dict(SUITES).get(suite, [])).get(key)
+        if benchmark is None:
+            raise Http404("Benchmark <" + str(suite) + " " + str(key) + "> does not exist!")
+
+        result = make_result(run, suite, benchmark, raw_score, samples, repetitions, usage)
+        with transaction.atomic():
+            run.result_set.filter(suite=suite, benchmark=benchmark).delete()
+            result.save()
+
+        self.touch_job(stored_job.name)
+
+        return "ok"
+
+    def make_run(self, stored_job, bench, details="default"):
+
+        """
+        Builds the (unsaved) Run of a set of benchmarks of a specific build
+
+        :param stored_job: A Django reference to a stored Job
+        :param bench: A dict that contains the sets of benchmarks
+        :param details: The TAG if the build is tagged, "default" otherwise
+        :return: A Run
+        """
 
-        job.specjvm_set.create(
+        return Run(
+            job=stored_job,
             build_no=bench['build_no'],
             timestamp=bench['timestamp'],
             revision=bench['revision'],
-            details=details,
-            startup=specjvm['startup'],
-            compiler=specjvm['compiler'],
-            compress=specjvm['compress'],
-            crypto=specjvm['crypto'],
-            derby=specjvm['derby'],
-            mpegaudio=specjvm['mpegaudio'],
-            scimark=specjvm['scimark'],
-            serial=specjvm['serial'],
-            sunflow=specjvm['spec_sunflow'],
-            xml=specjvm['xml']
+            details=details
         )
 
+    def bulk_store_runs(self, runs, benches, batch_size=None):
+
+        """
+        Stores many Runs along with their Results, with bulk inserts of batch_size rows per statement.
+        Call it inside a transaction, so that a failure does not leave some of the runs stored.
+
+        :param runs: A list of unsaved Runs (see make_run())
+        :param benches: The sets of benchmarks of the runs, in the same order
+        :param batch_size: The number of rows per insert (default: DB_BATCH_SIZE)
+        """
+
+        if batch_size is None:
+            batch_size = settings.DB_BATCH_SIZE
+
+        bulk_create_runs(runs, batch_size)
+
+        results = []
+        for run, bench in zip(runs, benches):
+            results.extend(make_results(run, bench))
+
+        Result.objects.bulk_create(results, batch_size=batch_size)
+
+    def bulk_store_benchmarks(self, stored_job, builds, batch_size=None):
+
+        """
+        Stores the sets of benchmarks of many builds of a Job with bulk inserts, batch_size rows per statement.
+        Call it inside a transaction, so that a failure does not leave some of the builds stored.
+
+        :param stored_job: A Django reference to a stored Job
+        :param builds: A list of build dicts, as returned by the JenkinsConnector
+        :param batch_size: The number of rows per insert (default: DB_BATCH_SIZE)
+        :return: "ok" for successful operation
+        """
+
+        self.bulk_store_runs([self.make_run(stored_job, build) for build in builds], builds, batch_size)
+
+        return "ok"
+
+    def bulk_store_jobs(self, jobs, batch_size=None):
+
+        """
+        Bulk ingestion: stores new Jobs along with the benchmarks of their builds, in one transaction and
+        a few statements (bulk inserts of batch_size rows). Either all the jobs are stored, or none.
+        The high-water mark of each job is set to its newest build, below the oldest build still running.
+
+        :param jobs: An array of details about each Job ('details') and its builds ('builds')
+        :param batch_size: The number of rows per insert (default: DB_BATCH_SIZE)
+        :return: "ok" for successful operation
+        :raise: IntegrityError when a Job already exists or a revision is stored twice for a Job
+        """
+
+        if batch_size is None:
+            batch_size = settings.DB_BATCH_SIZE
+
+        new_jobs = []
+        for job in jobs:
+            newest = self.get_newest_build(job['builds'], job.get('oldest_building'))
+            new_jobs.append(Job(
+                name=job['details']["name"],
+                description=job['details']["description"],
+                is_running=job['details']["is_running"],
+                is_enabled=job['details']["is_enabled"],
+                last_build_no=newest['build_no'] if newest is not None else 0,
+                last_build_timestamp=newest['timestamp'] if newest is not None else None))
+
+        with transaction.atomic():
+            Job.objects.bulk_create(new_jobs, batch_size=batch_size)
+
+            # bulk_create() does not set the ids of the new rows on every DB backend, so they are fetched once
+            stored_jobs = dict(
+                (stored_job.name, stored_job) for stored_job in Job.objects.filter(name__in=[job.name for job in new_jobs]))
+
+            runs = []
+            builds = []
+            for job in jobs:
+                stored_job = stored_jobs[job['details']['name']]
+                for build in job['builds']:
+                    runs.append(self.make_run(stored_job, build))
+                    builds.append(build)
+
+            self.bulk_store_runs(runs, builds, batch_size)
+
+            for stored_job in stored_jobs.values():
+                self.detect_changes(stored_job)
+
+        PageCache().invalidate()
+
         return "ok"
 
-    def update_benchmarks(self, stored_job, build_rev, bench, details="default"):
+    def get_snapshot(self):
+
+        """
+        Reads all the Jobs, Runs and Results into the columns of a snapshot (see Snapshot.py)
+
+        :return: A dict {column name: array}
+        """
+
+        jobs = list(Job.objects.order_by('id').values_list(
+            'id', 'name', 'description', 'is_running', 'is_enabled', 'last_build_no', 'last_build_timestamp'))
+        job_index = dict((job[0], i) for i, job in enumerate(jobs))
+
+        runs = list(Run.objects.order_by('id').values_list(
+            'id', 'job_id', 'build_no', 'timestamp', 'revision', 'details'))
+        run_index = dict((run[0], i) for i, run in enumerate(runs))
+
+        # the suites and benchmarks are stored once, each result refers to them by index
+        suite_names = {}
+        benchmark_names = {}
+        columns = dict((name, []) for name in ('run', 'suite', 'benchmark', 'score', 'status', 'samples', 'warmups',
+                                               'repetitions') + RESULT_NUMBER_FIELDS)
+
+        results = Result.objects.order_by('run_id', 'id').values_list(
+            'run_id', 'suite', 'benchmark', 'score', 'status', 'samples', 'warmups', 'repetitions', *RESULT_NUMBER_FIELDS)
+        for row in results.iterator():
+            run_id, suite, benchmark, score, status, samples, warmups, repetitions = row[:8]
+            columns['run'].append(run_index[run_id])
+            columns['suite'].append(suite_names.setdefault(suite, len(suite_names)))
+            columns['benchmark'].append(benchmark_names.setdefault(benchmark, len(benchmark_names)))
+            columns['score'].append(score if score is not None else np.nan)
+            columns['status'].append(status)
+            columns['samples'].append(samples)
+            columns['warmups'].append(warmups)
+            columns['repetitions'].append(repetitions)
+            for field, value in zip(RESULT_NUMBER_FIELDS, row[8:]):
+                columns[field].append(value if value is not None else np.nan)
+
+        samples, samples_offsets = pack_ragged(columns['samples'])
+        warmups, warmups_offsets = pack_ragged(columns['warmups'])
+        repetitions, repetitions_offsets = pack_ragged(columns['repetitions'])
+
+        return {
+            'job_name': np.array([job[1] for job in jobs], dtype=np.unicode_),
+            'job_description': np.array([job[2] for job in jobs], dtype=np.unicode_),
+            'job_is_running': np.array([job[3] for job in jobs], dtype=np.unicode_),
+            'job_is_enabled': np.array([job[4] for job in jobs], dtype=np.unicode_),
+            'job_last_build_no': np.array([job[5] for job in jobs], dtype=np.int64),
+            'job_last_build_timestamp': to_datetime64([job[6] for job in jobs]),
+            'run_job': np.array([job_index[run[1]] for run in runs], dtype=np.int32),
+            'run_build_no': np.array([run[2] for run in runs], dtype=np.int64),
+            'run_timestamp': to_datetime64([run[3] for run in runs]),
+            'run_revision': np.array([run[4] for run in runs], dtype=np.unicode_),
+            'run_details': np.array([run[5] for run in runs], dtype=np.unicode_),
+            'suite_names': np.array(sorted(suite_names, key=suite_names.get), dtype=np.unicode_),
+            'benchmark_names': np.array(sorted(benchmark_names, key=benchmark_names.get), dtype=np.unicode_),
+            'result_run': np.array(columns['run'], dtype=np.int32),
+            'result_suite': np.array(columns['suite'], dtype=np.int8),
+            'result_benchmark': np.array(columns['benchmark'], dtype=np.int16),
+            'result_score': np.array(columns['score'], dtype=np.float64),
+            'result_status': np.array(columns['status'], dtype=np.uint8),
+            'result_samples': samples,
+            'result_samples_offsets': samples_offsets,
+            'result_warmups': warmups,
+            'result_warmups_offsets': warmups_offsets,
+            'result_repetitions': repetitions,
+            'result_repetitions_offsets': repetitions_offsets,
+            'result_mad': np.array(columns['mad'], dtype=np.float64),
+            'result_wall_time': np.array(columns['wall_time'], dtype=np.float64),
+            'result_user_time': np.array(columns['user_time'], dtype=np.float64),
+            'result_system_time': np.array(columns['system_time'], dtype=np.float64),
+            'result_max_rss': np.array(columns['max_rss'], dtype=np.float64),
+            'result_exit_status': np.array(columns['exit_status'], dtype=np.float64)
+        }
+
+    def store_snapshot(self, arrays, replace=False, batch_size=None):
+
+        """
+        Stores the Jobs of a snapshot (see get_snapshot()) with bulk inserts, in one transaction, and runs the
+        change-point detection over them.
+
+        :param arrays: A dict {column name: array}, as returned by Snapshot.load_snapshot()
+        :param replace: Replace the stored Jobs that are in the snapshot too, instead of skipping them
+        :param batch_size: The number of rows per insert (default: DB_BATCH_SIZE)
+        :return: A tuple (names of the stored Jobs, names of the skipped Jobs)
+        """
+
+        if batch_size is None:
+            batch_size = settings.DB_BATCH_SIZE
+
+        names = [unicode(name) for name in arrays['job_name']]
+        existing = set(Job.objects.filter(name__in=names).values_list('name', flat=True))
+        skipped = [] if replace else [name for name in names if name in existing]
+
+        with transaction.atomic():
+            if replace:
+                Job.objects.filter(name__in=names).delete()
+
+            last_build_timestamps = from_datetime64(arrays['job_last_build_timestamp'])
+            Job.objects.bulk_create([Job(
+                name=names[i],
+                description=unicode(arrays['job_description'][i]),
+                is_running=unicode(arrays['job_is_running'][i]),
+                is_enabled=unicode(arrays['job_is_enabled'][i]),
+                last_build_no=int(arrays['job_last_build_no'][i]),
+                last_build_timestamp=last_build_timestamps[i]
+            ) for i in range(len(names)) if names[i] not in skipped], batch_size=batch_size)
+
+            stored_jobs = dict((stored_job.name, stored_job) for stored_job in Job.objects.filter(
+                name__in=[name for name in names if name not in skipped]))
+            job_ids = [stored_jobs[name].id if name in stored_jobs else None for name in names]
+
+            # the runs of the skipped jobs are not stored, nor their results
+            timestamps = from_datetime64(arrays['run_timestamp'])
+            runs = [None] * len(timestamps)
+            for i, job in enumerate(arrays['run_job'].tolist()):
+                if job_ids[job] is not None:
+                    runs[i] = Run(
+                        job_id=job_ids[job],
+                        build_no=int(arrays['run_build_no'][i]),
+                        timestamp=timestamps[i],
+                        revision=unicode(arrays['run_revision'][i]),
+                        details=unicode(arrays['run_details'][i]))
+            bulk_create_runs([run for run in runs if run is not None], batch_size)
+
+            suite_names = [unicode(name) for name in arrays['suite_names']]
+            benchmark_names = [unicode(name) for name in arrays['benchmark_names']]
+
+            # the columns are read as lists: indexing the arrays one element at a time is much slower
+            suites = arrays['result_suite'].tolist()
+            benchmarks = arrays['result_benchmark'].tolist()
+            scores = arrays['result_score'].tolist()
+            statuses = arrays['result_status'].tolist()
+            # the snapshots written before the repetitions and the resources were stored have no such columns
+            with_repetitions = 'result_mad' in arrays
+            numbers = {}
+            for field in RESULT_NUMBER_FIELDS:
+                if 'result_' + field in arrays:
+                    cast = int if field in RESULT_INTEGER_FIELDS else float
+                    numbers[field] = [None if math.isnan(value) else cast(value)
+                                      for value in arrays['result_' + field].tolist()]
+
+            results = []
+            for i, run_index in enumerate(arrays['result_run'].tolist()):
+                run = runs[run_index]
+                if run is None:
+                    continue
+
+                results.append(Result(
+                    run_id=run.id,
+                    job_id=run.job_id,
+                    timestamp=run.timestamp,
+                    suite=suite_names[suites[i]],
+                    benchmark=benchmark_names[benchmarks[i]],
+                    score=None if math.isnan(scores[i]) else scores[i],
+                    status=statuses[i],
+                    samples=unpack_ragged(arrays['result_samples'], arrays['result_samples_offsets'], i),
+                    warmups=unpack_ragged(arrays['result_warmups'], arrays['result_warmups_offsets'], i),
+                    repetitions=unpack_ragged(arrays['result_repetitions'], arrays['result_repetitions_offsets'], i)
+                    if with_repetitions else None,
+                    **dict((field, values[i]) for field, values in numbers.items())))
+
+                # the Results are inserted as they are built, so that the memory does not grow with the snapshot
+                if len(results) >= batch_size:
+                    Result.objects.bulk_create(results, batch_size=batch_size)
+                    results = []
+
+            Result.objects.bulk_create(results, batch_size=batch_size)
+
+            for stored_job in stored_jobs.values():
+                self.detect_changes(stored_job)
+
+        PageCache().invalidate()
+
+        return sorted(stored_jobs), skipped
+
+    def update_benchmarks(self, stored_job, build_rev, bench, details="default", detect=True):
         '''
         Update the benchmarks for a stored job in the DataBase
 
         :param stored_build: A reference to the stored build in the DB
         :param bench: The dict with the benchmarks
         :param details: The TAG of the build
+        :param detect: Run the change-point detection again from the updated build. Pass False when many builds are
+            updated, and call detect_changes() once afterwards
         :return: "ok" if the operation is completed, Integrity exception otherwise
         '''
 
         try:
-            stored_dacapo = stored_job.dacapo_set.get(revision=build_rev, details=details)
-            stored_specjvm = stored_job.specjvm_set.get(revision=build_rev, details=details)
-        except Dacapo.DoesNotExist:
+            run = stored_job.run_set.get(revision=build_rev, details=details)
+        except Run.DoesNotExist:
             raise Http404("Build for revision <" + str(build_rev) + "> of Job <" + stored_job.name + "> does not exist!")
 
-        dacapo = bench['dacapo']
-        specjvm = bench['specjvm']
+        # the build may move in time, the detection is rewound to its oldest position
+        since = min(run.timestamp, bench['timestamp'])
 
-        stored_dacapo.build_no = bench['build_no']
-        stored_dacapo.timestamp = bench['timestamp']
-        # revision = bench['revision']
-        # details = details
-        stored_dacapo.avrora = dacapo['avrora']
-        stored_dacapo.batik = dacapo['batik']
-        stored_dacapo.eclipse = dacapo['eclipse']
-        stored_dacapo.fop = dacapo['fop']
-        stored_dacapo.h2 = dacapo['h2']
-        stored_dacapo.jython = dacapo['jython']
-        stored_dacapo.luindex = dacapo['luindex']
-        stored_dacapo.lusearch = dacapo['lusearch']
-        stored_dacapo.pmd = dacapo['pmd']
-        stored_dacapo.sunflow = dacapo['sunflow']
-        stored_dacapo.tomcat = dacapo['tomcat']
-        stored_dacapo.tradebeans = dacapo['tradebeans']
-        stored_dacapo.tradesoap = dacapo['tradesoap']
-        stored_dacapo.xalan = dacapo['xalan']
-
-        stored_dacapo.save()
-
-        stored_specjvm.build_no = bench['build_no']
-        stored_specjvm.timestamp = bench['timestamp']
+        run.build_no = bench['build_no']
+        run.timestamp = bench['timestamp']
         # revision = bench['revision']
         # details = details
-        stored_specjvm.startup = specjvm['startup']
-        stored_specjvm.compiler = specjvm['compiler']
-        stored_specjvm.compress = specjvm['compress']
-        stored_specjvm.crypto = specjvm['crypto']
-        stored_specjvm.derby = specjvm['derby']
-        stored_specjvm.mpegaudio = specjvm['mpegaudio']
-        stored_specjvm.scimark = specjvm['scimark']
-        stored_specjvm.serial = specjvm['serial']
-        stored_specjvm.sunflow = specjvm['spec_sunflow']
-        stored_specjvm.xml = specjvm['xml']
-
-        stored_specjvm.save()
+        with transaction.atomic():
+            run.save()
+            run.result_set.all().delete()
+            Result.objects.bulk_create(make_results(run, bench))
+
+        if detect:
+            self.detect_changes(stored_job, since)
+        self.touch_job(stored_job.name)
 
         return "ok"
 
 
 
+    def get_build_benchmarks(self, stored_job, build_no):
+
+        """
+        Fetches the set of benchmarks of a Jenkins build, found by its build number (Jenkins builds are untagged)
+
+        :param stored_job: A Django reference to a stored Job
+        :param build_no: The number of the Jenkins build
+        :return: A dict that contains the set of benchmarks, as returned by get_benchmarks()
+        :raise: Http404 when the build is not found
+        """
+
+        run = stored_job.run_set.filter(build_no=build_no, details="default").values(*RUN_FIELDS).first()
+        if run is None:
+            raise Http404("Build <" + str(build_no) + "> of Job <" + stored_job.name + "> does not exist!")
+
+        return get_runs_benchmarks([run])[0]
+
+    def update_build_benchmarks(self, stored_job, build_no, bench, detect=True):
+
+        '''
+        Updates the benchmarks of a stored Jenkins build, found by its build number (Jenkins builds are untagged).
+
+        :param stored_job: A reference to the stored Job in the DB
+        :param build_no: The number of the Jenkins build
+        :param bench: A dict with the sets of benchmarks ('specjvm' and 'dacapo')
+        :param detect: Run the change-point detection again from the updated build (see update_benchmarks())
+        :return: "ok" if the operation is completed
+        :raise: Http404 when the build is not found
+        '''
+
+        stored = self.get_build_benchmarks(stored_job, build_no)
+        bench = dict(bench, build_no=build_no, timestamp=stored['dacapo']['timestamp'])
+
+        return self.update_benchmarks(stored_job, stored['dacapo']['revision'], bench, detect=detect)
+
+    def detect_changes(self, stored_job, since=None):
+
+        '''
+        Runs the change-point detection over the runs of a Job that were not tested yet, for all its benchmarks at once
+        (see ChangeDetector), then stores the changes found and the new rolling baselines.
+        Call it after runs of the Job are stored or updated.
+
+        :param stored_job: A Django reference to a stored Job
+        :param since: The oldest timestamp of the stored or updated runs. When runs older than the tested ones changed,
+            the detection is rewound and tests them again
+        :return: The number of changes found
+        '''
+
+        benchmarks = [(suite, benchmark) for suite, sub_benchs in SUITES for key, benchmark in sub_benchs]
+        rows = dict((name, row) for row, name in enumerate(benchmarks))
+
+        with transaction.atomic():
+            baselines = dict(((baseline.suite, baseline.benchmark), baseline) for baseline in stored_job.baseline_set.all())
+
+            rewound = since is not None and any(baseline.analysed is not None and since <= baseline.analysed
+                                                for baseline in baselines.values())
+            if rewound:
+                self.rewind_changes(stored_job, baselines.values(), since)
+
+            analysed = [baselines[name].analysed if name in baselines else None for name in benchmarks]
+            segments = [baselines[name].start if name in baselines else None for name in benchmarks]
+
+            # the untested runs, and the BASELINE_WINDOW runs before them
+            runs = Run.objects.filter(job=stored_job)
+            results = Result.objects.filter(job=stored_job, status=STATUS_OK)
+            if None not in analysed:
+                begin = Run.objects.filter(job=stored_job, timestamp__lte=min(analysed)).order_by(
+                    '-timestamp', '-id').values_list('timestamp', flat=True)[BASELINE_WINDOW - 1:BASELINE_WINDOW]
+                if begin:
+                    runs = runs.filter(timestamp__gte=begin[0])
+                    results = results.filter(timestamp__gte=begin[0])
+
+            runs = list(runs.order_by('timestamp', 'id').values_list('id', 'timestamp'))
+            timestamps = [timestamp for run_id, timestamp in runs]
+            columns = dict((run_id, column) for column, (run_id, timestamp) in enumerate(runs))
+
+            scores = np.full((len(benchmarks), len(runs)), np.nan)
+            for run_id, suite, benchmark, score in results.values_list('run_id', 'suite', 'benchmark', 'score'):
+                if (suite, benchmark) in rows and run_id in columns:
+                    scores[rows[(suite, benchmark)], columns[run_id]] = score
+
+            # the column of the first run of each segment, and the first untested column of each benchmark
+            start = [0 if timestamp is None else bisect.bisect_left(timestamps, timestamp) for timestamp in segments]
+            first = [0 if timestamp is None else bisect.bisect_right(timestamps, timestamp) for timestamp in analysed]
+
+            changes, start, tested = detect_change_points(scores, start, first)
+
+            change_points = []
+            for row, column, previous, baseline, score in changes:
+                suite, benchmark = benchmarks[row]
+                higher = score > baseline
+                change_points.append(ChangePoint(
+                    job=stored_job,
+                    suite=suite,
+                    benchmark=benchmark,
+                    run_id=runs[column][0],
+                    previous_run_id=runs[previous][0],
+                    timestamp=timestamps[column],
+                    direction=ChangePoint.IMPROVEMENT if higher == SUITE_HIGHER_IS_BETTER[suite] else ChangePoint.REGRESSION,
+                    baseline=baseline,
+                    score=score,
+                    magnitude=(score - baseline) / abs(baseline) if baseline else 0.0))
+                segments[row] = timestamps[column]
+            ChangePoint.objects.bulk_create(change_points)
+
+            if tested:
+                analysed = [timestamps[tested - 1] if timestamp is None else max(timestamp, timestamps[tested - 1])
+                            for timestamp in analysed]
+
+            medians, mads, counts = rolling_baseline(scores, start)
+            stored_job.baseline_set.all().delete()
+            Baseline.objects.bulk_create([Baseline(
+                job=stored_job,
+                suite=suite,
+                benchmark=benchmark,
+                median=None if math.isnan(medians[row]) else float(medians[row]),
+                mad=None if math.isnan(mads[row]) else float(mads[row]),
+                count=int(counts[row]),
+                start=segments[row],
+                analysed=analysed[row]
+            ) for row, (suite, benchmark) in enumerate(benchmarks)])
+
+        # the changes are listed on the page of the job
+        if rewound or change_points:
+            self.touch_job(stored_job.name)
+
+        return len(change_points)
+
+    def rewind_changes(self, stored_job, baselines, since):
+
+        '''
+        Rewinds the change-point detection of a Job, so that the runs from since are tested again, along with the
+        CONFIRM_RUNS - 1 runs before them (their confirmation includes the runs from since).
+        The changes found in these runs are deleted, and the segment of each benchmark starts again from its latest
+        remaining change.
+
+        :param stored_job: A Django reference to a stored Job
+        :param baselines: The stored Baselines of the Job, they are updated in place (not saved)
+        :param since: The timestamp of the oldest run to test again
+        '''
+
+        rewound = Run.objects.filter(job=stored_job, timestamp__lt=since).order_by(
+            '-timestamp', '-id').values_list('timestamp', flat=True)[CONFIRM_RUNS - 1:CONFIRM_RUNS]
+        rewound = rewound[0] if rewound else None
+
+        changes = ChangePoint.objects.filter(job=stored_job)
+        if rewound is not None:
+            changes = changes.filter(timestamp__gt=rewound)
+        changes.delete()
+
+        segments = dict(((row['suite'], row['benchmark']), row['start']) for row in ChangePoint.objects.filter(
+            job=stored_job).order_by().values('suite', 'benchmark').annotate(start=Max('timestamp')))
+
+        for baseline in baselines:
+            if rewound is None or (baseline.analysed is not None and baseline.analysed > rewound):
+                baseline.analysed = rewound
+            baseline.start = segments.get((baseline.suite, baseline.benchmark))
+
+    def get_change_points(self, job_name, direction=None, limit=None):
+
+        """
+        Fetches the changes found by the change-point detection in the benchmarks of a Job, the latest first
+
+        :param job_name: The name of the Job
+        :param direction: ChangePoint.REGRESSION or ChangePoint.IMPROVEMENT to fetch only one of them, None for both
+        :param limit: The maximum number of changes, None for all of them
+        :return: A list of dicts with the suite, benchmark, direction, baseline and score (medians before and after the
+            change), magnitude (relative to the baseline), and the revision range (from_revision, to_revision],
+            with its build numbers and the timestamp of the change
+        """
+
+        changes = ChangePoint.objects.filter(job__name=job_name)
+        if direction is not None:
+            changes = changes.filter(direction=direction)
+
+        changes = changes.order_by('-timestamp', 'suite', 'benchmark').values(
+            'suite', 'benchmark', 'direction', 'baseline', 'score', 'magnitude', 'timestamp',
+            'previous_run__revision', 'previous_run__build_no', 'run__revision', 'run__build_no')
+        if limit is not None:
+            changes = changes[:limit]
+
+        return [{
+            'suite': change['suite'],
+            'benchmark': change['benchmark'],
+            'direction': change['direction'],
+            'baseline': change['baseline'],
+            'score': change['score'],
+            'magnitude': change['magnitude'],
+            'timestamp': change['timestamp'],
+            'from_revision': change['previous_run__revision'],
+            'from_build_no': change['previous_run__build_no'],
+            'to_revision': change['run__revision'],
+            'to_build_no': change['run__build_no']
+        } for change in changes]
+
     def refresh_database(self, jobs):
 
         '''
@@ -330,15 +1313,11 @@ class DatabaseManager:
 
         '''
 
-        self.clear_database()
-
         try:
-            for job in jobs:
-                stored_job = self.store_job(job['details'])
-
-                # for each job, store its build data
-                for build in job['builds']:
-                    self.store_benchmarks(stored_job, build)
+            # the old contents stay in place if the new ones cannot be stored
+            with transaction.atomic():
+                self.clear_database()
+                self.bulk_store_jobs(jobs)
         except IntegrityError as i:
             return "Integrity Error: " + str(i)
 
@@ -353,13 +1332,190 @@ class DatabaseManager:
         :return: "ok" after successful operation, exception value if unsuccessful
         '''
         try:
-            for job in jobs:
-                stored_job = self.store_job(job['details'])
-
-                # for each job, store its build data
-                for build in job['builds']:
-                    self.store_benchmarks(stored_job, build)
+            self.bulk_store_jobs(jobs)
         except IntegrityError as i:
             return "Integrity Error: " + str(i)
 
         return "ok"
+
+    def sync_database(self, jobs):
+
+        '''
+        Incremental sync: appends the new builds of each job to the DB and advances the job's high-water mark.
+        Jobs that did not exist are registered. Nothing is deleted, so the stored data remain visible
+        while the sync runs.
+
+        :param jobs: An array of details about each Job ('details') and its new builds ('builds'),
+            as fetched with JenkinsConnector.get_job_and_benchmarks(job_name, since_build_no, since_timestamp)
+        :return: "ok" after successful operation
+        '''
+
+        for job in jobs:
+            job_details = job['details']
+
+            # each job is stored in one transaction, with bulk inserts
+            with transaction.atomic():
+                try:
+                    stored_job = Job.objects.get(name=job_details['name'])
+                except Job.DoesNotExist:
+                    stored_job = self.store_job(job_details)
+                else:
+                    # keep the job meta-data up to date
+                    meta_data = ['description', 'is_running', 'is_enabled']
+                    if any(getattr(stored_job, field) != job_details[field] for field in meta_data):
+                        for field in meta_data:
+                            setattr(stored_job, field, job_details[field])
+                        stored_job.save(update_fields=meta_data)
+                        # the meta-data are listed on the index page
+                        PageCache().invalidate()
+
+                stored_revisions = set(stored_job.run_set.filter(details="default").values_list('revision', flat=True))
+
+                new_builds = []
+                for build in job['builds']:
+                    if build['revision'] in stored_revisions:
+                        # the revision is already stored, e.g. the same commit was built twice
+                        print "Job: " + stored_job.name + " ----> skipping build " + str(build['build_no']) + \
+                              ", revision " + str(build['revision']) + " is already stored"
+                        continue
+                    stored_revisions.add(build['revision'])
+                    new_builds.append(build)
+
+                self.bulk_store_benchmarks(stored_job, new_builds)
+                self.update_watermark(stored_job, job['builds'], job.get('oldest_building'))
+
+                if new_builds:
+                    self.detect_changes(stored_job, min(build['timestamp'] for build in new_builds))
+                    self.touch_job(stored_job.name)
+
+        return "ok"
+
+    def replace_job(self, job):
+
+        '''
+        Refresh of a single job: purges the stored data of the job (including its tagged builds) and inserts the new
+        ones, in one transaction. Until the transaction commits, the old data of the job remain visible.
+
+        :param job: The details of the Job ('details') and its builds ('builds')
+        :return: "ok" after successful operation
+        '''
+
+        with transaction.atomic():
+            Job.objects.filter(name=job['details']['name']).delete()
+            PageCache().invalidate(job['details']['name'])
+            return self.sync_database([job])
+
+    def delete_other_jobs(self, job_names):
+
+        """
+        Deletes all the Jobs (and their builds) except the given ones
+
+        :param job_names: The names of the Jobs to keep
+        :return: "ok" for successful operation
+        """
+
+        Job.objects.exclude(name__in=job_names).delete()
+        PageCache().invalidate()
+
+        return "ok"
+
+    def enqueue_ingest(self, job_names, mode=IngestTask.SYNC):
+
+        """
+        Submits the ingestion of some Jenkins jobs to the queue processed by the ingestWorker command
+
+        :param job_names: The names of the Jobs to ingest
+        :param mode: IngestTask.SYNC for an incremental sync, IngestTask.REFRESH to replace the stored data of the jobs
+        :return: A list with the ids of the new tasks
+        """
+
+        return [IngestTask.objects.create(job_name=job_name, mode=mode).id for job_name in job_names]
+
+    def claim_ingest_task(self):
+
+        """
+        Takes the oldest queued ingestion off the queue and marks it as running.
+        Several workers can claim tasks concurrently, a task is claimed by exactly one of them.
+
+        :return: The claimed IngestTask, None if the queue is empty
+        """
+
+        while True:
+            task = IngestTask.objects.filter(status=IngestTask.QUEUED).order_by('id').first()
+            if task is None:
+                return None
+
+            now = timezone.now()
+            claimed = IngestTask.objects.filter(id=task.id, status=IngestTask.QUEUED).update(
+                status=IngestTask.RUNNING, started=now)
+            if claimed:
+                task.status = IngestTask.RUNNING
+                task.started = now
+                return task
+
+    def update_ingest_progress(self, task, builds_scanned, builds_total, builds_failed):
+
+        task.builds_scanned = builds_scanned
+        task.builds_total = builds_total
+        task.builds_failed = builds_failed
+        task.save(update_fields=['builds_scanned', 'builds_total', 'builds_failed'])
+
+        return "ok"
+
+    def finish_ingest_task(self, task, error=None):
+
+        """
+        Marks a running ingestion as done, or as failed when an error is given
+
+        :param task: The IngestTask
+        :param error: The error that stopped the ingestion, None if it completed
+        :return: "ok" for successful operation
+        """
+
+        task.status = IngestTask.DONE if error is None else IngestTask.FAILED
+        task.error = "" if error is None else str(error)
+        task.finished = timezone.now()
+        task.save(update_fields=['status', 'error', 'finished'])
+
+        return "ok"
+
+    def get_ingest_progress(self, task_ids=None):
+
+        """
+        Fetches the progress of some ingestions, with an estimation of the time left for the running ones
+        (based on the average time per build scanned so far)
+
+        :param task_ids: The ids of the IngestTasks, None for all the queued and running ones
+        :return: A list of progress dicts, ordered by submission
+        """
+
+        if task_ids is None:
+            tasks = IngestTask.objects.filter(status__in=[IngestTask.QUEUED, IngestTask.RUNNING])
+        else:
+            tasks = IngestTask.objects.filter(id__in=task_ids)
+
+        now = timezone.now()
+        progress = []
+
+        for task in tasks.order_by('id'):
+            eta = None
+            if task.status == IngestTask.RUNNING and task.builds_scanned > 0:
+                elapsed = (now - task.started).total_seconds()
+                eta = round(elapsed / task.builds_scanned * (task.builds_total - task.builds_scanned), 1)
+
+            progress.append({
+                'id': task.id,
+                'job_name': task.job_name,
+                'mode': task.mode,
+                'status': task.status,
+                'builds_total': task.builds_total,
+                'builds_scanned': task.builds_scanned,
+                'builds_failed': task.builds_failed,
+                'error': task.error,
+                'eta_seconds': eta,
+                'created': task.created.isoformat(),
+                'started': task.started.isoformat() if task.started else None,
+                'finished': task.finished.isoformat() if task.finished else None
+            })
+
+        return progress
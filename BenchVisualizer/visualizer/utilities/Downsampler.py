@@ -0,0 +1,58 @@
+def largest_triangle_three_buckets(points, threshold):
+
+    """
+    Downsamples a time series to `threshold` points with the Largest-Triangle-Three-Buckets algorithm
+    (Steinarsson, 2013), which keeps the visual shape of the series: peaks and steps survive the downsampling.
+
+    The first and the last points are always kept. The points in between are split in threshold - 2 buckets, and from
+    every bucket the point that forms the largest triangle with the point kept from the previous bucket and the average
+    point of the next bucket is kept.
+
+    :param points: A list of tuples (x, y, ...), sorted by x. Any extra items of a tuple are carried along
+    :param threshold: The number of points to keep
+    :return: A list of `threshold` of the points (all of them, if there are not more than threshold). Below 3 points,
+        only the first point (threshold 1), or the first and the last points (threshold 2) are kept
+    """
+
+    size = len(points)
+    if threshold >= size:
+        return list(points)
+    if threshold < 1:
+        return []
+    if threshold == 1:
+        return [points[0]]
+    if threshold == 2:
+        return [points[0], points[-1]]
+
+    sampled = [points[0]]
+    bucket_size = (size - 2) / float(threshold - 2)
+
+    # the index of the point kept from the previous bucket
+    previous = 0
+
+    for bucket in range(threshold - 2):
+        # the average point of the next bucket (the last point, for the last bucket)
+        next_start = int((bucket + 1) * bucket_size) + 1
+        next_end = min(int((bucket + 2) * bucket_size) + 1, size)
+        average_x = sum(point[0] for point in points[next_start:next_end]) / float(next_end - next_start)
+        average_y = sum(point[1] for point in points[next_start:next_end]) / float(next_end - next_start)
+
+        previous_x = points[previous][0]
+        previous_y = points[previous][1]
+
+        largest_area = -1
+        largest = next_start - 1
+        for index in range(int(bucket * bucket_size) + 1, next_start):
+            # twice the area of the triangle, the constant factor does not change the comparison
+            area = abs((previous_x - average_x) * (points[index][1] - previous_y) -
+                       (previous_x - points[index][0]) * (average_y - previous_y))
+            if area > largest_area:
+                largest_area = area
+                largest = index
+
+        sampled.append(points[largest])
+        previous = largest
+
+    sampled.append(points[-1])
+
+    return sampled
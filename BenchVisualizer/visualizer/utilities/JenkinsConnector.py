@@ -1,7 +1,45 @@
+from django.conf import settings
+from django.utils import timezone
 from jenkinsapi.jenkins import Jenkins
 from jenkinsapi.custom_exceptions import NoBuildData
+from jenkinsapi.utils.requester import Requester
+from multiprocessing.pool import ThreadPool
+from requests.adapters import HTTPAdapter
+from requests.exceptions import HTTPError
 from BenchMiner import BenchMiner
+from ConsoleCache import ConsoleCache
 from datetime import datetime
+import threading
+import urllib
+
+# size of the pieces in which build consoles are streamed from Jenkins
+CONSOLE_CHUNK_SIZE = 1024 * 1024
+
+# the fields of a job that make up its details, fetched in one request
+JOB_TREE = "name,description,color,firstBuild[number],lastBuild[number,building]"
+
+# the fields of a build that make up its metadata
+BUILD_TREE = "number,url,result,building,timestamp,actions[lastBuiltRevision[SHA1]]"
+
+# number of builds whose metadata are fetched per request
+BUILDS_PAGE_SIZE = 100
+
+
+class PooledRequester(Requester):
+
+    """
+    A JenkinsApi requester whose HTTP session keeps up to pool_size connections alive to the Jenkins server,
+    so the concurrent build scans reuse connections instead of opening a new one per request.
+    """
+
+    def __init__(self, *args, **kwargs):
+        pool_size = kwargs.pop('pool_size', 10)
+        Requester.__init__(self, *args, **kwargs)
+
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
 
 class JenkinsConnector:
 
@@ -9,29 +47,78 @@ class JenkinsConnector:
     Handles the connection of the web application to the Jenkins Server, as well as the the data passed.
     It uses the JenkinsApi python module to provide this functionality
     More on JenkinsApi: https://github.com/pycontribs/jenkinsapi/
+
+    The URL and the credentials of the server default to the JENKINS_* settings. The connection to the server
+    is opened lazily: creating a JenkinsConnector sends no request. Use get_jenkins_connector() to share one
+    connector (and its pool of HTTP connections) across the whole process.
     """
 
-    def __init__(self, jenkins_url="http://localhost:8080", name="name", key="key"):
-        self.server = Jenkins(jenkins_url, name, key)
+    def __init__(self, jenkins_url=None, name=None, key=None, max_workers=None):
+        self.jenkins_url = jenkins_url if jenkins_url is not None else settings.JENKINS_URL
+        self.name = name if name is not None else settings.JENKINS_USER
+        self.key = key if key is not None else settings.JENKINS_TOKEN
+        self.max_workers = max_workers if max_workers is not None else settings.JENKINS_MAX_WORKERS
+
+        self.jenkins = None
+        self.jenkins_lock = threading.Lock()
+        self.cache = ConsoleCache()
+
+    @property
+    def server(self):
+
+        """
+        The JenkinsApi server object, created on first use. It does not poll the server when it is created.
+        """
+
+        with self.jenkins_lock:
+            if self.jenkins is None:
+                requester = PooledRequester(
+                    self.name, self.key,
+                    baseurl=self.jenkins_url,
+                    timeout=settings.JENKINS_TIMEOUT,
+                    # one connection per build scanned concurrently, plus the web requests
+                    pool_size=self.max_workers + 2
+                )
+                self.jenkins = Jenkins(self.jenkins_url, requester=requester, lazy=True, timeout=settings.JENKINS_TIMEOUT)
+
+        return self.jenkins
+
+    def get_job_url(self, jobname):
+        return "%s/job/%s" % (self.server.baseurl, urllib.quote(jobname))
+
+    def get_json(self, url, tree):
+
+        """
+        Fetches the JSON API of a Jenkins object, limited to the fields of `tree`
+
+        :param url: The url of the Jenkins object (server, job or build)
+        :param tree: A Jenkins tree filter, for example "name,builds[number]"
+        :return: The decoded JSON data
+        """
+
+        response = self.server.requester.get_url(url.rstrip("/") + "/api/json", params={'tree': tree})
+        response.raise_for_status()
+
+        return response.json()
 
     def get_jobs_summary(self):
-        server_jobs = []
 
-        print str(self.server.get_jobs_list())
-        jenkins_job_names = self.server.get_jobs_list()
+        """
+        Fetches the details of all the jobs of the Jenkins server, in a single request
+
+        :return: A list of job details dicts
+        :raise: ValueError when the server has no jobs with build data
+        """
 
-        for job_name in jenkins_job_names:
+        server_jobs = []
 
-            '''
-            Avoid duplicate Job entries on the server, like for example:
-            'Job1' and 'http:/0.0.0.0:8080/Job1'
-            '''
-            if not job_name.startswith('http:/'):
-                try:
-                    job_details = self.get_job_details(job_name)
-                    server_jobs.append(job_details)
-                except NoBuildData:
-                    print job_name + "has no build data"
+        data = self.get_json(self.server.baseurl, "jobs[" + JOB_TREE + "]")
+
+        for job_data in data.get('jobs', []):
+            try:
+                server_jobs.append(self._get_job_details(job_data))
+            except NoBuildData:
+                print job_data['name'] + " has no build data"
 
         # if no jobs are found on the jenkins server...
         if server_jobs == []:
@@ -41,82 +128,253 @@ class JenkinsConnector:
 
     def get_job_details(self, jobname):
 
-        job = self.server.get_job(jobname)
+        data = self.get_json(self.get_job_url(jobname), JOB_TREE)
+
+        return self._get_job_details(data)
+
+    def _get_job_details(self, job_data):
+
+        """
+        Builds the details dict of a job out of its polled data (see JOB_TREE)
+
+        :raise: NoBuildData when the job has no builds
+        """
 
-        fb = job.get_first_build()
-        lb = job.get_last_build()
+        if not job_data.get('firstBuild') or not job_data.get('lastBuild'):
+            raise NoBuildData(job_data['name'])
+
+        is_running = job_data['lastBuild'].get('building', False)
 
         job_details = {
-            'name': job.name,
-            'description': job.get_description(),
-            'is_running': job.is_running(),
-            'is_enabled': job.is_enabled(),
-            'first_build_no': str(fb.buildno),
-            'last_build_no': str(lb.buildno),
-            'job_running': str(job.is_running())
+            'name': job_data['name'],
+            'description': job_data.get('description'),
+            'is_running': is_running,
+            'is_enabled': job_data.get('color') != 'disabled',
+            'first_build_no': str(job_data['firstBuild']['number']),
+            'last_build_no': str(job_data['lastBuild']['number']),
+            'job_running': str(is_running)
         }
 
         return job_details
 
-    def get_build_benchmarks(self, jobname, build_no):
-        job = self.server.get_job(jobname)
-        build = job.get_build(build_no)
+    def get_builds_metadata(self, jobname, since_build_no=0):
+
+        """
+        Fetches the metadata (number, result, timestamp and git revision) of the builds of a job in bulk,
+        BUILDS_PAGE_SIZE builds per request, without fetching any build object.
+
+        :param jobname: The name of the Job
+        :param since_build_no: Only the builds with a greater number are fetched, 0 to fetch all the builds
+        :return: A list of build metadata dicts (see _get_build_metadata()), ordered by build number
+        """
+
+        builds = []
+        start = 0
+        while True:
+            # allBuilds lists the newest build first
+            data = self.get_json(
+                self.get_job_url(jobname), "allBuilds[%s]{%d,%d}" % (BUILD_TREE, start, start + BUILDS_PAGE_SIZE))
+            page = [self._get_build_metadata(build_data) for build_data in data.get('allBuilds', [])]
+            builds.extend(build for build in page if build['build_no'] > since_build_no)
+
+            if len(page) < BUILDS_PAGE_SIZE or page[-1]['build_no'] <= since_build_no:
+                break
+            start += BUILDS_PAGE_SIZE
+
+        return sorted(builds, key=lambda build: build['build_no'])
+
+    def get_build_metadata(self, jobname, build_no):
+        return self._get_build_metadata(self.get_json("%s/%d" % (self.get_job_url(jobname), build_no), BUILD_TREE))
+
+    def _get_build_metadata(self, build_data):
+
+        """
+        Builds the metadata dict of a build out of its polled data (see BUILD_TREE)
+        """
 
         '''
         Jenkinsapi's get_revision() throws exception for this pipeline.
-        Bypass Jenkinsapi's get_revision() to get the attribute 'git revision'
-        directly from the build object.
+        Take the attribute 'git revision' directly from the actions of the build.
         '''
-        revision = getattr(build, '_get_git_rev', lambda: None)()
-        if revision is None:
-            revision = "Not specified"
-        
-        spec_miner = BenchMiner(build.get_console())
+        revision = "Not specified"
+        for action in build_data.get('actions') or []:
+            if action and 'lastBuiltRevision' in action:
+                revision = action['lastBuiltRevision']['SHA1']
+                break
+
+        building = build_data.get('building', False)
+
+        return {
+            'build_no': build_data['number'],
+            'url': build_data['url'],
+            'building': building,
+            # same as jenkinsapi's Build.is_good(): a running build is not good
+            'is_good': not building and build_data.get('result') == 'SUCCESS',
+            'revision': revision,
+            # Java timestamps are given in milliseconds since the epoch start
+            'timestamp': datetime.utcfromtimestamp(build_data['timestamp'] // 1000).replace(tzinfo=timezone.utc)
+        }
+
+    def get_build_benchmarks(self, jobname, build_no):
+
+        return self._mine_build(jobname, self.get_build_metadata(jobname, build_no))
+
+    def _mine_build(self, jobname, build):
+
+        """
+        Mines the benchmarks of a build, given its metadata. Only the console is downloaded.
+
+        :raise: HTTPError when the console cannot be downloaded
+        """
 
-        # get all specjvm results
-        spec_result = spec_miner.mine_all_specjvms()
+        build_no = build['build_no']
 
-        # get all dacapo tests
-        dacapo_result = spec_miner.mine_all_dacapos()
+        # the console is streamed into the miner, so it is never held in memory as a whole
+        console = self.cache.open(jobname, build_no)
+        if console is not None:
+            chunks = iter(lambda: console.read(CONSOLE_CHUNK_SIZE), "")
+        else:
+            console = self.server.requester.get_url(build['url'].rstrip("/") + "/consoleText", stream=True)
+            # an error page is not a console: it would be mined as a build with all its benchmarks missing
+            try:
+                console.raise_for_status()
+            except HTTPError:
+                console.close()
+                raise
+            chunks = console.iter_content(CONSOLE_CHUNK_SIZE)
+            # the console of a finished build never changes, so it is cached while it is mined
+            if not build['building']:
+                chunks = self.cache.tee(jobname, build_no, chunks)
+
+        try:
+            spec_miner = BenchMiner(chunks)
+
+            # get all specjvm results
+            spec_result = spec_miner.mine_all_specjvms()
+
+            # get all dacapo tests
+            dacapo_result = spec_miner.mine_all_dacapos()
+
+            # and the warmup and iteration samples behind the results
+            samples = spec_miner.mine_all_samples()
+        finally:
+            console.close()
 
         build_details = {
             'build_no': build_no,
-            'is_good': str(build.is_good()),
-            'revision': revision,
-            'timestamp': build.get_timestamp(),
+            'is_good': str(build['is_good']),
+            'revision': build['revision'],
+            'timestamp': build['timestamp'],
             'specjvm': spec_result,
-            'dacapo': dacapo_result
+            'dacapo': dacapo_result,
+            'samples': samples
         }
 
         return build_details
 
-    def get_job_and_benchmarks(self, job_name):
+    def get_job_and_benchmarks(self, job_name, since_build_no=0, since_timestamp=None, max_workers=None,
+                               progress=None):
+
+        """
+        Fetches the details of a job along with the benchmarks of all its good builds.
+        The metadata of the builds are fetched in bulk, and the failed builds are skipped before any console
+        is downloaded. The consoles of the good builds are fetched and mined concurrently by a pool of
+        at most max_workers threads.
+
+        For an incremental sync, only the builds newer than the high-water mark (since_build_no, since_timestamp)
+        are fetched. If the job was recreated on Jenkins and its build numbers restarted below the mark,
+        the builds that ran after since_timestamp are fetched instead.
+
+        :param job_name: The name of the Job
+        :param since_build_no: The number of the last ingested build, 0 to fetch the whole history
+        :param since_timestamp: The timestamp of the last ingested build, None to fetch the whole history
+        :param max_workers: The maximum number of builds that are scanned concurrently (default: JENKINS_MAX_WORKERS)
+        :param progress: An optional callable, called as progress(builds_scanned, builds_total, builds_failed)
+            once the builds are listed and after every scanned build. It is always called from the calling thread
+        :return: A dict with the job details ('details'), the benchmarks of its good builds ('builds'),
+            ordered by build number, and the number of the oldest new build that is still running ('oldest_building',
+            None if none is), which the high-water mark must stay below
+        """
 
         job_dtl = self.get_job_details(job_name)
-        # for each one of the job's builds, get the benchmarks
-        builds = []
+
+        # the build numbers restarted below the mark, so the build numbers cannot tell which builds are new
+        numbering_reset = since_timestamp is not None and int(job_dtl["last_build_no"]) < since_build_no
+
         print "Job: " + job_name + " --------> Searching for good builds"
-        for i in range(int(job_dtl["first_build_no"]), int(job_dtl["last_build_no"]) + 1, 1):
-            # exclude the failed builds
-            if self.is_build_good(job_name, i) == "False":
-                continue
-            print "Job: " + job_name + " ----> scanning build " + str(i)
-            build = self.get_build_benchmarks(job_name, i)
-            builds.append(build)
+
+        if numbering_reset:
+            new_builds = [
+                build for build in self.get_builds_metadata(job_name) if build['timestamp'] > since_timestamp
+            ]
+        else:
+            new_builds = self.get_builds_metadata(job_name, since_build_no)
+
+        # a running build is not ingested yet, but a later build may finish first
+        building = [build['build_no'] for build in new_builds if build['building']]
+        oldest_building = min(building) if building else None
+
+        # exclude the failed builds
+        good_builds = [build for build in new_builds if build['is_good']]
+        builds_failed = len(new_builds) - len(good_builds)
+
+        if progress is not None:
+            progress(0, len(good_builds), builds_failed)
+
+        def scan_build(build):
+            print "Job: " + job_name + " ----> scanning build " + str(build['build_no'])
+            return self._mine_build(job_name, build)
+
+        if max_workers is None:
+            max_workers = self.max_workers
+
+        pool = ThreadPool(max(1, min(max_workers, len(good_builds))))
+        builds = []
+        try:
+            # the progress is reported in the order of completion
+            for build in pool.imap_unordered(scan_build, good_builds):
+                builds.append(build)
+                if progress is not None:
+                    progress(len(builds), len(good_builds), builds_failed)
+        finally:
+            pool.close()
+            pool.join()
+
+        builds.sort(key=lambda build: build['build_no'])
+
         '''
         For each job, some basic details are stored ('details' part), 
         along with benchmark information for every build ('builds' part)
         '''
         job = {
             'details': job_dtl,
-            'builds': builds
+            'builds': builds,
+            'oldest_building': oldest_building
         }
 
         return job
 
     def is_build_good(self, jobname, build_no):
 
-        job = self.server.get_job(jobname)
-        build = job.get_build(build_no)
+        return str(self.get_build_metadata(jobname, build_no)['is_good'])
+
+
+# the connector shared by the whole process, see get_jenkins_connector()
+shared_connector = None
+shared_connector_lock = threading.Lock()
+
+
+def get_jenkins_connector():
+
+    """
+    Returns the process-wide JenkinsConnector, configured from the settings. It is created on first use, and it
+    keeps its HTTP connections to the Jenkins server alive between requests.
+    """
+
+    global shared_connector
+
+    with shared_connector_lock:
+        if shared_connector is None:
+            shared_connector = JenkinsConnector()
 
-        return str(build.is_good())
+    return shared_connector
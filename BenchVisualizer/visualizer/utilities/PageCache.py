@@ -0,0 +1,140 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+import hashlib
+import os
+import threading
+import time
+
+# the version of the list of jobs, part of the key of every page
+JOBS_VERSION = "jobs-version"
+
+# the files of the app that the pages are made of
+CODE_EXTENSIONS = ('.py', '.html', '.js', '.css')
+
+code_version = None
+code_version_lock = threading.Lock()
+
+
+def get_code_version():
+
+    """
+    A hash of the code, the templates and the static files of the app, computed once per process.
+    It changes with every deploy that changes any of them.
+    """
+
+    global code_version
+
+    with code_version_lock:
+        if code_version is None:
+            app_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+            digest = hashlib.sha1()
+            for root, dirs, files in os.walk(app_dir):
+                dirs.sort()
+                for name in sorted(files):
+                    if not name.endswith(CODE_EXTENSIONS):
+                        continue
+                    path = os.path.join(root, name)
+                    digest.update(os.path.relpath(path, app_dir).encode("utf-8"))
+                    with open(path, "rb") as f:
+                        digest.update(f.read())
+            code_version = digest.hexdigest()[:12]
+
+    return code_version
+
+
+class PageCache:
+
+    """
+    Caches the pages (or the data behind them) through the Django cache framework, keyed by versions.
+
+    Every Job has a version, and the list of jobs has one too. A cached page is keyed by the versions of the data it
+    shows, so bumping a version (invalidate()) drops at once every page of the job, without deleting any key: the
+    stale entries are never read again and expire after PAGE_CACHE_TIMEOUT. The versions are kept in the cache too,
+    without timeout, so the processes that write to the DB (e.g. the ingestWorker command) and the web server must
+    share the cache backend (see CACHES in settings.py).
+
+    The keys of the pages and the tags are salted with the version of the code (PAGE_CACHE_SALT, by default a hash of
+    the code of the app), so the pages rendered by an older deploy are never served by a newer one.
+    """
+
+    def __init__(self, timeout=None, salt=None):
+        self.timeout = timeout if timeout is not None else settings.PAGE_CACHE_TIMEOUT
+        if salt is None:
+            salt = settings.PAGE_CACHE_SALT or get_code_version()
+        self.salt = salt
+
+    def version_key(self, job_name=None):
+        if job_name is None:
+            return JOBS_VERSION
+        return "job-version:" + hashlib.sha1(job_name.encode("utf-8")).hexdigest()
+
+    def get_version(self, job_name=None):
+        key = self.version_key(job_name)
+        version = cache.get(key)
+        if version is None:
+            # a lost version starts again from the current time, above any version used before
+            cache.add(key, int(time.time() * 1000), timeout=None)
+            version = cache.get(key)
+        return version
+
+    def bump(self, job_name=None):
+        key = self.version_key(job_name)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, int(time.time() * 1000), timeout=None)
+
+    def invalidate(self, job_name=None):
+
+        """
+        Drops the cached pages of a Job, or all the cached pages (including the list of jobs) if job_name is None.
+
+        The version is bumped now, so that no page is served from the old data any more, and once more when the
+        transaction commits, because a page rendered in between would have been cached with the old data.
+
+        :param job_name: The name of the Job whose benchmarks changed, None when the jobs themselves changed
+        """
+
+        self.bump(job_name)
+        transaction.on_commit(lambda: self.bump(job_name))
+
+    def get_versions(self, job_name=None):
+        versions = [self.get_version()]
+        if job_name is not None:
+            versions.append(self.get_version(job_name))
+        return versions
+
+    def tag(self, job_name=None):
+
+        """
+        A tag that changes whenever the pages of a Job (or the list of jobs, if job_name is None) change,
+        e.g. for the ETag of the responses
+        """
+
+        return "-".join([self.salt] + [str(version) for version in self.get_versions(job_name)])
+
+    def key(self, page, job_name=None, *parts):
+        key = repr((self.salt, page, job_name, self.get_versions(job_name)) + parts)
+        return "page:" + hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+    def get(self, page, job_name=None, *parts):
+
+        """
+        Fetches a cached page
+
+        :param page: The name of the page, e.g. "jobDetails"
+        :param job_name: The name of the Job that the page shows, None for pages of all the jobs
+        :param parts: Anything else that the contents of the page depend on, e.g. the selected builds
+        :return: The cached page, None if it is not cached
+        """
+
+        return cache.get(self.key(page, job_name, *parts))
+
+    def set(self, value, page, job_name=None, *parts):
+
+        """
+        Caches a page, with the same arguments as get()
+        """
+
+        cache.set(self.key(page, job_name, *parts), value, self.timeout)
@@ -1,3 +1,26 @@
+import csv
+import zlib
+
+
+class Echo:
+
+    """
+    A file-like object that returns what is written to it, so that csv.writer() formats one row at a time
+    """
+
+    def write(self, value):
+        return value
+
+
+def encode(value):
+    # the csv module of Python 2 writes bytes
+    if value is None:
+        return ""
+    if isinstance(value, unicode):
+        return value.encode("utf-8")
+    return str(value)
+
+
 class RawDataMaker:
 
     """
@@ -8,20 +31,52 @@ class RawDataMaker:
         self.data = benchmarks
         self.delimiter = delimiter
 
-    def get_raw_data(self):
+    def iter_raw_data(self, chunk_size=64 * 1024):
 
-        titles = self.data['titles']
-        zipped_list = self.data['zipped_list']
+        """
+        Serializes the titles and the rows lazily, in chunks of about chunk_size bytes, so that the rows can come from
+        a generator (e.g. straight from the DB) and be streamed in constant memory
 
-        output = ""
+        :param chunk_size: The minimum size of a chunk (but the last one), in bytes
+        :return: A generator of CSV chunks
+        """
 
-        for title in titles:
-            output += title + self.delimiter
-        output = output[:-1] + "\n"
+        writer = csv.writer(Echo(), delimiter=self.delimiter, lineterminator="\n")
 
-        for build in zipped_list:
-            for bench in build:
-                output += bench + self.delimiter
-            output = output[:-1] + "\n"
+        lines = [writer.writerow([encode(title) for title in self.data['titles']])]
+        size = len(lines[0])
 
-        return output
+        for build in self.data['zipped_list']:
+            line = writer.writerow([encode(bench) for bench in build])
+            lines.append(line)
+            size += len(line)
+
+            if size >= chunk_size:
+                yield "".join(lines)
+                lines = []
+                size = 0
+
+        if lines:
+            yield "".join(lines)
+
+    def iter_gzip_data(self, level=6):
+
+        """
+        Compresses the chunks of iter_raw_data() on the fly, to a gzip stream
+
+        :param level: The compression level, from 1 (fastest) to 9 (smallest)
+        :return: A generator of gzip chunks
+        """
+
+        # wbits 16 + 15 writes the gzip header and trailer around the deflate stream
+        compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+        for chunk in self.iter_raw_data():
+            compressed = compressor.compress(chunk)
+            if compressed:
+                yield compressed
+
+        yield compressor.flush()
+
+    def get_raw_data(self):
+        return "".join(self.iter_raw_data())
@@ -0,0 +1,103 @@
+import numpy as np
+import os
+
+'''
+A snapshot of the benchmark DB is a set of NumPy arrays, one per column of the jobs, runs and results:
+
+ - job_name, job_description, job_is_running, job_is_enabled, job_last_build_no, job_last_build_timestamp
+ - run_job (the index of the job of each run), run_build_no, run_timestamp, run_revision, run_details
+ - result_run (the index of the run of each result), result_suite and result_benchmark (indexes in suite_names and
+   benchmark_names), result_score (NaN when missing or failed), result_status
+ - result_samples / result_warmups / result_repetitions: the samples (and the scores of the repetitions) of all the
+   results one after the other (float64), and result_samples_offsets / result_warmups_offsets /
+   result_repetitions_offsets: where the samples of each result start (one more than the results)
+ - result_mad: the MAD of the repetitions of each result (NaN when it ran once), and result_wall_time,
+   result_user_time, result_system_time, result_max_rss, result_exit_status: the resources used by the process of
+   each result run locally (float64, NaN when unknown). Snapshots written before these were stored have no such columns
+
+The timestamps are datetime64[us] in UTC (NaT when unknown) and the strings fixed-width unicode, so that no array needs
+pickle. The change points and baselines are not part of a snapshot, they are computed again on import.
+
+A snapshot is written either to one .npz file (compressed, to move it around) or to a directory of .npy files, one per
+column, which NumPy (np.load(path, mmap_mode='r')) and pandas can memory-map without reading them.
+'''
+
+SNAPSHOT_VERSION = 1
+
+
+def pack_ragged(packed):
+
+    """
+    Concatenates the packed samples of many results (see models.pack_samples())
+
+    :param packed: A list of packed samples (bytes, None when there are no samples)
+    :return: A tuple (float64 array of all the samples, int64 array of the offset of the samples of each result)
+    """
+
+    lengths = [len(value) // 8 if value else 0 for value in packed]
+    offsets = np.zeros(len(packed) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+
+    values = np.frombuffer(b"".join(bytes(value) for value in packed if value), dtype='<f8')
+
+    return values, offsets
+
+
+def unpack_ragged(values, offsets, i):
+
+    """
+    The packed samples of the i-th result of pack_ragged(), None when it has no samples
+    """
+
+    start, end = offsets[i], offsets[i + 1]
+    if start == end:
+        return None
+
+    return values[start:end].astype('<f8').tobytes()
+
+
+def save_snapshot(path, arrays):
+
+    """
+    Writes a snapshot to a compressed .npz file if path ends with .npz, to a directory of .npy files otherwise
+
+    :param path: The path of the snapshot
+    :param arrays: A dict {column name: array}
+    """
+
+    arrays = dict(arrays, snapshot_version=np.array(SNAPSHOT_VERSION))
+
+    if path.endswith(".npz"):
+        np.savez_compressed(path, **arrays)
+        return
+
+    if not os.path.isdir(path):
+        os.makedirs(path)
+    for name, array in arrays.items():
+        np.save(os.path.join(path, name + ".npy"), array, allow_pickle=False)
+
+
+def load_snapshot(path, mmap_mode=None):
+
+    """
+    Reads a snapshot of save_snapshot()
+
+    :param path: The path of the .npz file or of the directory
+    :param mmap_mode: 'r' to memory-map the arrays of a directory (the arrays of a .npz file are always read)
+    :return: A dict {column name: array}
+    :raise: ValueError when the snapshot is of another version
+    """
+
+    if path.endswith(".npz"):
+        npz = np.load(path, allow_pickle=False)
+        arrays = dict((name, npz[name]) for name in npz.files)
+        npz.close()
+    else:
+        arrays = dict((name[:-len(".npy")], np.load(os.path.join(path, name), mmap_mode=mmap_mode, allow_pickle=False))
+                      for name in os.listdir(path) if name.endswith(".npy"))
+
+    version = int(arrays.pop('snapshot_version', 0))
+    if version != SNAPSHOT_VERSION:
+        raise ValueError("Unsupported snapshot version <" + str(version) + ">")
+
+    return arrays
@@ -0,0 +1,55 @@
+import math
+
+
+def median_interval(samples, z=1.96):
+
+    """
+    Computes the median of the samples of a benchmark and a distribution-free confidence interval for it, from the
+    order statistics of the samples: the interval is between the sorted samples of ranks n/2 -+ z * sqrt(n) / 2
+    (about 95% confidence for z = 1.96). Benchmark samples are rarely normal (JIT, GC pauses), so no distribution
+    is assumed. With few samples the interval widens to the smallest and the largest sample.
+
+    :param samples: A list of samples
+    :param z: The quantile of the standard normal distribution for the confidence level
+    :return: A dict {'median', 'low', 'high', 'count'}, None if there are no samples
+    """
+
+    n = len(samples)
+    if n == 0:
+        return None
+
+    ordered = sorted(samples)
+    median = (ordered[(n - 1) // 2] + ordered[n // 2]) / 2.0
+
+    # the 1-based ranks of the bounds
+    low_rank = int(math.floor(n / 2.0 - z * math.sqrt(n) / 2.0))
+    high_rank = int(math.ceil(1 + n / 2.0 + z * math.sqrt(n) / 2.0))
+
+    return {
+        'median': median,
+        'low': ordered[max(low_rank, 1) - 1],
+        'high': ordered[min(high_rank, n) - 1],
+        'count': n
+    }
+
+
+def median_mad(values):
+
+    """
+    Computes the median of a list of values and their median absolute deviation (MAD) from it, a dispersion that
+    outliers barely move (the change-point detection uses it for the baselines too)
+
+    :param values: A list of values
+    :return: A tuple (median, MAD), None if there are no values
+    """
+
+    n = len(values)
+    if n == 0:
+        return None
+
+    ordered = sorted(values)
+    median = (ordered[(n - 1) // 2] + ordered[n // 2]) / 2.0
+
+    deviations = sorted(abs(value - median) for value in values)
+
+    return median, (deviations[(n - 1) // 2] + deviations[n // 2]) / 2.0
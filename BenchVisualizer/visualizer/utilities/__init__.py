@@ -1,4 +1,5 @@
-from JenkinsConnector import JenkinsConnector
+from JenkinsConnector import JenkinsConnector, get_jenkins_connector
 from BenchMiner import BenchMiner
 from RawDataMaker import RawDataMaker
 from DatabaseManager import DatabaseManager
+from ConsoleCache import ConsoleCache
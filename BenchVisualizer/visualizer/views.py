@@ -7,55 +7,253 @@ import requests
 from jenkinsapi.jenkins import Jenkins
 from django.template import loader
 from requests import ConnectionError
-from utilities import JenkinsConnector, RawDataMaker, DatabaseManager
+from utilities import get_jenkins_connector, RawDataMaker, DatabaseManager
+from models import IngestTask, ChangePoint
+from utilities.BenchMiner import SUITES, SUITE_UNITS
+from utilities.DatabaseManager import parse_cursor
+from utilities.PageCache import PageCache
 
 
 # Create your views here.
 
 from django.http import HttpResponse
 from django.http import Http404
+from django.http import JsonResponse
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from datetime import datetime, time, timedelta
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+
+# conditional GETs: the validators of the pages and data of a job
+
+def get_validators(request, job_name=None):
+
+    '''
+    The ETag and the Last-Modified time of the pages of a job (of the list of jobs if job_name is None).
+    The ETag follows the versions of the page cache, so it changes whenever the benchmarks of the job are stored or
+    updated, and the Last-Modified time is the last time they changed (see DatabaseManager.touch_job()). Both are
+    cached under these versions, so a request that matches them is answered with 304 without any DB query.
+    Only GET and HEAD requests are conditional (the POSTed selections of builds are not).
+    '''
+
+    if request.method not in ('GET', 'HEAD'):
+        return None, None
+
+    if not hasattr(request, 'validators'):
+        pages = PageCache()
+        validators = pages.get('validators', job_name)
+
+        if validators is None:
+            try:
+                last_modified = DatabaseManager().get_last_modified(job_name) if job_name is not None else None
+                validators = (pages.tag(job_name), last_modified)
+            except Http404:
+                # the view answers 404
+                validators = (None, None)
+            pages.set(validators, 'validators', job_name)
+
+        request.validators = validators
+
+    return request.validators
+
+def get_etag(request, job_name=None, *args, **kwargs):
+    return get_validators(request, job_name)[0]
+
+def get_last_modified(request, job_name=None, *args, **kwargs):
+    return get_validators(request, job_name)[1]
+
+def conditional(view):
+    # the browsers revalidate the pages on every request, instead of guessing how long they stay fresh
+    return cache_control(no_cache=True)(condition(etag_func=get_etag, last_modified_func=get_last_modified)(view))
 
 # the controller for the Index page
 
+@conditional
 def index(request):
 
-    db = DatabaseManager()
-    server_jobs = db.get_jobs()
+    # the page is cached whole, until a job is added, removed or changes
+    pages = PageCache()
+    page = pages.get('index')
 
-    context = {
-        'server_jobs': server_jobs,
-    }
-    template = loader.get_template('visualizer/index.html')
+    if page is None:
+        db = DatabaseManager()
+        server_jobs = db.get_jobs()
 
-    return HttpResponse(template.render(context, request))
+        context = {
+            'server_jobs': server_jobs,
+        }
+        template = loader.get_template('visualizer/index.html')
+        page = template.render(context, request)
+        pages.set(page, 'index')
+
+    return HttpResponse(page)
 
 # the controller for the Job details
 
+@conditional
 def jobDetails(request, job_name):
 
+    revisions = request.POST.getlist('build_rev')
+    tags = request.POST.getlist('build_tag')
+
+    '''
+    The context is cached until the benchmarks of the job change, for each selection of builds. The page itself is
+    rendered for each request, since its forms carry the CSRF token of the user.
+    '''
+    pages = PageCache()
+    context = pages.get('jobDetails', job_name, revisions, tags)
+    if context is None:
+        context = get_job_context(job_name, revisions, tags)
+        pages.set(context, 'jobDetails', job_name, revisions, tags)
+
+    template = loader.get_template('visualizer/jobDetails.html')
+    return HttpResponse(template.render(context, request))
+
+def get_job_context(job_name, revisions, tags):
+
     db = DatabaseManager()
     job_details = db.get_job(job_name)
 
-    if 'build_rev' in request.POST:
+    if revisions:
         # "do stuff related to specific build comparison"
-
-        revisions = request.POST.getlist('build_rev')
-        tags = request.POST.getlist('build_tag')
-
         benchmarks = db.get_selected_benchmarks(job_name, revisions, tags)
     else:
         # "take and compare last two builds"
         benchmarks = db.get_last_benchmarks(job_name)
 
-    context = {
+    return {
         'job_name': job_name,
         'job_details': job_details,
         'benchmarks': benchmarks,
         'hide_in_table': ["build_no", "details", "revision", "timestamp"],
-        'no_bench': len(benchmarks)
+        # the charts fetch the results of these runs from the JSON API (api.py)
+        'runs': ",".join(str(benchmark['id']) for benchmark in benchmarks),
+        'bench_names': dict((suite, ",".join(sub_bench for key, sub_bench in sub_benchs)) for suite, sub_benchs in SUITES),
+        'history_benchmarks': [(suite, sub_bench) for suite, sub_benchs in SUITES for key, sub_bench in sub_benchs],
+        'change_points': db.get_change_points(job_name, limit=CHANGE_POINTS)
     }
-    template = loader.get_template('visualizer/jobDetails.html')
-    return HttpResponse(template.render(context, request))
+
+# the controller for the history of a benchmark (JSON)
+
+HISTORY_POINTS = 500
+HISTORY_MAX_POINTS = 5000
+HISTORY_PAGE_SIZE = 1000
+
+@conditional
+def benchmarkHistory(request, job_name, suite, benchmark):
+
+    '''
+    Returns the time series of a benchmark of a job, as columns.
+    By default the successful scores are downsampled to ?points=N points (largest-triangle-three-buckets).
+    With ?raw=1, all the runs are returned, ?limit=N per page: the 'next' cursor of a page is passed as ?after=
+    to get the next page.
+    '''
+
+    if benchmark not in [name for key, name in dict(SUITES).get(suite, [])]:
+        raise Http404("Unknown benchmark <" + suite + "/" + benchmark + ">")
+
+    db = DatabaseManager()
+
+    try:
+        if 'raw' in request.GET:
+            limit = min(int(request.GET.get('limit', HISTORY_PAGE_SIZE)), HISTORY_PAGE_SIZE)
+            after = parse_cursor(request.GET['after']) if request.GET.get('after') else None
+            history = db.get_benchmark_history_page(job_name, suite, benchmark, after, max(1, limit))
+        else:
+            points = min(int(request.GET.get('points', HISTORY_POINTS)), HISTORY_MAX_POINTS)
+            history = db.get_benchmark_history(job_name, suite, benchmark, max(1, points))
+    except ValueError:
+        raise Http404("Invalid history parameters")
+
+    history.update({
+        'job_name': job_name,
+        'suite': suite,
+        'benchmark': benchmark,
+        'unit': SUITE_UNITS[suite]
+    })
+
+    return JsonResponse(history)
+
+# the controller for the changes found in the benchmarks of a job (JSON)
+
+CHANGE_POINTS = 20
+
+@conditional
+def changePoints(request, job_name):
+
+    '''
+    Returns the regressions and improvements found in the benchmarks of a job, the latest first.
+    ?direction=regression or ?direction=improvement returns only one of them.
+    '''
+
+    direction = request.GET.get('direction')
+    if direction is not None and direction not in dict(ChangePoint.DIRECTIONS):
+        raise Http404("Unknown direction <" + direction + ">")
+
+    db = DatabaseManager()
+    db.get_job(job_name)
+
+    return JsonResponse({'job_name': job_name, 'changes': db.get_change_points(job_name, direction)})
+
+# the controller for the CSV export of the history of a job
+
+EXPORT_TITLES = ['timestamp', 'build_no', 'revision', 'tag', 'suite', 'benchmark', 'score', 'status']
+
+def parse_time(value, end=False):
+
+    '''
+    Parses a ?since= or ?until= parameter, a date (YYYY-MM-DD, a whole day: until the next day for end) or a date and
+    time (ISO 8601, UTC if there is no time zone)
+    '''
+
+    if not value:
+        return None
+
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError("Invalid date <" + value + ">")
+        parsed = datetime.combine(day + timedelta(days=1) if end else day, time())
+
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed, timezone.utc)
+
+    return parsed
+
+@conditional
+def export(request, job_name):
+
+    '''
+    Streams the history of a job as CSV, one row per result, straight from the DB: the download starts at once and
+    the server memory does not grow with the history.
+    ?since= and ?until= (dates or ISO 8601 times) limit the runs to a period, ?revision=a,b to some revisions, and
+    ?gzip=1 compresses the stream.
+    '''
+
+    try:
+        since = parse_time(request.GET.get('since'))
+        until = parse_time(request.GET.get('until'), end=True)
+    except ValueError as e:
+        raise Http404(str(e))
+
+    revisions = request.GET['revision'].split(",") if request.GET.get('revision') else None
+
+    db = DatabaseManager()
+    rows = db.get_export_rows(job_name, since, until, revisions)
+
+    rawmaker = RawDataMaker({'titles': EXPORT_TITLES, 'zipped_list': rows})
+
+    if request.GET.get('gzip'):
+        response = StreamingHttpResponse(rawmaker.iter_gzip_data(), content_type='application/gzip')
+        response['Content-Disposition'] = 'attachment; filename="' + job_name + '.csv.gz"'
+    else:
+        response = StreamingHttpResponse(rawmaker.iter_raw_data(), content_type='text/csv')
+        response['Content-Disposition'] = 'attachment; filename="' + job_name + '.csv"'
+
+    return response
 
 # the controller for the raw page
 
@@ -66,104 +264,44 @@ def raw(request, job_name, bench_type):
     If there aren't any POST variables, the user has called the page directly.
     '''
 
-    if bench_type == "specjvm":
+    suites = dict(SUITES)
+    if bench_type not in suites:
+        raise Http404("Unknown benchmark suite <" + bench_type + ">")
 
-        if 'startup' in request.POST:
+    bench_names = [key for key, sub_bench in suites[bench_type]]
 
-            titles = ['revision', 'details', 'build_no', 'startup', 'compiler', 'compress', 'crypto', 'derby', 'mpegaudio',
-                           'scimark', 'serial', 'spec_sunflow', 'xml']
+    if bench_names[0] in request.POST:
 
-            zipped_list = zip(
-                request.POST.getlist('revision'),
-                request.POST.getlist('details'),
-                request.POST.getlist('build_no'),
-                request.POST.getlist('startup'),
-                request.POST.getlist('compiler'),
-                request.POST.getlist('compress'),
-                request.POST.getlist('crypto'),
-                request.POST.getlist('derby'),
-                request.POST.getlist('mpegaudio'),
-                request.POST.getlist('scimark'),
-                request.POST.getlist('serial'),
-                request.POST.getlist('spec_sunflow'),
-                request.POST.getlist('xml')
-            )
+        titles = ['revision', 'details', 'build_no'] + bench_names
 
-            benchs = {
+        zipped_list = zip(*[request.POST.getlist(title) for title in titles])
 
-                'titles': titles,
-                'zipped_list': zipped_list
+        benchs = {
 
-            }
+            'titles': titles,
+            'zipped_list': zipped_list
 
-            rawmaker = RawDataMaker(benchs)
-
-            template = loader.get_template('visualizer/raw.html')
-            context = {
-                'job_name': job_name,
-                'bench_type': bench_type,
-                'data': rawmaker.get_raw_data()
-            }
-            return HttpResponse(template.render(context, request))
+        }
 
-        else:
-            raise Http404("Cannot call this page directly")
-
-    if bench_type == "dacapo":
-
-        if 'avrora' in request.POST:
-
-            titles = ["revision", "details", "build_no", "avrora", "batik", "eclipse", "fop", "h2", "jython", "luindex",
-                      "lusearch", "pmd", "sunflow", "tomcat", "tradebeans", "tradesoap", "xalan"]
-
-            zipped_list = zip(
-                request.POST.getlist('revision'),
-                request.POST.getlist('details'),
-                request.POST.getlist('build_no'),
-                request.POST.getlist('avrora'),
-                request.POST.getlist('batik'),
-                request.POST.getlist('eclipse'),
-                request.POST.getlist('fop'),
-                request.POST.getlist('h2'),
-                request.POST.getlist('jython'),
-                request.POST.getlist('luindex'),
-                request.POST.getlist('lusearch'),
-                request.POST.getlist('pmd'),
-                request.POST.getlist('sunflow'),
-                request.POST.getlist('tomcat'),
-                request.POST.getlist('tradebeans'),
-                request.POST.getlist('tradesoap'),
-                request.POST.getlist('xalan'),
-            )
-
-            benchs = {
-
-                'titles': titles,
-                'zipped_list': zipped_list
-
-            }
-
-            rawmaker = RawDataMaker(benchs)
-
-            template = loader.get_template('visualizer/raw.html')
-            context = {
-                'job_name': job_name,
-                'bench_type': bench_type,
-                'data': rawmaker.get_raw_data()
-            }
-            return HttpResponse(template.render(context, request))
+        rawmaker = RawDataMaker(benchs)
 
-        else:
-            raise Http404("Cannot call this page directly")
+        template = loader.get_template('visualizer/raw.html')
+        context = {
+            'job_name': job_name,
+            'bench_type': bench_type,
+            'data': rawmaker.get_raw_data()
+        }
+        return HttpResponse(template.render(context, request))
 
-    return HttpResponse("Raw here")
+    else:
+        raise Http404("Cannot call this page directly")
 
 # Job register controller
 
 def registerJobs(request):
 
     try:
-        jenkins_conn = JenkinsConnector()
+        jenkins_conn = get_jenkins_connector()
 
         server_jobs = jenkins_conn.get_jobs_summary()
         context = {
@@ -186,37 +324,44 @@ def registerStatus(request):
 
         job_names = request.POST.getlist('jobs')
         db = DatabaseManager()
-        try:
-            jenkins_conn = JenkinsConnector()
 
-            '''
-            jobs array will contain information about all the registered/selected jobs.
-            '''
-            jobs = []
+        '''
+        The ingestion of the selected jobs is queued and done in the background by the ingestWorker command,
+        so the page returns immediately and follows the progress of the ingestion.
+        '''
+        if 'refresh' in request.POST:
+            # purge the jobs that were not selected. The selected ones are replaced one by one, once ingested
+            db.delete_other_jobs(job_names)
+            task_ids = db.enqueue_ingest(job_names, IngestTask.REFRESH)
+        else:
+            # incremental sync: only the builds newer than each job's high-water mark are fetched and appended
+            task_ids = db.enqueue_ingest(job_names, IngestTask.SYNC)
 
-            if 'refresh' in request.POST:
+        context = {
+            'task_ids': ",".join(str(task_id) for task_id in task_ids),
+        }
+        template = loader.get_template('visualizer/registerStatus.html')
 
-                for job_name in job_names:
-                    job = jenkins_conn.get_job_and_benchmarks(job_name)
-                    jobs.append(job)
+        return HttpResponse(template.render(context, request))
 
-                result = db.refresh_database(jobs)
-            else:
+    else:
+        raise Http404("You cannot call this page directly. If this is not the case, at least one job most be selected")
 
-                for job_name in job_names:
-                    try:
-                        db.get_job(job_name)
-                    except Http404:
-                        job = jenkins_conn.get_job_and_benchmarks(job_name)
-                        jobs.append(job)
+# Ingestion progress controller (JSON)
 
-                result = db.update_database(jobs)
-        except ConnectionError:
-            raise Http404("Could not establish a connection to the Jenkins server")
+def ingestProgress(request):
 
-        return HttpResponse(result)
+    '''
+    Reports the progress of the ingestions given as ?tasks=1,2,3, or of all the queued and running ones
+    '''
 
-    else:
-        raise Http404("You cannot call this page directly. If this is not the case, at least one job most be selected")
+    task_ids = None
+    if request.GET.get('tasks'):
+        try:
+            task_ids = [int(task_id) for task_id in request.GET['tasks'].split(",")]
+        except ValueError:
+            raise Http404("Invalid task ids")
 
+    db = DatabaseManager()
 
+    return JsonResponse({'tasks': db.get_ingest_progress(task_ids)})